@@ -2,9 +2,11 @@
 import asyncio
 import os
 import time
+import shutil
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app import routes
+from app.services import workers, jobs, upload, cache, live, delivery, progress, metrics
 from app.services.state import PROCESS_STATUS
 
 # ======================================
@@ -28,33 +30,64 @@ app.add_middleware(
 # ======================================
 app.include_router(routes.router)
 
+# ======================================
+# 🔹 상태 게이지 (/metrics 렌더링 시점에 값을 읽음)
+# ======================================
+# 청크 처리 워커 프로세스도 routes를 import하므로 게이지 등록은 API 프로세스에서만 실행되는 여기서 한다.
+metrics.Gauge("pid_jobs_queued", "Jobs waiting in the queue", lambda: jobs.get_scheduler().queued_count())
+metrics.Gauge("pid_jobs_running", "Jobs currently running", lambda: jobs.get_scheduler().running_count())
+metrics.Gauge("pid_jobs_max_concurrent", "Concurrent job limit", lambda: jobs.get_scheduler().max_concurrent)
+metrics.Gauge("pid_workers", "Chunk worker pool size", lambda: workers.WORKER_COUNT)
+metrics.Gauge("pid_live_streams", "Active live streams", lambda: len(live.list_streams()))
+metrics.Gauge("pid_sse_subscribers", "Open progress-stream subscribers", progress.bus.subscriber_count)
+
 
 # ======================================
 # 🧹 파일 정리
 # ======================================
 async def cleanup_old_results(interval=600, max_age=3600):
-    """일정 주기로 오래된 결과 파일 삭제"""
+    """일정 주기로 오래된 결과 파일 삭제 (대기 / 처리 중인 작업의 파일은 유지)"""
     while True:
         now = time.time()
+        active = {fid for fid, info in list(PROCESS_STATUS.items()) if info.get("status") in jobs.ACTIVE_STATUSES}
         for f in os.listdir("./results"):
-            if not f.endswith(".mp4"):
+            if not f.endswith((".mp4", delivery.HLS_DIR_SUFFIX)):
                 continue
+            if f.split("_", 1)[0] in active:
+                continue   # 처리 중 미리보기(_preview_hls) 등 — 작업이 끝난 뒤부터 만료 시간 적용
             path = os.path.join("./results", f)
             try:
                 created = os.path.getctime(path)
                 if now - created > max_age:
-                    os.remove(path)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)   # HLS 패키지 디렉터리
+                    else:
+                        os.remove(path)
                     print(f"[🧹 오래된 결과 삭제] {f}")
             except Exception as e:
                 print(f"[⚠️ 삭제 실패] {f}: {e}")
 
-        # 오래된 상태 정보 제거
+        # 완료되지 않고 방치된 이어받기 업로드 정리
+        upload.prune_stale("./uploads", max_age)
+
+        # 입력이 끝나거나 오류로 멈춘 실시간 스트림과 그 HLS 세그먼트 정리
+        await asyncio.to_thread(live.prune_ended)
+
+        # 작업 트레이스 파일도 결과와 같은 기준으로 정리
+        metrics.prune_traces(max_age)
+
+        # 결과 캐시는 1시간 만료 대상이 아님 — 자체 크기 / 사용 시각 기준으로 정리
+        cache.evict()
+
+        # 오래된 상태 정보 제거 (대기 / 처리 중인 작업은 유지)
         expired = [
             fid for fid, info in PROCESS_STATUS.items()
             if "created_at" in info and now - info["created_at"] > max_age
+            and info.get("status") not in jobs.ACTIVE_STATUSES
         ]
         for fid in expired:
             del PROCESS_STATUS[fid]
+            jobs.get_scheduler().forget(fid)
 
         await asyncio.sleep(interval)
 
@@ -63,4 +96,20 @@ async def cleanup_old_results(interval=600, max_age=3600):
 # ======================================
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(cleanup_old_results(interval=600, max_age=3600))
\ No newline at end of file
+    # 진행률 발행 채널 (워커 스레드 → 이벤트 루프 → SSE 구독자)
+    progress.bus.start(asyncio.get_running_loop())
+    # 모델 워밍업은 백그라운드로 (API는 바로 응답 — 준비 상태는 /ready)
+    workers.warm_up()
+    # 작업 스케줄러 시작 (SQLite에 남아 있던 대기/처리 중 작업은 다시 대기열로)
+    await jobs.get_scheduler().start(runner=routes.run_analysis)
+    asyncio.create_task(cleanup_old_results(interval=600, max_age=3600))
+
+
+# ======================================
+# 🛑 FastAPI 앱 종료 시 프로세스 풀 정리
+# ======================================
+@app.on_event("shutdown")
+async def shutdown_event():
+    await jobs.get_scheduler().stop()
+    live.stop_all()
+    workers.shutdown()
\ No newline at end of file
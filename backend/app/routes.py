@@ -1,14 +1,16 @@
 # routes.py
 import os
 import uuid
+import time
+import json
 import asyncio
-import mimetypes
 import shutil
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from fastapi.responses import FileResponse, StreamingResponse
-from app.services import preprocess, ai_engine, combine
-from app.services.state import PROCESS_STATUS, PROCESS_LOCK
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
+from app.services import preprocess, ai_engine, combine, workers, jobs, checkpoint, upload, cache, detections, live
+from app.services import delivery
+from app.services import progress, metrics
+from app.services.state import PROCESS_STATUS, update_chunk_progress, set_status, notify
 
 router = APIRouter()
 
@@ -17,6 +19,21 @@ RESULT_DIR = "./results"
 CHUNK_DIR = "./chunks"
 FRAME_DIR = "./frames"
 
+# 처리 파이프라인 모드
+#  - "stream": ffmpeg 파이프로 raw 프레임 디코딩 → 메모리에서 마스킹 → 바로 인코딩 (기본값)
+#  - "frames": 프레임을 JPEG로 저장 후 처리 (디버그용, 중간 프레임 확인 가능)
+#  - "rerender": 저장된 탐지 결과로 합성만 다시 수행 (/rerender 작업 전용)
+PIPELINE_MODE = os.getenv("PID_PIPELINE_MODE", "stream")
+
+# 청크 분할 방식
+#  - "plan": ffprobe 패킷 인덱스로 프레임 단위 구간을 계획 (파일 분할 없음, 원본 프레임레이트 유지, 기본값)
+#  - "segment": ffmpeg segment로 10초 단위 파일 분할 (키프레임 기준이라 길이가 고르지 않음)
+SPLIT_MODE = os.getenv("PID_SPLIT_MODE", "plan")
+CHUNKS_PER_WORKER = 2      # 워커당 청크 수 (마지막 청크 대기 시간을 줄이기 위해 워커 수보다 조금 많게)
+MIN_CHUNK_SECONDS = 2.0    # 청크 최소 길이 (너무 잘게 나누면 프로세스 / 인코더 시작 비용이 커짐)
+
+BLUR_MODES = ("gaussian", "box", "bilateral", "mosaic")
+SSE_KEEPALIVE = 15.0       # 진행 상태 변경이 없을 때 SSE 상태 재전송 간격 (초)
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULT_DIR, exist_ok=True)
@@ -31,7 +48,7 @@ def cleanup_temp_files(file_id: str):
     """uploads, chunks, frames, results 디렉토리에서 file_id 관련 임시파일 제거"""
     for folder in [UPLOAD_DIR, CHUNK_DIR, FRAME_DIR, RESULT_DIR]:
         for f in os.listdir(folder):
-            if f.startswith(file_id) and not f.endswith("_final.mp4"):  # ✅ 최종 결과 제외
+            if f.startswith(file_id) and not f.endswith(("_final.mp4", delivery.HLS_DIR_SUFFIX)):  # ✅ 최종 결과 제외
                 fp = os.path.join(folder, f)
                 try:
                     if os.path.isfile(fp):
@@ -45,154 +62,933 @@ def cleanup_temp_files(file_id: str):
 
 
 # ==========================================
-# ✅ Chunk 처리 함수 (Thread-safe)
+# ✅ Chunk 처리 함수 (Thread-safe / 프로세스 풀 워커에서도 실행 가능)
 # ==========================================
-def process_chunk_with_progress(chunk_path, idx, total_chunks, file_id):
-    """프레임 추출 → 마스킹 (Thread 환경)"""
+def _chunk_summary(idx, result):
+    return {
+        "chunk": idx,
+        "frames": result.get("frames", len(result.get("images", []))),
+        "total_detections": result["total_detections"],
+        "face_timing": result.get("face_timing"),
+        "tracking": result.get("tracking"),
+    }
+
+
+def _chunk_frames(chunk):
+    """청크 구간의 원본 프레임을 그대로(재샘플링 없이) 디코딩"""
+    return preprocess.iter_frames(
+        chunk["source"],
+        size=(chunk["width"], chunk["height"]),
+        seek=chunk["seek"],
+        frames=chunk["frames"],
+    )
+
+
+def _writer_args(encode_opts):
+    """인코딩 프로파일 → FrameWriter / combine_frames 인자"""
+    return {k: encode_opts[k] for k in ("codec", "preset", "crf", "threads") if k in encode_opts}
+
+
+def _job_dir(file_id):
+    """작업별 작업 디렉터리 (manifest / 사이드카 / 청크 영상) — 결과 디렉터리 정리 주기와 무관, 작업 성공 시 삭제"""
+    return os.path.join(CHUNK_DIR, file_id)
+
+
+def _chunk_video_path(file_id, idx, encode_opts):
+    """청크 영상 경로 — 원본 복사 구간과 섞일 수 있으면 MPEG-TS (SPS/PPS를 스트림 안에 두어 concat 시 유지)"""
+    ext = ".ts" if encode_opts.get("copy_unmasked") else ".mp4"
+    return os.path.join(_job_dir(file_id), f"chunk_{idx}{ext}")
+
+
+def _copy_if_clean(chunk, result, chunk_video_path, encode_opts):
+    """탐지가 하나도 없던 청크는 원본 구간 스트림 복사로 교체 (재인코딩 화질 손실 없음)"""
+    if result["total_detections"] == 0 and combine.can_copy(chunk, encode_opts):
+        combine.copy_range(chunk["source"], chunk_video_path, seek=chunk["seek"], frames=chunk["frames"])
+        return True
+    return False
+
+
+def process_chunk_with_progress(chunk, idx, total_chunks, file_id, pipeline_mode=PIPELINE_MODE,
+                                engine_opts=None, encode_opts=None, trace=False):
+    """청크 처리 + 청크 단위 메트릭 기록 (워커 스레드 / 프로세스에서 실행)
+
+    trace=True면 청크 안 단계 구간(Chrome trace 이벤트)을 요약의 "trace"에,
+    프로세스 풀 워커면 그동안 쌓인 메트릭을 요약의 "metrics"에 담아 반환한다 (run_analysis가 꺼내 합침).
+    """
+    start = time.perf_counter()
+    with metrics.trace_chunk(idx, enabled=trace) as tr:
+        summary = _process_chunk(chunk, idx, total_chunks, file_id, pipeline_mode, engine_opts, encode_opts)
+
+    metrics.CHUNK_SECONDS.observe(time.perf_counter() - start, pipeline=pipeline_mode)
+    metrics.CHUNKS.inc(pipeline=pipeline_mode)
+    metrics.FRAMES.inc(summary["frames"], pipeline=pipeline_mode)
+    metrics.DETECTIONS.inc(summary["total_detections"], pipeline=pipeline_mode)
+    if tr is not None:
+        summary["trace"] = tr.events
+    if metrics.forwarding():
+        summary["metrics"] = metrics.export_delta()
+    return summary
+
+
+def _process_chunk(chunk, idx, total_chunks, file_id, pipeline_mode=PIPELINE_MODE,
+                   engine_opts=None, encode_opts=None):
+    """프레임 추출 → 마스킹 (Thread 환경)
+
+    chunk: preprocess.plan_chunks / chunk_spec 청크 구간 + "sidecar"(탐지 결과 기록 경로)
+    engine_opts: ai_engine.analyze / analyze_stream에 그대로 넘길 옵션 (batch_size, tracking, ...)
+    encode_opts: combine.encode_profile() 인코딩 프로파일
+    pipeline_mode="rerender"면 저장된 탐지 결과로 합성만 다시 수행한다.
+
+    frames 모드는 인코딩을 하지 않고 요약의 "encode"에 인코딩 작업을 담아 반환한다
+    (run_analysis가 인코더 풀에서 실행 → 마스킹 워커는 바로 다음 청크로 넘어감).
+    """
+    engine_opts = engine_opts or {}
+    encode_opts = encode_opts or combine.encode_profile()
+    if pipeline_mode == "stream" and not engine_opts.get("tracking") and combine.can_copy_segments(chunk, encode_opts):
+        return process_chunk_passthrough(chunk, idx, total_chunks, file_id, engine_opts, encode_opts)
+    if pipeline_mode == "stream":
+        return process_chunk_streaming(chunk, idx, total_chunks, file_id, engine_opts, encode_opts)
+    if pipeline_mode == "rerender":
+        return process_chunk_rerender(chunk, idx, total_chunks, file_id, engine_opts, encode_opts)
+
     frame_dir = os.path.join(FRAME_DIR, f"{file_id}_{idx}")
     os.makedirs(frame_dir, exist_ok=True)
 
-    frames = preprocess.extract_frames(chunk_path, frame_dir, fps=30.0, img_format="jpg")
+    frames = preprocess.extract_frames(chunk["source"], frame_dir, img_format="jpg",
+                                       seek=chunk["seek"], frames=chunk["frames"])
     frame_paths = [os.path.join(frame_dir, os.path.basename(f)) for f in frames]
 
-    ai_engine.analyze(frame_paths, file_id=file_id, chunk_idx=idx, total_chunks=total_chunks)
-    with PROCESS_LOCK:
-        PROCESS_STATUS[file_id]["chunks"][idx] = 100
-    return idx
+    recorder = detections.DetectionRecorder()
+    result = ai_engine.analyze(frame_paths, file_id=file_id, chunk_idx=idx, total_chunks=total_chunks,
+                               recorder=recorder, **engine_opts)
+    recorder.save(chunk["sidecar"])
+
+    # 인코딩은 별도 단계 (encode_chunk_frames) — 청크 영상이 만들어져야 체크포인트로 기록된다
+    chunk_dir_result = os.path.join(RESULT_DIR, f"{file_id}_{idx}")
+    summary = dict(_chunk_summary(idx, result), video=_chunk_video_path(file_id, idx, encode_opts))
+    summary["encode"] = {
+        "chunk": chunk,
+        "total_detections": result["total_detections"],
+        "frames_glob": f"{chunk_dir_result}/processed_frame_%04d.jpg",
+        "output_video": summary["video"],
+        "encode_opts": encode_opts,
+    }
+    return summary
+
+
+def encode_chunk_frames(job):
+    """frames 모드 인코더 단계 — 마스킹된 프레임 이미지를 청크 영상으로 인코딩 (인코더 풀에서 실행)"""
+    if _copy_if_clean(job["chunk"], job, job["output_video"], job["encode_opts"]):
+        return True
+    combine.combine_frames(
+        frames_glob=job["frames_glob"],
+        output_video=job["output_video"],
+        framerate=job["chunk"]["fps"],
+        **_writer_args(job["encode_opts"]),
+    )
+    return False
+
+
+def process_chunk_streaming(chunk, idx, total_chunks, file_id, engine_opts=None, encode_opts=None):
+    """디코딩 → 마스킹 → 인코딩을 파이프로 연결 (중간 프레임 파일 없음)
+
+    인코더(ffmpeg)는 별도 프로세스로 파이프 입력을 받아 마스킹과 동시에 인코딩한다.
+    """
+    size = (chunk["width"], chunk["height"])
+    encode_opts = encode_opts or combine.encode_profile()
+    chunk_video_path = _chunk_video_path(file_id, idx, encode_opts)
+
+    recorder = detections.DetectionRecorder()
+    with combine.FrameWriter(chunk_video_path, *size, framerate=chunk["fps"], **_writer_args(encode_opts)) as writer:
+        result = ai_engine.analyze_stream(
+            _chunk_frames(chunk),
+            writer,
+            file_id=file_id,
+            chunk_idx=idx,
+            total_chunks=total_chunks,
+            total_frames=chunk["est_frames"],
+            recorder=recorder,
+            **(engine_opts or {}),
+        )
+    recorder.save(chunk["sidecar"])
+    copied = _copy_if_clean(chunk, result, chunk_video_path, encode_opts)
+
+    update_chunk_progress(file_id, idx, 100)
+    return dict(_chunk_summary(idx, result), copied=copied, video=chunk_video_path)
+
+
+def process_chunk_passthrough(chunk, idx, total_chunks, file_id, engine_opts=None, encode_opts=None):
+    """탐지 패스 → 마스킹할 프레임이 있는 GOP 구간만 디코딩 / 마스킹 / 인코딩, 나머지는 원본 스트림 복사
+
+    1차: 청크 전체를 탐지만 수행해 사이드카에 기록 (인코딩 없음)
+    2차: plan_segments로 나눈 구간별로 복사(copy_range) 또는 사이드카 기반 합성(render_stream) 후 이어붙임
+    추적 모드는 키프레임 사이 프레임 영역이 추적기 상태에 따라 달라지므로 이 경로를 사용하지 않는다.
+    """
+    engine_opts = engine_opts or {}
+    size = (chunk["width"], chunk["height"])
+    chunk_video_path = _chunk_video_path(file_id, idx, encode_opts)
+
+    recorder = detections.DetectionRecorder()
+    dirty, result = ai_engine.detect_stream(
+        _chunk_frames(chunk),
+        file_id=file_id,
+        chunk_idx=idx,
+        total_chunks=total_chunks,
+        total_frames=chunk["est_frames"],
+        batch_size=engine_opts.get("batch_size", ai_engine.BATCH_SIZE),
+        recorder=recorder,
+        progress=(0.0, 50.0),
+    )
+    recorder.save(chunk["sidecar"])
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+    keyframes = chunk.get("keyframes", [])
+    segments = combine.plan_segments(dirty, [k for k, _ in keyframes], chunk["keyframe"], chunk["ends_on_keyframe"])
+    encoded = sum(end - start for start, end, copy in segments if not copy)
+    result["passthrough"] = {"copied_frames": len(dirty) - encoded, "encoded_frames": encoded,
+                             "segments": len(segments)}
+    print(f"[⏩ 구간 통과] {file_id} 청크 {idx}: {len(dirty)} 프레임 중 {encoded} 프레임만 재인코딩 "
+          f"({len(segments)} 구간)")
+
+    if all(copy for _, _, copy in segments):
+        combine.copy_range(chunk["source"], chunk_video_path, seek=chunk["seek"], frames=chunk["frames"])
+    else:
+        # 구간 시작은 항상 청크 첫 프레임이거나 내부 키프레임
+        seeks = {0: chunk["seek"], **{int(k): t for k, t in keyframes}}
+        segment_dir = os.path.join(_job_dir(file_id), f"chunk_{idx}_segments")
+        os.makedirs(segment_dir, exist_ok=True)
+        sidecar = detections.DetectionSidecar(chunk["sidecar"])
+
+        segment_paths = []
+        for j, (start, end, copy) in enumerate(segments):
+            path = os.path.join(segment_dir, f"segment_{j:03d}.ts")
+            if copy:
+                combine.copy_range(chunk["source"], path, seek=seeks[start], frames=end - start)
+            else:
+                frames = preprocess.iter_frames(chunk["source"], size=size, seek=seeks[start], frames=end - start)
+                with combine.FrameWriter(path, *size, framerate=chunk["fps"], **_writer_args(encode_opts)) as writer:
+                    ai_engine.render_stream(
+                        frames,
+                        writer,
+                        sidecar,
+                        file_id=file_id,
+                        chunk_idx=idx,
+                        total_chunks=total_chunks,
+                        total_frames=len(dirty),
+                        blur_mode=engine_opts.get("blur_mode", ai_engine.BLUR_MODE),
+                        tracking=False,
+                        frame_offset=start,
+                        progress=(50.0, 100.0),
+                    )
+            segment_paths.append(path)
+
+        combine.concat_videos(segment_paths, chunk_video_path)
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    update_chunk_progress(file_id, idx, 100)
+    return dict(_chunk_summary(idx, result), copied=encoded == 0, video=chunk_video_path,
+                passthrough=result["passthrough"])
+
+
+def process_chunk_rerender(chunk, idx, total_chunks, file_id, engine_opts=None, encode_opts=None):
+    """저장된 사이드카 탐지 결과로 합성 + 인코딩만 다시 수행 (YOLO / 얼굴 검출 없음)"""
+    size = (chunk["width"], chunk["height"])
+    encode_opts = encode_opts or combine.encode_profile()
+    chunk_video_path = _chunk_video_path(file_id, idx, encode_opts)
+
+    sidecar = detections.DetectionSidecar(chunk["sidecar"])
+    with combine.FrameWriter(chunk_video_path, *size, framerate=chunk["fps"], **_writer_args(encode_opts)) as writer:
+        result = ai_engine.render_stream(
+            _chunk_frames(chunk),
+            writer,
+            sidecar,
+            file_id=file_id,
+            chunk_idx=idx,
+            total_chunks=total_chunks,
+            total_frames=chunk["est_frames"],
+            **(engine_opts or {}),
+        )
+    copied = _copy_if_clean(chunk, result, chunk_video_path, encode_opts)
+
+    update_chunk_progress(file_id, idx, 100)
+    return dict(_chunk_summary(idx, result), copied=copied, video=chunk_video_path)
+
+
+def plan_video_chunks(video_path, chunk_dir):
+    """청크 구간 계획 — SPLIT_MODE="plan"이면 ffprobe 패킷 인덱스로 워커 수에 맞춰 균등 분할,
+    실패하거나 "segment"면 기존처럼 segment_time 단위로 파일을 잘라 각 파일을 청크로 사용"""
+    if SPLIT_MODE == "plan":
+        try:
+            return preprocess.plan_chunks(
+                video_path,
+                n_chunks=workers.WORKER_COUNT * CHUNKS_PER_WORKER,
+                min_seconds=MIN_CHUNK_SECONDS,
+            )
+        except Exception as e:
+            print(f"[⚠️ 청크 계획 실패 → segment 분할] {e}")
+
+    chunk_files = preprocess.split_video(video_path, out_dir=chunk_dir, segment_time=10)
+    return [preprocess.chunk_spec(c) for c in chunk_files]
 
 
 # ==========================================
 # ✅ 업로드
 # ==========================================
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request):
+    """multipart "file" 필드를 본문을 받는 대로 파싱해 블록 단위로 디스크에 기록 + sha256 계산
+
+    request.form()은 본문 전체를 임시 파일에 먼저 받아 두므로 쓰지 않고 request.stream()을 직접 파싱한다.
+    크기 제한은 실제로 받은 바이트 기준 (Content-Length가 있으면 본문을 받기 전에 먼저 거름).
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > upload.MAX_UPLOAD_SIZE + upload.MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"upload exceeds {upload.MAX_UPLOAD_SIZE} bytes")
+
     file_id = str(uuid.uuid4())
-    save_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    with open(save_path, "wb") as f:
-        f.write(await file.read())
-    return {"file_id": file_id, "path": save_path}
+    try:
+        meta = await upload.save_multipart(UPLOAD_DIR, file_id, request.headers.get("content-type", ""),
+                                           request.stream())
+    except upload.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"file_id": file_id, "path": meta["path"], "size": meta["length"], "sha256": meta["sha256"]}
 
 
 # ==========================================
-# ✅ AI 분석 시작 (Thread 기반 병렬)
+# ✅ 이어받기 업로드 (tus 유사 프로토콜)
+# ==========================================
+# 1) POST  /uploads?filename=..   (Upload-Length 헤더, 선택: Upload-Checksum: sha256 <hex>)
+# 2) PATCH /uploads/{file_id}     (Upload-Offset 헤더 + 본문 = 해당 오프셋부터의 바이트)
+# 3) 끊기면 HEAD /uploads/{file_id}로 서버 오프셋을 확인하고 그 위치부터 다시 PATCH
+def _upload_headers(meta):
+    return {"Upload-Offset": str(meta["offset"]), "Upload-Length": str(meta["length"]), "Cache-Control": "no-store"}
+
+
+@router.post("/uploads")
+async def create_upload(request: Request, filename: str = "video.mp4"):
+    try:
+        length = int(request.headers.get("Upload-Length", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Length header is required")
+
+    expected = None
+    checksum = request.headers.get("Upload-Checksum")
+    if checksum:
+        algo, _, value = checksum.partition(" ")
+        if algo.lower() != "sha256" or not value:
+            raise HTTPException(status_code=400, detail="Upload-Checksum must be 'sha256 <hex>'")
+        expected = value.strip()
+
+    file_id = str(uuid.uuid4())
+    try:
+        meta = upload.create_resumable(UPLOAD_DIR, file_id, filename, length, expected)
+    except upload.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    headers = dict(_upload_headers(meta), Location=f"/uploads/{file_id}")
+    return JSONResponse(status_code=201, headers=headers, content={"file_id": file_id})
+
+
+@router.head("/uploads/{file_id}")
+async def upload_offset(file_id: str):
+    meta = upload.read_meta(UPLOAD_DIR, file_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Response(status_code=200, headers=_upload_headers(meta))
+
+
+@router.patch("/uploads/{file_id}")
+async def upload_chunk(request: Request, file_id: str):
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+
+    try:
+        meta = await upload.append_resumable(UPLOAD_DIR, file_id, offset, request.stream())
+    except upload.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    if meta["complete"]:
+        print(f"[📥 업로드 완료] {file_id} ({meta['length']} bytes)")
+        return {"file_id": file_id, "path": meta["path"], "size": meta["length"], "sha256": meta["sha256"]}
+    return Response(status_code=204, headers=_upload_headers(meta))
+
+
+# ==========================================
+# ✅ 분석 작업 실행 (JobScheduler가 호출)
+# ==========================================
+async def run_analysis(file_id, video_path, options):
+    """분할 → 청크 병렬 마스킹 → 결합 (전역 워커 풀 사용)
+
+    청크마다 완료 시 manifest에 기록하므로, 중단 후 재실행하면 끝난 청크는 건너뛴다.
+    """
+    pipeline_mode = options.get("pipeline_mode", PIPELINE_MODE)
+    engine_opts = options.get("engine_opts", {})
+    encode_opts = combine.encode_profile(options.get("encode_profile"), copy_unmasked=options.get("copy_unmasked"))
+    job_trace = metrics.JobTrace(file_id) if options.get("trace") else None
+    job_started = time.perf_counter()
+
+    try:
+        set_status(file_id, status="processing", stage="splitting", progress=5)
+
+        chunk_dir = _job_dir(file_id)
+        manifest = checkpoint.ChunkManifest.load(chunk_dir, video_path)
+        chunks = manifest.chunks
+        if not chunks:
+            if pipeline_mode == "rerender":
+                # 재렌더링은 저장소에 기록된 청크 구간 + 사이드카를 그대로 사용 (분할 없음)
+                store = detections.load_store(options["detections_key"])
+                if store is None:
+                    raise FileNotFoundError("stored detections were evicted")
+                chunks = store["chunks"]
+            else:
+                chunks = await asyncio.to_thread(plan_video_chunks, video_path, chunk_dir)
+                for i, chunk in enumerate(chunks):
+                    chunk["sidecar"] = os.path.join(chunk_dir, f"chunk_{i:03d}{detections.SIDECAR_SUFFIX}")
+            manifest.set_chunks(chunks)
+
+        total_chunks = len(chunks)
+        pending = [i for i in range(total_chunks) if not manifest.is_done(i)]
+        if len(pending) < total_chunks:
+            print(f"[♻️ 이어서 처리] {file_id}: {total_chunks - len(pending)}/{total_chunks} 청크 완료됨")
+
+        set_status(
+            file_id,
+            chunks=[0 if i in pending else 100 for i in range(total_chunks)],
+            chunk_stats={},
+            progress=10,
+            stage="masking",
+            masking_started_at=time.time(),
+        )
+
+        # 완료된 청크부터 미리보기 재생목록에 공개 (이어서 처리하는 경우 이미 끝난 청크 먼저)
+        preview = None
+        if options.get("preview", delivery.PREVIEW_ENABLED):
+            preview = delivery.PreviewPlaylist(delivery.preview_dir(RESULT_DIR, file_id), chunks)
+            PROCESS_STATUS[file_id]["preview"] = delivery.preview_url(file_id)
+            PROCESS_STATUS[file_id]["ready_chunks"] = []
+            for i in range(total_chunks):
+                if preview is not None and i not in pending:
+                    preview = await _publish_preview(file_id, preview, i, manifest.data["done"][str(i)]["video"])
+
+        # ✅ 병렬 처리 (WORKER_MODE: thread / process, 모든 작업이 같은 풀을 공유)
+        loop = asyncio.get_event_loop()
+        executor = workers.get_executor()
+
+        async def run_chunk(i):
+            summary = await loop.run_in_executor(
+                executor, 
+                process_chunk_with_progress, 
+                chunks[i], 
+                i, 
+                total_chunks, 
+                file_id,
+                pipeline_mode,
+                engine_opts,
+                encode_opts,
+                job_trace is not None,
+            )
+            metrics.merge(summary.pop("metrics", None))
+            if job_trace is not None:
+                job_trace.extend(summary.pop("trace", None))
+
+            # frames 모드: 인코딩은 인코더 풀에서 — 그동안 마스킹 워커는 다른 청크를 처리
+            encode = summary.pop("encode", None)
+            if encode is not None:
+                encode_executor = workers.get_encode_executor()
+                if job_trace is not None:
+                    summary["copied"] = await loop.run_in_executor(
+                        encode_executor, job_trace.call, i, "encode", encode_chunk_frames, encode)
+                else:
+                    summary["copied"] = await loop.run_in_executor(encode_executor, encode_chunk_frames, encode)
+                update_chunk_progress(file_id, i, 100)
+            return summary
+
+        tasks = [run_chunk(i) for i in pending]
+
+        # 청크가 끝나는 대로 manifest에 기록 (이벤트 루프에서만 기록하므로 락 불필요)
+        for finished in asyncio.as_completed(tasks):
+            summary = await finished
+            idx = summary["chunk"]
+            manifest.mark_done(idx, summary["video"], summary)
+            if preview is not None:
+                preview = await _publish_preview(file_id, preview, idx, summary["video"])
+
+        chunk_results = [manifest.summary(i) for i in range(total_chunks)]
+
+        # 청크별 얼굴 검출 단계 소요 시간 (프레임당 ms)
+        PROCESS_STATUS[file_id]["face_timing"] = {r["chunk"]: r["face_timing"] for r in chunk_results}
+        if encode_opts["copy_unmasked"]:
+            PROCESS_STATUS[file_id]["passthrough"] = {r["chunk"]: r.get("passthrough") for r in chunk_results}
+        if engine_opts.get("tracking"):
+            PROCESS_STATUS[file_id]["tracking"] = {r["chunk"]: r["tracking"] for r in chunk_results}
+
+        # ✅ 청크별 영상 결합
+        set_status(file_id, stage="combining_chunks", progress=90)
+        # 청크 영상은 각 청크 작업에서 이미 인코딩 완료 (manifest에 기록된 경로)
+        chunk_videos = [manifest.data["done"][str(i)]["video"] for i in range(total_chunks)]
+
+        # ✅ 최종 연결
+        set_status(file_id, stage="combining_final", progress=95)
+
+        # 원본 오디오는 청크 단계를 거치지 않고 최종 연결 시 한 번만 재인코딩 없이 넣음
+        sources = {c["source"] for c in chunks}
+        audio_from = video_path if pipeline_mode != "rerender" else (sources.pop() if len(sources) == 1 else None)
+
+        final_output = os.path.join(RESULT_DIR, f"{file_id}_final.mp4")
+        await asyncio.to_thread(combine.concat_videos, chunk_videos, out_path=final_output, audio_from=audio_from)
+        if preview is not None:
+            preview.finish()
+
+        # 선택: 재인코딩 없이 HLS로도 분할 (재생 시작을 더 빠르게)
+        if options.get("hls"):
+            set_status(file_id, stage="packaging")
+            await _package_hls(file_id, final_output)
+
+        # 다음에 같은 영상 + 설정이 들어오면 바로 반환하도록 캐시에 등록
+        if options.get("cache_key"):
+            try:
+                await asyncio.to_thread(cache.store, options["cache_key"], final_output, options.get("cache_settings"))
+            except OSError as e:
+                print(f"[⚠️ 캐시 저장 실패] {e}")
+
+        # 청크 + 탐지 사이드카를 저장소로 옮겨 두면 설정만 바꾼 재렌더링이 가능
+        det_key = options.get("detections_key")
+        if det_key and pipeline_mode != "rerender":
+            det_meta = {"video_sha256": options.get("video_sha256"), "engine_opts": engine_opts}
+            try:
+                if not await asyncio.to_thread(detections.publish, det_key, chunks, det_meta):
+                    det_key = None
+            except OSError as e:
+                print(f"[⚠️ 탐지 결과 저장 실패] {e}")
+                det_key = None
+        if det_key:
+            PROCESS_STATUS[file_id]["detections"] = det_key
+
+        cleanup_temp_files(file_id)
+
+        set_status(file_id, progress=100, stage="done", status="done")
+        job_status = "done"
+
+    except Exception as e:
+        set_status(file_id, status="error", error=str(e))
+        print(f"[❌ 분석 실패] {e}")
+        job_status = "error"
+
+    metrics.JOB_SECONDS.observe(time.perf_counter() - job_started, status=job_status)
+    metrics.JOBS.inc(status=job_status)
+    if job_trace is not None:
+        try:
+            path = await asyncio.to_thread(job_trace.save, pipeline_mode=pipeline_mode, status=job_status)
+            PROCESS_STATUS[file_id]["trace"] = f"/trace/{file_id}"
+            print(f"[🧭 트레이스 저장] {path}")
+        except OSError as e:
+            print(f"[⚠️ 트레이스 저장 실패] {e}")
+
+
+# ==========================================
+# ✅ AI 분석 요청 (대기열 등록)
 # ==========================================
 @router.post("/analyze/{file_id}")
-async def analyze_file(file_id: str):
-    files = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(file_id)]
-    if not files:
+async def analyze_file(
+    file_id: str,
+    pipeline_mode: str = PIPELINE_MODE,
+    batch_size: int = ai_engine.BATCH_SIZE,
+    tracking: bool = ai_engine.TRACKING,
+    detect_interval: int = ai_engine.TRACK_DETECT_INTERVAL,
+    priority: int = 0,
+    use_cache: bool = True,
+    blur_mode: str = ai_engine.BLUR_MODE,
+    encode_profile: str = combine.ENCODE_PROFILE,
+    copy_unmasked: bool = combine.COPY_UNMASKED,
+    hls: bool = delivery.HLS_PACKAGE,
+    preview: bool = delivery.PREVIEW_ENABLED,
+    trace: bool = metrics.TRACE_ENABLED,
+):
+    if pipeline_mode not in ("stream", "frames"):
+        raise HTTPException(status_code=400, detail="pipeline_mode must be 'stream' or 'frames'")
+    if blur_mode not in BLUR_MODES:
+        raise HTTPException(status_code=400, detail=f"blur_mode must be one of {BLUR_MODES}")
+    if encode_profile not in combine.ENCODE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"encode_profile must be one of {tuple(combine.ENCODE_PROFILES)}")
+    if not 1 <= batch_size <= 64:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 64")
+    if not 1 <= detect_interval <= 300:
+        raise HTTPException(status_code=400, detail="detect_interval must be between 1 and 300")
+
+    video_path = upload.find_upload(UPLOAD_DIR, file_id)
+    if video_path is None:
         raise HTTPException(status_code=404, detail="File not found")
+    engine_opts = {
+        "batch_size": batch_size,
+        "tracking": tracking,
+        "detect_interval": detect_interval,
+        "blur_mode": blur_mode,
+    }
 
-    video_path = os.path.join(UPLOAD_DIR, files[0])
-    PROCESS_STATUS[file_id] = {
-        "progress": 0,
-        "stage": "AI 분석 준비 중...",
-        "status": "processing",
-        "chunks": [],
+    meta = upload.read_meta(UPLOAD_DIR, file_id)
+    video_sha256 = meta["sha256"] if meta and meta.get("complete") else await asyncio.to_thread(upload.sha256_file, video_path)
+    options = {
+        "pipeline_mode": pipeline_mode,
+        "engine_opts": engine_opts,
+        "encode_profile": encode_profile,
+        "copy_unmasked": copy_unmasked,
+        "hls": hls,
+        "preview": preview,
+        "trace": trace,
+        "video_sha256": video_sha256,
+        "detections_key": cache.cache_key(video_sha256, cache.detection_settings(engine_opts)),
     }
+    return await _submit_job(file_id, video_path, options, priority, use_cache)
+
+
+async def _publish_preview(file_id, preview, idx, video):
+    """청크 idx를 미리보기에 추가 — 실패하면 이 작업의 미리보기만 끄고 처리는 계속 (None 반환)"""
+    try:
+        new = await asyncio.to_thread(preview.add, idx, video)
+    except Exception as e:
+        print(f"[⚠️ 미리보기 중단] {file_id}: {e}")
+        PROCESS_STATUS[file_id].pop("preview", None)
+        return None
+    PROCESS_STATUS[file_id]["ready_chunks"].extend(new)
+    if new:
+        notify(file_id)
+    return preview
+
+
+async def _package_hls(file_id, final_output):
+    """최종 영상을 HLS로 분할 — 실패해도 mp4 결과는 유효하므로 작업은 성공으로 둠"""
+    try:
+        await asyncio.to_thread(delivery.package_hls, final_output, delivery.hls_dir(RESULT_DIR, file_id))
+        PROCESS_STATUS[file_id]["hls"] = delivery.hls_url(RESULT_DIR, file_id)
+    except Exception as e:
+        print(f"[⚠️ HLS 패키징 실패] {file_id}: {e}")
+
+
+async def _submit_job(file_id, video_path, options, priority, use_cache):
+    """결과 캐시 확인 후 적중하면 즉시 완료, 아니면 대기열 등록"""
+    if use_cache:
+        # 재렌더링은 raw 프레임을 디코딩해 합성하므로 stream 모드 결과와 같다
+        cache_mode = "stream" if options["pipeline_mode"] == "rerender" else options["pipeline_mode"]
+        settings = cache.masking_settings(cache_mode, options["engine_opts"], options.get("encode_profile"),
+                                          options.get("copy_unmasked"))
+        key = cache.cache_key(options["video_sha256"], settings)
+
+        final_output = os.path.join(RESULT_DIR, f"{file_id}_final.mp4")
+        if await asyncio.to_thread(cache.lookup, key, final_output):
+            # 일반 작업 완료와 같이 스케줄러 저장소에 기록 (재시작 후에도 완료 상태 유지)
+            scheduler = jobs.get_scheduler()
+            scheduler.record(file_id, video_path, options, {
+                "progress": 100,
+                "stage": "done",
+                "status": "done",
+                "chunks": [],
+                "cached": True,
+            }, priority=priority)
+            if detections.load_store(options["detections_key"]) is not None:
+                set_status(file_id, detections=options["detections_key"])
+            if options.get("hls"):
+                await _package_hls(file_id, final_output)
+                notify(file_id)
+            scheduler.save(file_id)
+            metrics.JOBS.inc(status="cached")
+            if options["pipeline_mode"] != "rerender":
+                cleanup_temp_files(file_id)
+            return {"status": "done", "file_id": file_id, "position": 0, "cached": True}
+
+        options["cache_key"] = key
+        options["cache_settings"] = settings
+
+    try:
+        position = jobs.get_scheduler().submit(file_id, video_path, options, priority=priority)
+    except jobs.QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    return {"status": PROCESS_STATUS[file_id]["status"], "file_id": file_id, "position": position}
 
-    async def run_analysis():
-        try:
-            PROCESS_STATUS[file_id]["stage"] = "splitting"
-            PROCESS_STATUS[file_id]["progress"] = 5
-
-            chunk_dir = os.path.join(CHUNK_DIR, file_id)
-            chunks = preprocess.split_video(video_path, out_dir=chunk_dir, segment_time=10)
-            total_chunks = len(chunks)
-            PROCESS_STATUS[file_id]["chunks"] = [0] * total_chunks
-            PROCESS_STATUS[file_id]["progress"] = 10
-            PROCESS_STATUS[file_id]["stage"] = "masking"
-
-            # ✅ Thread 기반 병렬 처리
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, total_chunks)) as executor:
-                tasks = [
-                    loop.run_in_executor(
-                        executor, 
-                        process_chunk_with_progress, 
-                        chunk, 
-                        i, 
-                        total_chunks, 
-                        file_id
-                    )
-                    for i, chunk in enumerate(chunks)
-                ]
-                await asyncio.gather(*tasks)
-
-            # ✅ 청크별 영상 결합
-            PROCESS_STATUS[file_id]["stage"] = "combining_chunks"
-            PROCESS_STATUS[file_id]["progress"] = 90
-            chunk_videos = []
-            for i in range(total_chunks):
-                chunk_dir_result = os.path.join(RESULT_DIR, f"{file_id}_{i}")
-                chunk_video_path = os.path.join(RESULT_DIR, f"{file_id}_chunk_{i}.mp4")
-                combine.combine_frames(
-                    frames_glob=f"{chunk_dir_result}/processed_frame_%04d.jpg",
-                    output_video=chunk_video_path,
-                    framerate=30.0,
-                )
-                chunk_videos.append(chunk_video_path)
 
-            # ✅ 최종 연결
-            PROCESS_STATUS[file_id]["stage"] = "combining_final"
-            PROCESS_STATUS[file_id]["progress"] = 95
+# ==========================================
+# ✅ 재렌더링 요청 (저장된 탐지 결과로 합성 / 인코딩만 다시 수행)
+# ==========================================
+@router.post("/rerender/{file_id}")
+async def rerender_file(
+    file_id: str,
+    blur_mode: str = ai_engine.BLUR_MODE,
+    priority: int = 0,
+    use_cache: bool = True,
+    encode_profile: str = combine.ENCODE_PROFILE,
+    copy_unmasked: bool = combine.COPY_UNMASKED,
+    hls: bool = delivery.HLS_PACKAGE,
+    trace: bool = metrics.TRACE_ENABLED,
+):
+    """완료된 작업(file_id)의 탐지 결과를 재사용해 새 결과 영상을 만든다 → 새 file_id 반환"""
+    if blur_mode not in BLUR_MODES:
+        raise HTTPException(status_code=400, detail=f"blur_mode must be one of {BLUR_MODES}")
+    if encode_profile not in combine.ENCODE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"encode_profile must be one of {tuple(combine.ENCODE_PROFILES)}")
+
+    det_key = PROCESS_STATUS.get(file_id, {}).get("detections")
+    store = detections.load_store(det_key) if det_key else None
+    if store is None:
+        raise HTTPException(status_code=404, detail="No stored detections for this file")
+
+    # 추적 모드 결과는 같은 추적 설정으로만 재현 가능하므로 원래 설정을 그대로 사용
+    engine_opts = {
+        "tracking": store["engine_opts"].get("tracking", False),
+        "detect_interval": store["engine_opts"].get("detect_interval", ai_engine.TRACK_DETECT_INTERVAL),
+        "blur_mode": blur_mode,
+    }
+    options = {
+        "pipeline_mode": "rerender",
+        "engine_opts": engine_opts,
+        "encode_profile": encode_profile,
+        "copy_unmasked": copy_unmasked,
+        "hls": hls,
+        "trace": trace,
+        "video_sha256": store["video_sha256"],
+        "detections_key": det_key,
+    }
 
-            final_output = os.path.join(RESULT_DIR, f"{file_id}_final.mp4")
-            combine.concat_videos(chunk_videos, out_path=final_output)
+    new_id = str(uuid.uuid4())
+    result = await _submit_job(new_id, detections.store_dir(det_key), options, priority, use_cache)
+    return dict(result, source_id=file_id)
 
-            cleanup_temp_files(file_id)
 
-            PROCESS_STATUS[file_id]["progress"] = 100
-            PROCESS_STATUS[file_id]["stage"] = "done"
-            PROCESS_STATUS[file_id]["status"] = "done"
+# ==========================================
+# ✅ 준비 상태 (모델 워밍업 완료 여부 — 로드 밸런서 readiness probe용)
+# ==========================================
+@router.get("/ready")
+async def readiness():
+    state = workers.readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
 
-        except Exception as e:
-            PROCESS_STATUS[file_id]["status"] = "error"
-            PROCESS_STATUS[file_id]["error"] = str(e)
-            print(f"[❌ 분석 실패] {e}")
 
-    asyncio.create_task(run_analysis())
-    return {"status": "processing", "file_id": file_id}
+# ==========================================
+# ✅ 작업 대기열 상태
+# ==========================================
+@router.get("/jobs")
+async def job_queue_status():
+    scheduler = jobs.get_scheduler()
+    return {
+        "running": scheduler.running_count(),
+        "queued": scheduler.queued_count(),
+        "max_concurrent": scheduler.max_concurrent,
+        "max_queued": scheduler.max_queued,
+    }
 
 
 # ==========================================
-# ✅ SSE 진행률 스트림
+# 📈 메트릭 (Prometheus 텍스트 형식) / 작업 트레이스
 # ==========================================
-@router.get("/progress-stream/{file_id}")
-async def progress_stream(request: Request, file_id: str):
-    async def event_generator():
-        last_progress = -1.0
-        while True:
-            if await request.is_disconnected():
-                print(f"❌ SSE disconnected: {file_id}")
-                break
+@router.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
 
-            info = PROCESS_STATUS.get(file_id)
-            if not info:
-                await asyncio.sleep(0.5)
-                continue
 
-            progress = float(info["progress"])
-            stage = info["stage"]
-            status = info["status"]
+@router.get("/trace/{file_id}")
+async def job_trace_file(file_id: str):
+    """trace=true로 실행한 작업의 Chrome trace (chrome://tracing / ui.perfetto.dev에서 열기)"""
+    path = metrics.trace_path(file_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return FileResponse(path, media_type="application/json", filename=f"{file_id}{metrics.TRACE_SUFFIX}")
 
-            if abs(progress - last_progress) >= 0.1:
-                yield f"data: {progress},{stage},{status}\n\n"
-                last_progress = progress
 
-            if status in ["done", "error"]:
-                break
+# ==========================================
+# ✅ SSE 진행률 스트림
+# ==========================================
+@router.get("/progress-stream/{file_id}")
+async def progress_stream(request: Request, file_id: str):
+    """진행 상태 SSE — 기본 message 이벤트는 progress.snapshot() JSON, 미리보기 청크는 "chunk" 이벤트
 
-            await asyncio.sleep(0.3)
+    폴링하지 않고 progress.bus 구독 큐를 기다린다 (변경이 없으면 SSE_KEEPALIVE마다 상태 재전송).
+    """
+    async def event_generator():
+        queue = progress.bus.subscribe(file_id)
+        sent_chunks = 0
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        print(f"❌ SSE disconnected: {file_id}")
+                        break
+                    data = progress.snapshot(file_id)
+                    if data is None:
+                        yield ": keepalive\n\n"
+                        continue
+
+                # 미리보기 청크는 앞에서부터 순서대로 공개됨 → 개수로 새 청크 판단
+                for idx in range(sent_chunks, data["ready_chunks"]):
+                    payload = {"chunk": idx, "ready": idx + 1, "total": len(data["chunks"]),
+                               "playlist": data["preview"]}
+                    yield f"event: chunk\ndata: {json.dumps(payload)}\n\n"
+                sent_chunks = max(sent_chunks, data["ready_chunks"])
+
+                yield f"data: {json.dumps(data)}\n\n"
+                if data["status"] in progress.TERMINAL_STATUSES:
+                    break
+        finally:
+            progress.bus.unsubscribe(file_id, queue)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 # -------------------------------
-# 결과 영상 조회
+# 결과 영상 조회 (Range / 조건부 요청 지원)
 # -------------------------------
-@router.get("/result_video/{filename}")
-async def get_result_video(filename: str):
-    path = os.path.join(RESULT_DIR, filename)
+async def _serve_file(request: Request, path: str, cache_control: str = "no-cache"):
+    """Range(206) / If-None-Match · If-Modified-Since(304)를 처리해 파일 일부 또는 전체를 스트리밍"""
+    from email.utils import formatdate
+
+    st = await asyncio.to_thread(os.stat, path)
+    etag = delivery.file_etag(st)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if delivery.not_modified(request.headers, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    size = st.st_size
+    try:
+        byte_range = delivery.parse_range(request.headers.get("range"), size, etag, request.headers.get("if-range"),
+                                          st.st_mtime)
+    except delivery.RangeNotSatisfiable:
+        return Response(status_code=416, headers=dict(headers, **{"Content-Range": f"bytes */{size}"}))
+
+    start, end = byte_range or (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status_code = 200
+    if byte_range is not None:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    media_type = delivery.media_type(path)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(delivery.iter_file(path, start, end), status_code=status_code,
+                             headers=headers, media_type=media_type)
+
+
+@router.api_route("/result_video/{filename}", methods=["GET", "HEAD"])
+async def get_result_video(request: Request, filename: str):
+    path = delivery.resolve(RESULT_DIR, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return await _serve_file(request, path)
+
+
+@router.api_route("/result_preview/{file_id}/{filename}", methods=["GET", "HEAD"])
+async def get_result_preview(request: Request, file_id: str, filename: str):
+    """처리 중 미리보기 재생목록 / 청크 세그먼트"""
+    if os.path.basename(file_id) != file_id:
+        raise HTTPException(status_code=404, detail="Not found")
+    path = delivery.resolve(delivery.preview_dir(RESULT_DIR, file_id), filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return await _serve_file(request, path, "no-cache" if filename.endswith(".m3u8") else "max-age=3600")
+
+
+@router.api_route("/result_hls/{file_id}/{filename}", methods=["GET", "HEAD"])
+async def get_result_hls(request: Request, file_id: str, filename: str):
+    """HLS 재생목록 / 세그먼트 (세그먼트는 바뀌지 않으므로 길게 캐시)"""
+    if os.path.basename(file_id) != file_id:
+        raise HTTPException(status_code=404, detail="Not found")
+    path = delivery.resolve(delivery.hls_dir(RESULT_DIR, file_id), filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return await _serve_file(request, path, "no-cache" if filename.endswith(".m3u8") else "max-age=3600")
+
+
+# ==========================================
+# 📡 실시간 스트림 (RTSP / RTMP / 파일 → 마스킹 → HLS)
+# ==========================================
+@router.post("/live")
+async def start_live(
+    source: str,
+    blur_mode: str = ai_engine.BLUR_MODE,
+    tracking: bool = ai_engine.TRACKING,
+    detect_interval: int = ai_engine.TRACK_DETECT_INTERVAL,
+    width: int = 0,
+    height: int = 0,
+    fps: float = 0.0,
+    loop: bool = True,
+    tail: bool = False,
+):
+    """source: "testsrc", rtsp:// / rtmp:// / http(s):// URL, 또는 업로드한 파일의 file_id (loop / tail 재생)"""
+    if workers.API_ONLY:
+        # 실시간 스트림은 API 프로세스 안에서 마스킹하므로 모델을 로드하지 않는 API 전용 모드에서는 불가
+        raise HTTPException(status_code=503, detail="live streams are disabled in API-only mode (PID_API_ONLY=1)")
+    if blur_mode not in BLUR_MODES:
+        raise HTTPException(status_code=400, detail=f"blur_mode must be one of {BLUR_MODES}")
+    if not 1 <= detect_interval <= 300:
+        raise HTTPException(status_code=400, detail="detect_interval must be between 1 and 300")
+    if bool(width) != bool(height) or width < 0 or height < 0 or width % 2 or height % 2:
+        raise HTTPException(status_code=400, detail="width / height must be given together as positive even numbers")
+
+    # 서버 로컬 경로는 직접 받지 않음 — 업로드된 파일만 file_id로 지정
+    if source != live.TEST_SOURCE and not source.startswith(live.LIVE_SCHEMES):
+        if not upload.is_file_id(source):
+            raise HTTPException(status_code=400, detail="source must be a stream URL, 'testsrc' or an uploaded file_id")
+        path = upload.find_upload(UPLOAD_DIR, source)
+        if path is None:
+            raise HTTPException(status_code=404, detail="source must be a stream URL, 'testsrc' or an uploaded file_id")
+        source = path
+
+    stream_id = str(uuid.uuid4())
+    try:
+        stream = await asyncio.to_thread(
+            live.start_stream, stream_id, source,
+            blur_mode=blur_mode, tracking=tracking, detect_interval=detect_interval,
+            size=(width, height) if width else None, fps=fps, loop=loop, tail=tail,
+        )
+    except live.LiveLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"failed to open live source: {e}")
+
+    return dict(stream.stats(), playlist=f"/live/{stream_id}/playlist.m3u8")
+
+
+@router.get("/live")
+async def list_live():
+    return {"streams": live.list_streams()}
+
+
+@router.get("/live/{stream_id}")
+async def live_status(stream_id: str):
+    stream = live.get_stream(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Live stream not found")
+    return stream.stats()
+
+
+@router.delete("/live/{stream_id}")
+async def stop_live(stream_id: str):
+    if not await asyncio.to_thread(live.stop_stream, stream_id):
+        raise HTTPException(status_code=404, detail="Live stream not found")
+    return {"stream_id": stream_id, "status": "stopped"}
+
+
+@router.get("/live/{stream_id}/{filename}")
+async def live_file(stream_id: str, filename: str):
+    """HLS 재생목록 / 세그먼트 제공 (재생목록은 계속 바뀌므로 캐시 금지)"""
+    stream = live.get_stream(stream_id)
+    if stream is None or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="Live stream not found")
+
+    path = os.path.join(stream.out_dir, filename)
+    if filename.endswith(".m3u8"):
+        media_type, headers = "application/vnd.apple.mpegurl", {"Cache-Control": "no-cache"}
+    elif filename.endswith(".ts"):
+        media_type, headers = "video/mp2t", {"Cache-Control": "max-age=60"}
+    else:
+        raise HTTPException(status_code=404, detail="Not found")
     if not os.path.exists(path):
-        return {"error": "Video not found"}
-    mime_type, _ = mimetypes.guess_type(path)
-    return FileResponse(path, media_type=mime_type or "application/octet-stream")
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, media_type=media_type, headers=headers)
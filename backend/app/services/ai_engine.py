@@ -3,8 +3,9 @@ import os
 import cv2
 import numpy as np
 import logging
-from ultralytics import YOLO
-from insightface.app import FaceAnalysis
+import threading
+
+from app.services import metrics, inference
 
 # ======================================
 # 🔹 로깅 설정
@@ -15,41 +16,86 @@ logger = logging.getLogger(__name__)
 # ======================================
 # 🔹 전역 변수 및 설정
 # ======================================
-model = None
+model = None             # inference.InferenceBackend (model(imgs) → ultralytics Results)
 face_app = None
+face_detector = None      # face_app.det_model (SCRFD 검출기만 직접 호출)
 
 BLUR_MODE = 'mosaic'      # 'gaussian', 'box', 'bilateral', 'mosaic'
 FEATHER_PX = 6            # 경계 부드럽게 처리
 FACE_PAD_RATIO = 0.18     # 얼굴 영역 확장 비율
 FALLBACK_TO_PERSON_MASK = True  # 얼굴 미검출 시 전신 블러 폴백
+CONF_THRESHOLD = 0.3      # 이 신뢰도 미만의 YOLO 탐지는 무시
+BATCH_SIZE = 4            # YOLO 한 번 호출에 묶어 넣을 프레임 수
+SINGLE_PASS_COMPOSITE = True  # 프레임의 모든 마스크를 하나의 알파 맵으로 모아 한 번에 합성 (False: 객체별 순차 합성)
+TRACKING = False          # 탐지 건너뛰기 + 옵티컬 플로우 추적 모드
+TRACK_DETECT_INTERVAL = 5     # 추적 모드에서 전체 탐지를 돌리는 프레임 간격 (K)
+TRACK_MIN_CONFIDENCE = 0.5    # 추적 신뢰도가 이 값보다 낮으면 즉시 재탐지
+TRACK_HOLD_FRAMES = 10        # 재탐지에서 놓친 영역을 계속 마스킹할 프레임 수
+WARMED_UP = False         # warm_up() 완료 여부 (/ready)
+FACE_DETECT_MODE = 'frame'  # 'frame': 프레임 전체 1회 / 'crops': 사람 영역을 한 캔버스에 모아 1회 / 'roi': 사람마다 face_app.get
+INFER_RES_MODE = os.getenv("PID_INFER_RES", "adaptive")  # 'full': 원본 해상도로 탐지 / 'fixed': 축소본으로 탐지 / 'adaptive': fixed + 작은 얼굴이 예상되면 얼굴 검출만 해상도 상향
+INFER_MAX_SIDE = int(os.getenv("PID_INFER_MAX_SIDE", str(inference.INFERENCE_IMGSZ)))  # 축소본 긴 변 (YOLO 입력 크기와 같으면 ultralytics가 다시 리사이즈하지 않음)
+MIN_FACE_PX = 20          # adaptive: 얼굴 검출 입력에서 예상 얼굴 높이가 이 값 이상이 되도록 해상도 상향
+FACE_PERSON_RATIO = 0.12  # adaptive: 사람 박스 높이 대비 예상 얼굴 높이
 
 
 # ======================================
 # 🔹 모델 로드
 # ======================================
+# 모듈 import 시에는 모델도, ultralytics / torch / insightface도 불러오지 않는다.
+# 추론을 실제로 하는 프로세스에서 처음 필요할 때(ensure_models) 또는 시작 시 워밍업(warm_up)에서 로드한다.
+_load_lock = threading.Lock()
+_model_lock = threading.Lock()   # ultralytics 예측기는 스레드 안전하지 않음 → YOLO 호출은 한 번에 하나
+
+
+def models_loaded():
+    return model is not None and face_app is not None
+
+
+def ensure_models():
+    """모델이 없으면 로드 (여러 스레드가 동시에 호출해도 한 번만 로드) → 사용 가능 여부"""
+    return models_loaded() or load_model()
+
+
 def load_model():
-    global model, face_app
+    with _load_lock:
+        return _load_model()
+
+
+def _load_model():
+    global model, face_app, face_detector
 
     if model is not None and face_app is not None:
         logger.info("✅ 모델들이 이미 로드되어 있습니다.")
         return True
 
     try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        MODEL_PATH = os.path.join(BASE_DIR, "models", "best.pt")
+        from insightface.app import FaceAnalysis
+
+        MODEL_PATH = inference.MODEL_PATH
 
         if not os.path.exists(MODEL_PATH):
             logger.error(f"❌ 모델 파일 없음: {MODEL_PATH}")
             return False
 
-        model = YOLO(MODEL_PATH, task="segment")
-        logger.info(f"✅ YOLO 모델 로드 성공: {MODEL_PATH}")
+        # 추론 백엔드 (torch / onnx / openvino) — 변환 결과는 캐시해 두고 재사용
+        try:
+            model = inference.load_backend(inference.INFERENCE_BACKEND, inference.INFERENCE_PRECISION, MODEL_PATH)
+        except Exception as e:
+            if inference.INFERENCE_BACKEND == "torch":
+                raise
+            logger.warning(f"⚠️ {inference.INFERENCE_BACKEND} 백엔드 로드 실패 → torch로 실행: {e}")
+            model = inference.load_backend("torch", "fp32", MODEL_PATH)
+        logger.info(f"✅ YOLO 모델 로드 성공: {model.describe()}")
         logger.info(f"클래스 이름: {model.names}")
 
-        # 얼굴 검출 모델 로드
-        face_app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
+        # 얼굴 검출 모델 로드 — bbox만 사용하므로 검출기(det_10g)만 로드
+        # (recognition / landmark / genderage 모델은 로드·실행하지 않음)
+        face_app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'],
+                                allowed_modules=['detection'])
         face_app.prepare(ctx_id=0, det_size=(640, 640))
-        logger.info("✅ 얼굴 검출 모델 로드 성공")
+        face_detector = face_app.det_model
+        logger.info("✅ 얼굴 검출 모델 로드 성공 (detection only)")
 
         return True
 
@@ -83,49 +129,106 @@ def adaptive_kernel(w, h, frac=0.15, kmin=9, kmax=91):
         k += 1
     return clamp(k, kmin, kmax)
 
-def build_alpha_from_mask(mask_uint8, feather_px=6):
-    if feather_px <= 0:
-        return (mask_uint8 / 255.0).astype(np.float32)
+def _feather_gain(mask_uint8, feather_px):
+    """경계 페더링 계수 — (0 < 마스크 < 255인 픽셀 위치, 그 픽셀의 1 - 거리 / feather_px), 없으면 None
 
+    마스크가 255인 픽셀은 거리 0(계수 1), 0인 픽셀은 알파 0이므로 중간값 픽셀만 거리 변환이 필요하다.
+    이진 마스크(YOLO 마스크 / 도형)는 거리 변환 없이 바로 끝난다.
+    """
+    partial = cv2.inRange(mask_uint8, 1, 254)
+    if feather_px <= 0 or not cv2.countNonZero(partial):
+        return None
+    sel = partial > 0
     dist = cv2.distanceTransform(255 - mask_uint8, cv2.DIST_L2, 3)
-    edge = np.clip(dist / float(feather_px), 0, 1)
-    alpha = (mask_uint8 / 255.0) * (1 - edge)
-    return np.clip(alpha, 0, 1).astype(np.float32)
+    return sel, 1 - np.minimum(dist[sel] * np.float32(1 / feather_px), 1)
+
+
+def build_alpha_from_mask(mask_uint8, feather_px=6):
+    """마스크 → float32 알파 (0~1)"""
+    alpha = np.multiply(mask_uint8, np.float32(1 / 255), dtype=np.float32)
+    gain = _feather_gain(mask_uint8, feather_px)
+    if gain is not None:
+        sel, g = gain
+        alpha[sel] *= g
+    return alpha
+
+
+def build_alpha_u8(mask_uint8, feather_px=6):
+    """build_alpha_from_mask의 고정소수점 판 — uint8 알파 (0~255), 이진 마스크면 마스크를 복사 없이 그대로 반환"""
+    gain = _feather_gain(mask_uint8, feather_px)
+    if gain is None:
+        return mask_uint8
+    sel, g = gain
+    alpha = mask_uint8.copy()
+    alpha[sel] = (mask_uint8[sel] * g + 0.5).astype(np.uint8)
+    return alpha
+
+
+class BufferPool:
+    """스레드별 재사용 버퍼 — 프레임마다 큰 임시 배열을 새로 만들지 않도록 (합성 스레드가 여러 개여도 안전)
+
+    get()은 이름 / dtype별 버퍼에서 필요한 크기만큼의 뷰를 돌려주고, 더 큰 크기가 필요할 때만 다시 할당한다.
+    내용은 초기화하지 않으므로 쓰는 쪽에서 필요한 부분만 채운다.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name, shape, dtype=np.uint8):
+        bufs = getattr(self._local, "bufs", None)
+        if bufs is None:
+            bufs = self._local.bufs = {}
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buf = bufs.get((name, dtype))
+        if buf is None or buf.size < size:
+            buf = bufs[(name, dtype)] = np.empty(size, dtype=dtype)
+        return buf[:size].reshape(shape)
+
+
+_buffers = BufferPool()
+
+
+def _blend_roi(dst, src, layer, alpha):
+    """dst = (layer * alpha + src * (255 - alpha)) / 255 (반올림) — 결과를 dst에 바로 씀
+
+    dst / src / layer: (h, w, 3) uint8, alpha: (h, w) uint8. dst의 알파 0 픽셀은 이미 src와 같아야 한다.
+    알파 255 픽셀은 layer 복사만, 경계의 중간값 픽셀만 uint16 고정소수점으로 섞는다.
+    """
+    np.copyto(dst, layer, where=(alpha == 255)[..., None])
+    partial = cv2.inRange(alpha, 1, 254)
+    if not cv2.countNonZero(partial):
+        return
+    sel = partial > 0
+    a = alpha[sel][:, None].astype(np.uint16)
+    t = layer[sel] * a + src[sel] * (255 - a)
+    # x / 255 반올림 = (x + 128 + ((x + 128) >> 8)) >> 8  (x <= 255 * 255)
+    t += 128
+    t += t >> 8
+    t >>= 8
+    dst[sel] = t
 
 
 # ======================================
 # 🔹 블러 함수
 # ======================================
-def apply_blur_with_alpha(img, mask_uint8, blur_mode='mosaic', feather_px=6, bbox_hint=None):
-    H, W = img.shape[:2]
-    alpha = build_alpha_from_mask(mask_uint8, feather_px)
-    alpha3 = alpha[..., None]
-
-    # 커널 크기
+def _kernel_size(bbox_hint=None):
     if bbox_hint:
         x1, y1, x2, y2 = bbox_hint
-        k = adaptive_kernel(x2 - x1, y2 - y1, 0.15)
-    else:
-        k = 25
-        if k % 2 == 0:
-            k += 1
+        return adaptive_kernel(x2 - x1, y2 - y1, 0.15)
+    k = 25
+    if k % 2 == 0:
+        k += 1
+    return k
 
-    # 블러 방식
-    if blur_mode == 'gaussian':
-        blurred = cv2.GaussianBlur(img, (k, k), 0)
-    elif blur_mode == 'box':
-        blurred = cv2.blur(img, (k, k))
-    elif blur_mode == 'bilateral':
-        blurred = cv2.bilateralFilter(img, 9, 75, 75)
-    elif blur_mode == 'mosaic':
-        cell = max(8, int(round(k * 0.6)))
-        small = cv2.resize(img, (max(1, W // cell), max(1, H // cell)), interpolation=cv2.INTER_LINEAR)
-        blurred = cv2.resize(small, (W, H), interpolation=cv2.INTER_NEAREST)
-    else:
-        blurred = img.copy()
 
-    out = (alpha3 * blurred + (1 - alpha3) * img).astype(np.uint8)
-    return out
+def apply_blur_with_alpha(img, mask_uint8, blur_mode='mosaic', feather_px=6, bbox_hint=None):
+    """프레임 크기 마스크 영역 블러 — 마스크가 있는 범위만 블러 / 합성 (composite_regions와 같은 경로)"""
+    x, y, w, h = cv2.boundingRect(mask_uint8)
+    if w == 0 or h == 0:
+        return img.copy()
+    region = {"box": (x, y, x + w, y + h), "mask": mask_uint8[y:y + h, x:x + w], "hint": bbox_hint}
+    return composite_regions(img, [region], blur_mode=blur_mode, feather_px=feather_px)
 
 
 def mask_from_polygon_or_bbox(mask_shape, bbox=None, ellipse=False):
@@ -143,54 +246,357 @@ def mask_from_polygon_or_bbox(mask_shape, bbox=None, ellipse=False):
     return mask
 
 
+# ======================================
+# 🔹 단일 패스 합성 (ROI 블러 + 누적 알파)
+# ======================================
+def _region_box(bbox, W, H, margin):
+    x1, y1, x2, y2 = map(int, bbox)
+    return max(0, x1 - margin), max(0, y1 - margin), min(W, x2 + margin + 1), min(H, y2 + margin + 1)
+
+
+def region_from_bbox(shape, bbox, ellipse=False, feather_px=FEATHER_PX):
+    """bbox 도형(사각형/타원) 마스크를 bbox 주변 ROI 크기로만 생성"""
+    H, W = shape[:2]
+    box = _region_box(bbox, W, H, feather_px + 2)
+    bx1, by1, bx2, by2 = box
+    x1, y1, x2, y2 = map(int, bbox)
+    mask = mask_from_polygon_or_bbox((by2 - by1, bx2 - bx1), bbox=(x1 - bx1, y1 - by1, x2 - bx1, y2 - by1), ellipse=ellipse)
+    return {"box": box, "mask": mask, "hint": (x1, y1, x2, y2)}
+
+
+def region_from_lowres_mask(mask, bbox, W, H, feather_px=FEATHER_PX):
+    """저해상도 마스크(YOLO 출력, 0~1)에서 bbox 주변 ROI만 프레임 해상도로 확대해 영역으로 사용
+
+    마스크 전체를 W×H로 cv2.resize(INTER_NEAREST)한 뒤 잘라낸 것과 같은 픽셀을 ROI 크기 인덱싱으로 만든다.
+    """
+    box = _region_box(bbox, W, H, feather_px + 2)
+    bx1, by1, bx2, by2 = box
+    mh, mw = mask.shape[:2]
+    xs = np.minimum(np.floor(np.arange(bx1, bx2) * (mw / W)).astype(np.intp), mw - 1)
+    ys = np.minimum(np.floor(np.arange(by1, by2) * (mh / H)).astype(np.intp), mh - 1)
+    roi = mask[np.ix_(ys, xs)]
+    if roi.dtype != np.uint8:
+        roi = np.multiply(roi, 255, out=roi).astype(np.uint8)
+    return {"box": box, "mask": roi, "hint": tuple(map(int, bbox))}
+
+
+def region_from_mask(mask_uint8, bbox, feather_px=FEATHER_PX):
+    """프레임 크기 마스크에서 bbox 주변 ROI만 잘라 영역으로 사용 (YOLO 마스크는 bbox 안으로 잘려 있음)"""
+    H, W = mask_uint8.shape[:2]
+    box = _region_box(bbox, W, H, feather_px + 2)
+    bx1, by1, bx2, by2 = box
+    return {"box": box, "mask": mask_uint8[by1:by2, bx1:bx2], "hint": tuple(map(int, bbox))}
+
+
+def _blur_roi(img, box, k, blur_mode, small_cache):
+    """box 영역만 블러 — 커널 반경만큼 여유를 두고 필터링해 프레임 전체 블러와 같은 결과를 얻음"""
+    H, W = img.shape[:2]
+    x1, y1, x2, y2 = box
+
+    if blur_mode == 'mosaic':
+        # 프레임 전체 축소본(작음)은 셀 크기별로 한 번만 만들고, ROI만 NEAREST 확대와 같은 인덱싱으로 복원
+        cell = max(8, int(round(k * 0.6)))
+        small = small_cache.get(cell)
+        if small is None:
+            small = cv2.resize(img, (max(1, W // cell), max(1, H // cell)), interpolation=cv2.INTER_LINEAR)
+            small_cache[cell] = small
+        sh, sw = small.shape[:2]
+        xs = np.minimum(np.floor(np.arange(x1, x2) * (sw / W)).astype(np.intp), sw - 1)
+        ys = np.minimum(np.floor(np.arange(y1, y2) * (sh / H)).astype(np.intp), sh - 1)
+        return small[np.ix_(ys, xs)]
+
+    if blur_mode in ('gaussian', 'box'):
+        pad = k // 2 + 1
+    elif blur_mode == 'bilateral':
+        pad = 5
+    else:
+        return img[y1:y2, x1:x2].copy()
+
+    px1, py1 = max(0, x1 - pad), max(0, y1 - pad)
+    px2, py2 = min(W, x2 + pad), min(H, y2 + pad)
+    src = img[py1:py2, px1:px2]
+    if blur_mode == 'gaussian':
+        blurred = cv2.GaussianBlur(src, (k, k), 0)
+    elif blur_mode == 'box':
+        blurred = cv2.blur(src, (k, k))
+    else:
+        blurred = cv2.bilateralFilter(src, 9, 75, 75)
+    return blurred[y1 - py1:y2 - py1, x1 - px1:x2 - px1]
+
+
+def composite_regions(img, regions, blur_mode=BLUR_MODE, feather_px=FEATHER_PX, out=None):
+    """프레임의 모든 마스크 영역을 하나의 누적 알파 맵으로 모아 ROI만 블러한 뒤 한 번에 합성
+
+    겹치는 영역은 알파가 큰 쪽(같으면 나중 영역)의 블러 결과를 사용한다.
+    """
+    with metrics.timer(f"composite_{blur_mode}"):
+        return _composite_regions(img, regions, blur_mode, feather_px, out)
+
+
+def _composite_regions(img, regions, blur_mode, feather_px, out):
+    out = img.copy() if out is None else out
+    boxes = [r["box"] for r in regions if r["box"][2] > r["box"][0] and r["box"][3] > r["box"][1]]
+    if not boxes:
+        return out
+
+    # 누적 알파(uint8) / 블러 레이어는 스레드별 버퍼를 재사용하고 ROI만 초기화
+    H, W = img.shape[:2]
+    acc = _buffers.get("acc", (H, W))
+    layer = _buffers.get("layer", img.shape)
+    src = img
+    if out is img:
+        # 제자리 합성 시 겹치는 ROI가 이미 합성된 픽셀을 다시 읽지 않도록 ROI 원본만 보존
+        src = _buffers.get("orig", img.shape)
+    for x1, y1, x2, y2 in boxes:
+        acc[y1:y2, x1:x2] = 0
+        if src is not img:
+            src[y1:y2, x1:x2] = img[y1:y2, x1:x2]
+
+    # 블러는 아직 아무것도 쓰지 않은 img에서 ROI만
+    small_cache = {}
+    for r in regions:
+        x1, y1, x2, y2 = r["box"]
+        if x2 <= x1 or y2 <= y1:
+            continue
+        alpha = build_alpha_u8(r["mask"], feather_px)
+        blurred = _blur_roi(img, r["box"], _kernel_size(r["hint"]), blur_mode, small_cache)
+
+        cur = acc[y1:y2, x1:x2]
+        np.copyto(layer[y1:y2, x1:x2], blurred, where=(alpha >= cur)[..., None])
+        np.maximum(cur, alpha, out=cur)
+
+    for x1, y1, x2, y2 in boxes:
+        _blend_roi(out[y1:y2, x1:x2], src[y1:y2, x1:x2], layer[y1:y2, x1:x2], acc[y1:y2, x1:x2])
+
+    return out
+
+
+# ======================================
+# 🔹 추론 해상도 (축소본으로 탐지 → 원본 좌표로 복원)
+# ======================================
+def _ceil32(v):
+    return int(-(-v // 32) * 32)
+
+
+def infer_scale(shape):
+    """탐지 입력 배율 (1.0 = 원본 해상도, 원본이 INFER_MAX_SIDE보다 작으면 확대하지 않음)"""
+    if INFER_RES_MODE == 'full':
+        return 1.0
+    return min(1.0, INFER_MAX_SIDE / max(shape[:2]))
+
+
+def _scaled_hw(shape, scale):
+    H, W = shape[:2]
+    return max(1, int(round(H * scale))), max(1, int(round(W * scale)))
+
+
+def letterbox(img, scale):
+    """scale배 축소 + 오른쪽/아래만 32 배수로 패딩 — 원점이 그대로라 좌표 복원은 scale로 나누기만 하면 됨"""
+    if scale >= 1.0:
+        return img
+    h, w = _scaled_hw(img.shape, scale)
+    out = np.full((_ceil32(h), _ceil32(w), 3), 114, dtype=img.dtype)   # ultralytics letterbox와 같은 회색
+    with metrics.timer("resize"):
+        out[:h, :w] = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+    return out
+
+
+def content_masks(masks, input_hw, content_hw):
+    """YOLO 마스크(N, mh, mw)에서 입력 이미지의 내용 영역만 잘라냄
+
+    ultralytics는 입력을 다시 비율 유지 + 가운데 패딩으로 맞추고, 마스크는 그 해상도로 나온다.
+    그 패딩과 letterbox()의 오른쪽/아래 패딩을 모두 빼야 프레임 크기로 늘렸을 때 위치가 맞는다.
+    """
+    mh, mw = masks.shape[1:3]
+    ih, iw = input_hw
+    r = min(mh / ih, mw / iw)
+    y0, x0 = int(round((mh - ih * r) / 2)), int(round((mw - iw * r) / 2))
+    ch, cw = max(1, int(round(content_hw[0] * r))), max(1, int(round(content_hw[1] * r)))
+    return masks[:, y0:y0 + ch, x0:x0 + cw]
+
+
+def face_scale(person_boxes, base):
+    """얼굴 검출 배율 — adaptive면 가장 작은 사람의 예상 얼굴 높이가 MIN_FACE_PX 이상이 되도록 base보다 올림"""
+    if INFER_RES_MODE != 'adaptive' or base >= 1.0:
+        return base
+    min_h = min(y2 - y1 for _, y1, _, y2 in person_boxes)
+    need = MIN_FACE_PX / max(1.0, min_h * FACE_PERSON_RATIO)
+    return min(1.0, max(base, need))
+
+
+# ======================================
+# 🔹 얼굴 검출 (detection only)
+# ======================================
+
+def detect_faces_frame(img):
+    """프레임 전체에 얼굴 검출기 1회 실행 → (N, 4) 얼굴 박스 (프레임 좌표)"""
+    with metrics.timer("face"):
+        bboxes, _ = face_detector.detect(img, max_num=0, metric='default')
+    if bboxes is None or len(bboxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    return bboxes[:, :4]
+
+
+def detect_faces_crops(img, rois, gap=16):
+    """사람 영역들을 한 캔버스에 붙여 검출기 1회 실행 → ROI별 얼굴 박스 리스트 (프레임 좌표)"""
+    if not rois:
+        return []
+
+    # 높이순 shelf packing (crop 사이에 gap만큼 빈 공간을 둬 경계 걸친 오검출 방지)
+    max_w = max(640, max(rx2 - rx1 for rx1, _, rx2, _ in rois))
+    order = sorted(range(len(rois)), key=lambda k: rois[k][3] - rois[k][1], reverse=True)
+    positions = [None] * len(rois)
+    x = y = row_h = 0
+    for k in order:
+        rx1, ry1, rx2, ry2 = rois[k]
+        w, h = rx2 - rx1, ry2 - ry1
+        if x > 0 and x + w > max_w:
+            x, y, row_h = 0, y + row_h + gap, 0
+        positions[k] = (x, y)
+        x += w + gap
+        row_h = max(row_h, h)
+
+    canvas_w, canvas_h = _ceil32(max_w), _ceil32(y + row_h)
+    canvas = np.zeros((canvas_h, canvas_w, 3), dtype=img.dtype)
+    for (rx1, ry1, rx2, ry2), (px, py) in zip(rois, positions):
+        canvas[py:py + ry2 - ry1, px:px + rx2 - rx1] = img[ry1:ry2, rx1:rx2]
+
+    # 캔버스 크기 그대로 입력 (SCRFD는 동적 입력 크기 지원) → crop이 축소되지 않음
+    with metrics.timer("face"):
+        bboxes, _ = face_detector.detect(canvas, input_size=(canvas_w, canvas_h), max_num=0, metric='default')
+    per_roi = [[] for _ in rois]
+    if bboxes is None:
+        return [np.zeros((0, 4), dtype=np.float32) for _ in rois]
+
+    for b in bboxes:
+        cx, cy = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+        for k, ((rx1, ry1, rx2, ry2), (px, py)) in enumerate(zip(rois, positions)):
+            if px <= cx < px + rx2 - rx1 and py <= cy < py + ry2 - ry1:
+                per_roi[k].append([b[0] - px + rx1, b[1] - py + ry1, b[2] - px + rx1, b[3] - py + ry1])
+                break
+
+    return [np.array(f, dtype=np.float32).reshape(-1, 4) for f in per_roi]
+
+
+def assign_faces_to_persons(face_boxes, person_rois):
+    """얼굴 중심이 들어가는 사람 영역 중 가장 작은 것에 얼굴을 배정 → 사람별 얼굴 박스 리스트"""
+    per_person = [[] for _ in person_rois]
+    for fb in face_boxes:
+        cx, cy = (fb[0] + fb[2]) / 2, (fb[1] + fb[3]) / 2
+        best, best_area = None, None
+        for k, (rx1, ry1, rx2, ry2) in enumerate(person_rois):
+            if rx1 <= cx < rx2 and ry1 <= cy < ry2:
+                area = (rx2 - rx1) * (ry2 - ry1)
+                if best is None or area < best_area:
+                    best, best_area = k, area
+        if best is not None:
+            per_person[best].append(fb)
+    return [np.array(f, dtype=np.float32).reshape(-1, 4) for f in per_person]
+
+
+def detect_person_faces(img, person_boxes, mode=FACE_DETECT_MODE, infer=None):
+    """사람 박스별 얼굴 박스 (프레임 좌표) 리스트 — mode에 따라 검출기 호출 횟수가 달라짐
+
+    INFER_RES_MODE에 따라 축소본에서 검출하고 좌표를 되돌린다 (infer: detect_batch가 만든 (축소본, 배율)).
+    adaptive에서 배율을 올린 경우 'frame'은 검출기 입력(640)으로 다시 줄어들므로 'crops'로 검출한다.
+    """
+    if not person_boxes:
+        return []
+
+    base = infer[1] if infer is not None else infer_scale(img.shape)
+    scale = face_scale(person_boxes, base)
+    if scale > base and mode == 'frame':
+        mode = 'crops'
+    if scale >= 1.0:
+        return _detect_person_faces(img, person_boxes, mode)
+
+    src = infer[0] if infer is not None and scale == infer[1] else letterbox(img, scale)
+    boxes = [tuple(int(round(v * scale)) for v in b) for b in person_boxes]
+    return [f / scale for f in _detect_person_faces(src, boxes, mode)]
+
+
+def _detect_person_faces(img, person_boxes, mode):
+    H, W = img.shape[:2]
+    rois = [expand_box(x1, y1, x2, y2, pad_ratio=0.02, W=W, H=H) for x1, y1, x2, y2 in person_boxes]
+
+    try:
+        if mode == 'frame':
+            return assign_faces_to_persons(detect_faces_frame(img), rois)
+        if mode == 'crops':
+            return detect_faces_crops(img, rois)
+
+        # 'roi': 사람마다 검출 (기존 방식)
+        faces = []
+        for rx1, ry1, rx2, ry2 in rois:
+            with metrics.timer("face"):
+                found = face_app.get(img[ry1:ry2, rx1:rx2])
+            faces.append(np.array([f.bbox + [rx1, ry1, rx1, ry1] for f in found],
+                                  dtype=np.float32).reshape(-1, 4))
+        return faces
+    except Exception as e:
+        logger.warning(f"얼굴 검출 실패: {e}")
+        return [np.zeros((0, 4), dtype=np.float32) for _ in person_boxes]
+
+
 # ======================================
 # 🔹 사람 및 차량 처리
 # ======================================
 def process_person_with_face_detection(img, out, x1, y1, x2, y2, masks, i, blur_mode):
-    global face_app
     H, W = out.shape[:2]
     rx1, ry1, rx2, ry2 = expand_box(x1, y1, x2, y2, pad_ratio=0.02, W=W, H=H)
     roi = out[ry1:ry2, rx1:rx2]
 
     try:
-        faces = face_app.get(roi)
+        with metrics.timer("face"):
+            faces = face_app.get(roi)
     except Exception as e:
         logger.warning(f"얼굴 검출 실패: {e}")
         faces = []
 
-    face_found = False
-    for f in faces:
-        fx1, fy1, fx2, fy2 = f.bbox.astype(int)
-        fx1, fy1, fx2, fy2 = fx1 + rx1, fy1 + ry1, fx2 + rx1, fy2 + ry1
+    face_boxes = [f.bbox + [rx1, ry1, rx1, ry1] for f in faces]
+    return process_person(out, x1, y1, x2, y2, face_boxes, masks, i, blur_mode)
+
+
+def _object_region(shape, x1, y1, x2, y2, masks, i):
+    """세그멘테이션 마스크(없으면 bbox 사각형)로 객체 영역 생성 — 마스크는 bbox 주변 ROI만 프레임 해상도로 확대"""
+    H, W = shape[:2]
+    if masks is not None:
+        return region_from_lowres_mask(masks[i], (x1, y1, x2, y2), W, H)
+    return region_from_bbox(shape, (x1, y1, x2, y2))
+
+
+def person_regions(shape, x1, y1, x2, y2, face_boxes, masks, i):
+    """사람 1명의 마스킹 영역 — 얼굴 타원들, 얼굴이 없으면 전신 폴백"""
+    H, W = shape[:2]
+    regions = []
+    for fb in face_boxes:
+        fx1, fy1, fx2, fy2 = np.asarray(fb).astype(int)
         fx1, fy1, fx2, fy2 = expand_box(fx1, fy1, fx2, fy2, FACE_PAD_RATIO, W, H)
-        face_mask = mask_from_polygon_or_bbox(out.shape, bbox=(fx1, fy1, fx2, fy2), ellipse=True)
-        out = apply_blur_with_alpha(out, face_mask, blur_mode=blur_mode, feather_px=FEATHER_PX, bbox_hint=(fx1, fy1, fx2, fy2))
-        face_found = True
+        regions.append(region_from_bbox(shape, (fx1, fy1, fx2, fy2), ellipse=True))
         logger.info(f"[FACE] 얼굴 블러 적용: ({fx1}, {fy1}, {fx2}, {fy2})")
 
-    if not face_found and FALLBACK_TO_PERSON_MASK:
+    if not regions and FALLBACK_TO_PERSON_MASK:
         logger.info("[FACE] 얼굴 없음 → 전신 블러 폴백 적용")
-        if masks is not None:
-            m = (masks[i] * 255).astype(np.uint8)
-            m = cv2.resize(m, (W, H), interpolation=cv2.INTER_NEAREST)
-        else:
-            m = mask_from_polygon_or_bbox(out.shape, bbox=(x1, y1, x2, y2))
-        out = apply_blur_with_alpha(out, m, blur_mode=blur_mode, feather_px=FEATHER_PX, bbox_hint=(x1, y1, x2, y2))
-        logger.info("[FACE] 전신 블러 폴백 완료")
+        regions.append(_object_region(shape, x1, y1, x2, y2, masks, i))
 
-    return out
+    return regions
 
 
-def process_vehicle(out, x1, y1, x2, y2, masks, i, blur_mode):
-    H, W = out.shape[:2]
-    if masks is not None:
-        m = (masks[i] * 255).astype(np.uint8)
-        m = cv2.resize(m, (W, H), interpolation=cv2.INTER_NEAREST)
-    else:
-        m = mask_from_polygon_or_bbox(out.shape, bbox=(x1, y1, x2, y2))
-    out = apply_blur_with_alpha(out, m, blur_mode=blur_mode, feather_px=FEATHER_PX, bbox_hint=(x1, y1, x2, y2))
+def vehicle_regions(shape, x1, y1, x2, y2, masks, i):
+    """차량 1대의 마스킹 영역"""
     logger.info(f"[VEHICLE] 블러 적용: ({x1}, {y1}, {x2}, {y2})")
-    return out
+    return [_object_region(shape, x1, y1, x2, y2, masks, i)]
+
+
+def process_person(out, x1, y1, x2, y2, face_boxes, masks, i, blur_mode):
+    """검출된 얼굴 박스(프레임 좌표)에 블러 적용, 얼굴이 없으면 전신 폴백"""
+    regions = person_regions(out.shape, x1, y1, x2, y2, face_boxes, masks, i)
+    return composite_regions(out, regions, blur_mode=blur_mode, feather_px=FEATHER_PX, out=out)
+
+
+def process_vehicle(out, x1, y1, x2, y2, masks, i, blur_mode):
+    regions = vehicle_regions(out.shape, x1, y1, x2, y2, masks, i)
+    return composite_regions(out, regions, blur_mode=blur_mode, feather_px=FEATHER_PX, out=out)
 
 
 # ======================================
@@ -199,7 +605,7 @@ def process_vehicle(out, x1, y1, x2, y2, masks, i, blur_mode):
 def process_image_advanced(image_input, blur_mode=BLUR_MODE):
     global model, face_app
 
-    if model is None or face_app is None:
+    if not ensure_models():
         logger.error("모델이 로드되지 않았습니다.")
         return None
 
@@ -214,7 +620,8 @@ def process_image_advanced(image_input, blur_mode=BLUR_MODE):
         logger.error("잘못된 이미지 입력 타입입니다.")
         return None
 
-    results = model(img, verbose=False)[0]
+    with metrics.timer("yolo"):
+        results = model(img, verbose=False)[0]
     out = img.copy()
 
     masks = results.masks.data.cpu().numpy() if results.masks is not None else None
@@ -233,7 +640,7 @@ def process_image_advanced(image_input, blur_mode=BLUR_MODE):
 
         logger.info(f"[YOLO] 객체 {i}: 클래스={cls_id}, 신뢰도={confidence:.2f}, 좌표=({x1},{y1},{x2},{y2})")
 
-        if confidence < 0.3:
+        if confidence < CONF_THRESHOLD:
             continue
 
         # 🔸 현재 모델은 0=person, 1=vehicle 구조
@@ -248,13 +655,281 @@ def process_image_advanced(image_input, blur_mode=BLUR_MODE):
 # ======================================
 # 🔹 analyze (FastAPI용) — SSE 실시간 업데이트 개선 버전
 # ======================================
-from app.services.state import PROCESS_STATUS, PROCESS_LOCK
+from app.services.state import report_chunk_progress
 
-def analyze(frame_files, file_id, chunk_idx=None, total_chunks=None, blur_mode=BLUR_MODE):
-    """각 프레임 단위 및 내부 객체 처리 단위로 진행률을 갱신하는 개선된 analyze 함수"""
+def _update_progress(file_id, chunk_idx, total_chunks, local_progress, frame_no, total_frames, detections=None):
+    """청크 진행률(%) 보고 — state.report_chunk_progress가 청크마다 일정 간격으로만 반영
+    (프로세스 풀 워커에서는 큐로 전달)"""
+    if chunk_idx is None or total_chunks is None:
+        return
+
+    stage = f"청크 {chunk_idx+1}/{total_chunks} - 프레임 {frame_no}/{total_frames}"
+    progress = report_chunk_progress(file_id, chunk_idx, local_progress, stage, frames=frame_no,
+                                     total_frames=total_frames, detections=detections)
+    if progress is not None:
+        logger.debug(f"[진행률] {file_id}: {progress}%")
+
+
+def _batched(iterable, n):
+    """이터러블을 최대 n개씩 리스트로 묶어 반환"""
+    from itertools import islice
+
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def _unpack_result(results, shape, scale=1.0, input_hw=None):
+    """YOLO Results 한 개 → NumPy 탐지 정보 dict (프레임 좌표, 탐지 없으면 None)
+
+    scale배 축소본(input_hw: 패딩 포함 크기)으로 탐지했으면 박스를 scale로 나누고 마스크는 내용 영역만 남긴다.
+    """
+    boxes = results.boxes
+    if boxes is None or len(boxes) == 0:
+        return None
+
+    xyxy = boxes.xyxy.cpu().numpy()
+    if scale != 1.0:
+        H, W = shape[:2]
+        xyxy = np.clip(xyxy / scale, 0, [W - 1, H - 1, W - 1, H - 1])
+
+    masks = results.masks.data.cpu().numpy() if results.masks is not None else None
+    if masks is not None:
+        masks = content_masks(masks, input_hw or shape[:2], _scaled_hw(shape, scale))
+
+    return {
+        "xyxy": xyxy.astype(int),
+        "cls": boxes.cls.cpu().numpy().astype(int),
+        "conf": boxes.conf.cpu().numpy(),
+        "masks": masks,
+    }
+
+
+def detect_batch(imgs):
+    """여러 프레임을 YOLO 한 번 호출로 탐지 → 입력 순서와 같은 탐지 정보 리스트 (프레임 좌표)
+
+    INFER_RES_MODE가 'full'이 아니면 축소본으로 탐지하고, 축소본은 dets["infer"]에 남겨
+    얼굴 검출에서 같은 배율이면 다시 축소하지 않는다.
+    """
+    if not imgs:
+        return []
+    scales = [infer_scale(img.shape) for img in imgs]
+    inputs = [letterbox(img, s) for img, s in zip(imgs, scales)]
+    with _model_lock, metrics.timer("yolo"):
+        results = model(inputs, verbose=False)
+
+    dets = []
+    for img, s, x, r in zip(imgs, scales, inputs, results):
+        d = _unpack_result(r, img.shape, s, x.shape[:2])
+        if d is not None and s < 1.0:
+            d["infer"] = (x, s)
+        dets.append(d)
+    return dets
+
+
+def _timing_summary(values_ms):
+    """프레임별 소요 시간(ms) 리스트 → 평균 / p95 / 최대 요약"""
+    if not values_ms:
+        return {"frames": 0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    arr = np.asarray(values_ms, dtype=np.float64)
+    return {
+        "frames": int(arr.size),
+        "avg_ms": round(float(arr.mean()), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "max_ms": round(float(arr.max()), 2),
+    }
+
+
+def build_objects(img, dets, stats=None, on_object=None, faces=None, record=None):
+    """탐지 결과 → 마스킹 대상 객체 리스트 [{"bbox", "cls", "regions"}] (얼굴 검출 포함)
+
+    stats(dict)를 주면 stats["face_ms"]에 프레임별 얼굴 검출 소요 시간(ms)을 추가한다.
+    faces(탐지 인덱스 → 얼굴 박스)를 주면 얼굴 검출 없이 그 값을 사용하고 (사이드카 재렌더링),
+    record(dets, person_faces)를 주면 탐지 결과를 넘겨 사이드카에 기록한다.
+    """
+    from time import perf_counter
+
+    # 객체 탐지 없는 경우
+    if dets is None:
+        if record is not None:
+            record(None, {})
+        return []
+
+    masks = dets["masks"]
+    cls_ids = dets["cls"]
+    keep = dets["conf"] >= CONF_THRESHOLD
+
+    # 사람 박스 전체에 대해 얼굴 검출을 한 번에 수행 (detection only)
+    person_idx = [j for j in range(len(cls_ids)) if keep[j] and cls_ids[j] == 0]
+    person_faces = {}
+    if faces is not None:
+        person_faces = {j: faces.get(j, np.zeros((0, 4), dtype=np.float32)) for j in person_idx}
+    elif person_idx:
+        t0 = perf_counter()
+        faces = detect_person_faces(img, [tuple(dets["xyxy"][j]) for j in person_idx], infer=dets.get("infer"))
+        person_faces = dict(zip(person_idx, faces))
+        if stats is not None:
+            stats.setdefault("face_ms", []).append((perf_counter() - t0) * 1000)
+
+    if record is not None:
+        record(dets, person_faces)
+
+    objects = []
+    for j, cls_id in enumerate(cls_ids):
+        x1, y1, x2, y2 = dets["xyxy"][j]
+        if not keep[j]:
+            continue
+
+        # --- 객체별 분기 ---
+        if cls_id == 0:
+            regions = person_regions(img.shape, x1, y1, x2, y2, person_faces[j], masks, j)
+        elif cls_id == 1:
+            regions = vehicle_regions(img.shape, x1, y1, x2, y2, masks, j)
+        else:
+            regions = []
+
+        objects.append({"bbox": (int(x1), int(y1), int(x2), int(y2)), "cls": int(cls_id), "regions": regions})
+        if on_object is not None:
+            on_object(j, len(cls_ids))
+
+    return objects
+
+
+def render_objects(img, objects, blur_mode=BLUR_MODE, out=None):
+    """객체들의 마스킹 영역을 합성 (SINGLE_PASS_COMPOSITE면 한 번에, 아니면 객체별 순차)"""
+    out = img.copy() if out is None else out
+
+    if not SINGLE_PASS_COMPOSITE:
+        for obj in objects:
+            out = composite_regions(out, obj["regions"], blur_mode=blur_mode, feather_px=FEATHER_PX, out=out)
+        return out
+
+    # 모든 객체 영역을 한 번에 합성 (블러는 ROI에서만, 블렌딩은 1회)
+    regions = [r for obj in objects for r in obj["regions"]]
+    return composite_regions(img, regions, blur_mode=blur_mode, feather_px=FEATHER_PX, out=out)
+
+
+def mask_frame(img, blur_mode=BLUR_MODE, on_object=None, dets=None, stats=None, record=None):
+    """단일 프레임 객체별 마스킹 → (마스킹된 프레임, 탐지 수)
+
+    dets를 주지 않으면 이 프레임만 YOLO로 탐지한다 (배치 탐지 결과는 detect_batch 사용).
+    """
+    if dets is None:
+        dets = detect_batch([img])[0]
+
+    objects = build_objects(img, dets, stats=stats, on_object=on_object, record=record)
+    return render_objects(img, objects, blur_mode), len(objects)
+
+
+def partial_record(recorder, frame_idx):
+    """recorder.add(frame_idx, dets, person_faces)를 build_objects의 record 콜백으로 변환"""
+    if recorder is None:
+        return None
+    return lambda dets, person_faces: recorder.add(frame_idx, dets, person_faces)
+
+
+def _make_tracker(tracking, detect_interval):
+    if not tracking:
+        return None
+    from app.services.tracker import DetectionTracker
+    return DetectionTracker(
+        detect_interval=detect_interval,
+        min_confidence=TRACK_MIN_CONFIDENCE,
+        hold_frames=TRACK_HOLD_FRAMES,
+    )
+
+
+def mask_frame_tracked(img, tracker, blur_mode=BLUR_MODE, stats=None, record=None):
+    """추적 모드 마스킹 — 키프레임에서만 YOLO/얼굴 검출, 나머지는 tracker가 영역을 이동"""
+    def detect():
+        return build_objects(img, detect_batch([img])[0], stats=stats, record=record)
+
+    objects = tracker.step(img, detect)
+    return render_objects(img, objects, blur_mode), len(objects)
+
+
+def _frame_pipeline(tracker, blur_mode, batch_size, stats, recorder, read=None, write=None, parallel_write=False):
+    """청크 프레임 처리 단계 구성 → pipeline.Pipeline
+
+    항목은 프레임별 dict {"i", "img" 또는 "path", "objects", "out", "result"}이며 단계마다 채워진다.
+      read(path) → 프레임 (frames 모드 imread, 없으면 source가 이미 프레임을 줌)
+      탐지 → build_objects (추적 모드는 추적기 상태가 있으므로 순서대로 1스레드)
+      합성 → render_objects (상태 없음, 여러 스레드)
+      write(i, out) → 인코딩 / 저장 (파이프 인코더는 순서대로 1스레드, parallel_write면 여러 스레드)
+    """
+    from app.services import pipeline
+
+    record_lock = threading.Lock()
+
+    def record_for(i):
+        record = partial_record(recorder, i)
+        if record is None:
+            return None
+
+        def locked(dets, person_faces):
+            with record_lock:   # 탐지 스레드가 여러 개여도 사이드카 기록은 하나씩
+                record(dets, person_faces)
+        return locked
+
+    def decode(items):
+        for f in items:
+            with metrics.timer("imread"):
+                f["img"] = read(f["path"])
+        return items
+
+    def detect(items):
+        frames = [f for f in items if f["img"] is not None]
+        if tracker is not None:
+            for f in frames:
+                img, record = f["img"], record_for(f["i"])
+                f["objects"] = tracker.step(img, lambda: build_objects(img, detect_batch([img])[0],
+                                                                      stats=stats, record=record))
+        else:
+            for f, dets in zip(frames, detect_batch([f["img"] for f in frames])):
+                f["objects"] = build_objects(f["img"], dets, stats=stats, record=record_for(f["i"]))
+        return items
+
+    def composite(items):
+        for f in items:
+            if f["img"] is not None:
+                # 디코딩한 프레임은 이후 다시 읽지 않으므로 그 위에 바로 합성 (프레임 복사 없음)
+                f["out"] = render_objects(f["img"], f["objects"], blur_mode, out=f["img"])
+                f["img"] = None
+        return items
+
+    def encode(items):
+        for f in items:
+            if f.get("out") is not None:
+                f["result"] = write(f["i"], f["out"])
+                f["out"] = None
+        return items
+
+    stages = []
+    if read is not None:
+        stages.append(pipeline.Stage("decode", decode, workers=pipeline.DECODE_WORKERS))
+    if tracker is not None:
+        stages.append(pipeline.Stage("detect", detect, ordered=True))
+    else:
+        stages.append(pipeline.Stage("detect", detect, workers=pipeline.DETECT_WORKERS, batch=max(1, batch_size)))
+    if write is not None:
+        stages.append(pipeline.Stage("composite", composite, workers=pipeline.COMPOSITE_WORKERS))
+        stages.append(pipeline.Stage("encode", encode, workers=pipeline.IMWRITE_WORKERS, ordered=not parallel_write))
+    return pipeline.Pipeline(stages)
+
+
+def analyze(frame_files, file_id, chunk_idx=None, total_chunks=None, blur_mode=BLUR_MODE,
+            batch_size=BATCH_SIZE, tracking=TRACKING, detect_interval=TRACK_DETECT_INTERVAL, recorder=None):
+    """프레임 단위로 진행률을 보고하는 analyze 함수 (프레임 디렉터리 / 디버그용)
+
+    recorder(detections.DetectionRecorder)를 주면 탐지를 실행한 프레임의 결과를 기록한다.
+    imread / 탐지 / 합성 / imwrite는 pipeline 단계 스레드에서 겹쳐 실행된다.
+    """
     from time import time
 
-    if model is None or face_app is None:
+    if not ensure_models():
         logger.error("모델이 로드되지 않았습니다.")
         return {"error": "모델이 로드되지 않았습니다.", "images": [], "total_detections": 0}
 
@@ -264,85 +939,228 @@ def analyze(frame_files, file_id, chunk_idx=None, total_chunks=None, blur_mode=B
     total_frames = len(frame_files)
     processed_images = []
     total_detections = 0
+    stats = {"face_ms": []}
+    tracker = _make_tracker(tracking, detect_interval)
 
     start_time = time()
     logger.info(f"[분석 시작] file_id={file_id}, chunk={chunk_idx}, 총 {total_frames} 프레임")
 
-    for i, frame_path in enumerate(frame_files):
-        if not os.path.exists(frame_path):
-            logger.warning(f"⚠️ 프레임 없음: {frame_path}")
-            continue
-
-        img = cv2.imread(frame_path)
-        if img is None:
-            continue
-
-        # YOLO 탐지
-        results = model(img, verbose=False)[0]
-        out = img.copy()
-        masks = results.masks.data.cpu().numpy() if results.masks is not None else None
-        boxes = results.boxes
-
-        # 객체 탐지 없는 경우
-        if boxes is None or len(boxes) == 0:
-            cv2.imwrite(os.path.join(result_dir, f"processed_frame_{i:04d}.jpg"), out)
-            continue
-
-        cls_ids = boxes.cls.cpu().numpy().astype(int)
-        for j, cls_id in enumerate(cls_ids):
-            x1, y1, x2, y2 = boxes.xyxy[j].cpu().numpy().astype(int)
-            conf = float(boxes.conf[j].cpu().numpy())
-            if conf < 0.3:
+    def source():
+        for i, frame_path in enumerate(frame_files):
+            if not os.path.exists(frame_path):
+                logger.warning(f"⚠️ 프레임 없음: {frame_path}")
                 continue
+            yield {"i": i, "path": frame_path}
 
-            # --- 객체별 분기 ---
-            if cls_id == 0:
-                out = process_person_with_face_detection(img, out, x1, y1, x2, y2, masks, j, blur_mode)
-            elif cls_id == 1:
-                out = process_vehicle(out, x1, y1, x2, y2, masks, j, blur_mode)
-
-            total_detections += 1
-
-            # 🔸 (1) 객체별 부분 진행률 업데이트 (더 부드러운 SSE 표시용)
-            if file_id in PROCESS_STATUS and chunk_idx is not None and total_chunks is not None:
-                with PROCESS_LOCK:
-                    # 한 프레임 내 객체 비율 반영 (예: 0.1%)
-                    partial = ((i + j / len(cls_ids)) / total_frames) * 100
-                    PROCESS_STATUS[file_id]["chunks"][chunk_idx] = partial
-                    avg = sum(PROCESS_STATUS[file_id]["chunks"]) / total_chunks
-                    PROCESS_STATUS[file_id]["progress"] = round(10 + avg * 0.85, 2)
-                    PROCESS_STATUS[file_id]["stage"] = (
-                        f"청크 {chunk_idx+1}/{total_chunks} - 프레임 {i+1}/{total_frames}"
-                    )
-
+    def save(i, out):
         # --- 프레임 저장 ---
         output_path = os.path.join(result_dir, f"processed_frame_{i:04d}.jpg")
-        cv2.imwrite(output_path, out)
-        processed_images.append(output_path)
-
-        # 🔸 (2) 프레임 단위 진행률 업데이트
-        if file_id in PROCESS_STATUS and chunk_idx is not None and total_chunks is not None:
-            local_progress = ((i + 1) / total_frames) * 100
-            with PROCESS_LOCK:
-                PROCESS_STATUS[file_id]["chunks"][chunk_idx] = local_progress
-                avg_progress = sum(PROCESS_STATUS[file_id]["chunks"]) / total_chunks
-                PROCESS_STATUS[file_id]["progress"] = round(10 + avg_progress * 0.85, 2)
-                PROCESS_STATUS[file_id]["stage"] = (
-                    f"청크 {chunk_idx+1}/{total_chunks} - 프레임 {i+1}/{total_frames}"
-                )
-                logger.info(f"[진행률] {file_id}: {PROCESS_STATUS[file_id]['progress']}%")
+        with metrics.timer("imwrite"):
+            cv2.imwrite(output_path, out)
+        return output_path
+
+    run = _frame_pipeline(tracker, blur_mode, batch_size, stats, recorder,
+                          read=cv2.imread, write=save, parallel_write=True)
+    for f in run.run(source()):
+        if "result" not in f:
+            continue   # 읽지 못한 프레임
+        total_detections += len(f["objects"])
+        processed_images.append(f["result"])
+
+        # 🔸 프레임 단위 진행률 업데이트 (반영 간격은 state에서 조절)
+        i = f["i"]
+        local_progress = min(99.0, ((i + 1) / total_frames) * 100)
+        _update_progress(file_id, chunk_idx, total_chunks, local_progress, i + 1, total_frames, total_detections)
 
     elapsed = round(time() - start_time, 2)
+    face_timing = _timing_summary(stats["face_ms"])
     logger.info(f"[✅ 완료] file_id={file_id}, chunk={chunk_idx}, {total_detections}개 탐지, {elapsed}s 소요")
+    logger.info(f"[FACE 타이밍] chunk={chunk_idx}, {face_timing}")
+    if tracker is not None:
+        logger.info(f"[추적] chunk={chunk_idx}, {tracker.stats()}")
 
     return {
         "status": "success",
         "images": processed_images,
-        "total_detections": total_detections
+        "total_detections": total_detections,
+        "face_timing": face_timing,
+        "tracking": tracker.stats() if tracker is not None else None,
+    }
+
+
+# ======================================
+# 🔹 analyze_stream — 디스크 I/O 없는 스트리밍 버전
+# ======================================
+def analyze_stream(frames, writer, file_id, chunk_idx=None, total_chunks=None,
+                   total_frames=None, blur_mode=BLUR_MODE, batch_size=BATCH_SIZE,
+                   tracking=TRACKING, detect_interval=TRACK_DETECT_INTERVAL, recorder=None):
+    """NumPy 프레임 이터레이터를 마스킹해 writer(FrameWriter)로 바로 전달 (JPEG 저장/재로드 없음)
+
+    디코딩(frames 순회) / 탐지 / 합성 / 인코딩(writer.write)은 pipeline 단계 스레드에서 겹쳐 실행되고,
+    writer에는 입력 순서대로 쓴다. 합성은 frames가 준 배열 위에 바로 하므로 입력 프레임이 바뀐다.
+    """
+    from time import time
+
+    if not ensure_models():
+        logger.error("모델이 로드되지 않았습니다.")
+        return {"error": "모델이 로드되지 않았습니다.", "frames": 0, "total_detections": 0}
+
+    total_frames = max(1, total_frames or 1)
+    frame_count = 0
+    total_detections = 0
+    stats = {"face_ms": []}
+    tracker = _make_tracker(tracking, detect_interval)
+
+    start_time = time()
+    logger.info(f"[스트리밍 분석 시작] file_id={file_id}, chunk={chunk_idx}, 약 {total_frames} 프레임")
+
+    run = _frame_pipeline(tracker, blur_mode, batch_size, stats, recorder, write=lambda i, out: writer.write(out))
+    for f in run.run({"i": i, "img": img} for i, img in enumerate(frames)):
+        i = f["i"]
+        total_detections += len(f["objects"])
+        frame_count += 1
+
+        # 프레임 수는 추정치이므로 100%를 넘지 않도록 보정
+        local_progress = min(99.0, ((i + 1) / total_frames) * 100)
+        _update_progress(file_id, chunk_idx, total_chunks, local_progress, i + 1, total_frames, total_detections)
+
+    elapsed = round(time() - start_time, 2)
+    face_timing = _timing_summary(stats["face_ms"])
+    logger.info(f"[✅ 완료] file_id={file_id}, chunk={chunk_idx}, {frame_count} 프레임, {total_detections}개 탐지, {elapsed}s 소요")
+    logger.info(f"[FACE 타이밍] chunk={chunk_idx}, {face_timing}")
+    if tracker is not None:
+        logger.info(f"[추적] chunk={chunk_idx}, {tracker.stats()}")
+
+    return {
+        "status": "success",
+        "frames": frame_count,
+        "total_detections": total_detections,
+        "face_timing": face_timing,
+        "tracking": tracker.stats() if tracker is not None else None,
     }
 
 
 # ======================================
-# 🔹 모델 자동 로드
+# 🔹 detect_stream — 탐지만 수행 (합성 / 인코딩 없음, 구간 통과 모드 1차 패스)
 # ======================================
-load_model()
+def detect_stream(frames, file_id, chunk_idx=None, total_chunks=None, total_frames=None,
+                  batch_size=BATCH_SIZE, recorder=None, progress=(0.0, 100.0)):
+    """프레임마다 탐지 + 얼굴 검출만 수행해 recorder에 기록 → (프레임별 마스킹 대상 여부, 요약)
+
+    마스킹할 영역이 하나도 없는 프레임은 False — 이런 프레임만으로 된 GOP는 재인코딩 없이 복사할 수 있다.
+    디코딩과 탐지는 pipeline 단계 스레드에서 겹쳐 실행된다.
+    """
+    from time import time
+
+    if not ensure_models():
+        logger.error("모델이 로드되지 않았습니다.")
+        return [], {"error": "모델이 로드되지 않았습니다.", "frames": 0, "total_detections": 0}
+
+    total_frames = max(1, total_frames or 1)
+    dirty = []
+    total_detections = 0
+    stats = {"face_ms": []}
+    lo, hi = progress
+
+    start_time = time()
+    run = _frame_pipeline(None, BLUR_MODE, batch_size, stats, recorder)
+    for f in run.run({"i": i, "img": img} for i, img in enumerate(frames)):
+        i = len(dirty)
+        objects = f["objects"]
+        dirty.append(any(obj["regions"] for obj in objects))
+        total_detections += len(objects)
+
+        local_progress = min(99.0, lo + (hi - lo) * (i + 1) / total_frames)
+        _update_progress(file_id, chunk_idx, total_chunks, local_progress, i + 1, total_frames, total_detections)
+
+    elapsed = round(time() - start_time, 2)
+    logger.info(f"[탐지 패스 완료] file_id={file_id}, chunk={chunk_idx}, {len(dirty)} 프레임 중 "
+                f"{sum(dirty)} 프레임 마스킹 대상, {elapsed}s 소요")
+
+    return dirty, {
+        "status": "success",
+        "frames": len(dirty),
+        "total_detections": total_detections,
+        "face_timing": _timing_summary(stats["face_ms"]),
+        "tracking": None,
+    }
+
+
+# ======================================
+# 🔹 render_stream — 사이드카 탐지 결과로 다시 합성 (YOLO / 얼굴 검출 없음)
+# ======================================
+def render_stream(frames, writer, sidecar, file_id, chunk_idx=None, total_chunks=None,
+                  total_frames=None, blur_mode=BLUR_MODE, tracking=TRACKING,
+                  detect_interval=TRACK_DETECT_INTERVAL, frame_offset=0, progress=(0.0, 100.0)):
+    """기록된 탐지 결과(detections.DetectionSidecar)로 영역을 다시 만들어 합성만 수행
+
+    추적 모드는 같은 프레임 / 같은 탐지 결과로 추적기를 다시 돌리므로 키프레임도 원래와 같다.
+    frame_offset: frames의 첫 프레임이 청크에서 몇 번째 프레임인지 (청크 일부 구간만 렌더링할 때)
+    progress: 이 호출이 차지하는 청크 진행률 범위 (%)
+    """
+    from time import time
+
+    total_frames = max(1, total_frames or 1)
+    frame_count = 0
+    total_detections = 0
+    missing = 0
+    tracker = _make_tracker(tracking, detect_interval)
+
+    start_time = time()
+    logger.info(f"[재렌더링 시작] file_id={file_id}, chunk={chunk_idx}, 약 {total_frames} 프레임")
+
+    lo, hi = progress
+    for i, img in enumerate(frames, start=frame_offset):
+        def detect(i=i, img=img):
+            nonlocal missing
+            if i not in sidecar:
+                missing += 1
+            dets, faces = sidecar.get(i)
+            return build_objects(img, dets, faces=faces)
+
+        objects = tracker.step(img, detect) if tracker is not None else detect()
+        out = render_objects(img, objects, blur_mode)
+        total_detections += len(objects)
+        writer.write(out)
+        frame_count += 1
+
+        local_progress = min(99.0, lo + (hi - lo) * (i + 1) / total_frames)
+        _update_progress(file_id, chunk_idx, total_chunks, local_progress, i + 1, total_frames, total_detections)
+
+    elapsed = round(time() - start_time, 2)
+    if missing:
+        logger.warning(f"[재렌더링] chunk={chunk_idx}, 기록 없는 프레임 {missing}개 (마스킹 없이 출력)")
+    logger.info(f"[✅ 재렌더링 완료] file_id={file_id}, chunk={chunk_idx}, {frame_count} 프레임, {elapsed}s 소요")
+
+    return {
+        "status": "success",
+        "frames": frame_count,
+        "total_detections": total_detections,
+        "face_timing": None,
+        "tracking": tracker.stats() if tracker is not None else None,
+    }
+
+
+# ======================================
+# 🔹 워밍업
+# ======================================
+def warm_up():
+    """모델 로드 + 빈 프레임으로 YOLO / 얼굴 검출 1회 실행 (첫 요청에서 그래프 준비 / 메모리 할당 지연 제거)"""
+    global WARMED_UP
+    from time import perf_counter
+
+    if WARMED_UP:
+        return True
+    t0 = perf_counter()
+    if not ensure_models():
+        return False
+
+    dummy = np.zeros((inference.INFERENCE_IMGSZ, inference.INFERENCE_IMGSZ, 3), dtype=np.uint8)
+    try:
+        detect_batch([dummy])
+        detect_faces_frame(dummy)
+    except Exception as e:
+        logger.warning(f"워밍업 추론 실패 (모델은 로드됨): {e}")
+    WARMED_UP = True
+    logger.info(f"🔥 워밍업 완료 ({perf_counter() - t0:.1f}s)")
+    return True
@@ -0,0 +1,157 @@
+# cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from app.services import ai_engine, combine, inference
+
+# ======================================
+# 🔹 결과 캐시 설정
+# ======================================
+# 같은 영상 + 같은 마스킹 설정이면 기존 _final.mp4를 그대로 돌려준다.
+# detections/ 하위에는 재렌더링용 탐지 결과 저장소(detections.py)가 들어간다.
+# 캐시 항목은 results/와 별도 디렉터리에 두므로 cleanup_old_results의 1시간 만료와 무관하며,
+# 대신 evict()가 크기 / 마지막 사용 시각 기준으로 정리한다.
+CACHE_DIR = os.getenv("PID_CACHE_DIR", "./cache")
+CACHE_MAX_BYTES = int(float(os.getenv("PID_CACHE_MAX_GB", "20")) * 1024 ** 3)   # 캐시 전체 크기 상한
+CACHE_MAX_AGE = float(os.getenv("PID_CACHE_MAX_DAYS", "7")) * 86400            # 마지막 사용 후 보관 기간
+
+_lock = threading.Lock()
+
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+# ======================================
+# 🔹 캐시 키
+# ======================================
+def masking_settings(pipeline_mode: str, engine_opts: Dict, encode_profile: Optional[str] = None,
+                     copy_unmasked: Optional[bool] = None) -> Dict:
+    """결과 영상에 영향을 주는 설정만 모음 (batch_size 등 속도 관련 옵션은 제외)"""
+    tracking = bool(engine_opts.get("tracking", ai_engine.TRACKING))
+    return {
+        "blur_mode": engine_opts.get("blur_mode", ai_engine.BLUR_MODE),
+        "feather_px": ai_engine.FEATHER_PX,
+        "face_pad_ratio": ai_engine.FACE_PAD_RATIO,
+        "conf_threshold": ai_engine.CONF_THRESHOLD,
+        "fallback_to_person_mask": ai_engine.FALLBACK_TO_PERSON_MASK,
+        "face_detect_mode": ai_engine.FACE_DETECT_MODE,
+        "infer_res": (ai_engine.INFER_RES_MODE, ai_engine.INFER_MAX_SIDE),
+        "tracking": tracking,
+        "detect_interval": engine_opts.get("detect_interval", ai_engine.TRACK_DETECT_INTERVAL) if tracking else None,
+        "pipeline_mode": pipeline_mode,
+        "encode": combine.encode_profile(encode_profile, copy_unmasked=copy_unmasked),
+        "model": inference.model_checksum(),
+        "backend": inference.INFERENCE_BACKEND,       # 런타임마다 탐지 결과가 조금씩 다를 수 있음
+        "precision": inference.INFERENCE_PRECISION,   # 양자화 모델은 탐지 결과가 달라질 수 있음
+    }
+
+
+def detection_settings(engine_opts: Dict) -> Dict:
+    """탐지 결과(사이드카)에 영향을 주는 설정 — 블러 / 패딩 / 신뢰도 기준은 렌더링 시점에 적용하므로 제외"""
+    tracking = bool(engine_opts.get("tracking", ai_engine.TRACKING))
+    return {
+        "kind": "detections",
+        "face_detect_mode": ai_engine.FACE_DETECT_MODE,
+        "infer_res": (ai_engine.INFER_RES_MODE, ai_engine.INFER_MAX_SIDE),
+        "tracking": tracking,
+        "detect_interval": engine_opts.get("detect_interval", ai_engine.TRACK_DETECT_INTERVAL) if tracking else None,
+        "model": inference.model_checksum(),
+        "backend": inference.INFERENCE_BACKEND,
+        "precision": inference.INFERENCE_PRECISION,
+    }
+
+
+def cache_key(video_sha256: str, settings: Dict) -> str:
+    payload = json.dumps({"video": video_sha256, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.mp4")
+
+
+# ======================================
+# 🔹 조회 / 저장
+# ======================================
+def link_or_copy(src: str, dst: str) -> None:
+    """같은 파일시스템이면 하드링크 (디스크 추가 사용 없음), 아니면 복사"""
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def lookup(key: str, out_path: str) -> bool:
+    """캐시에 있으면 out_path에 결과 영상을 만들고 True"""
+    path = _entry_path(key)
+    with _lock:
+        if not os.path.exists(path):
+            return False
+        os.utime(path)   # 마지막 사용 시각 갱신 (LRU 기준)
+        link_or_copy(path, out_path)
+    print(f"[⚡ 캐시 적중] {key[:12]} → {out_path}")
+    return True
+
+
+def store(key: str, final_path: str, settings: Optional[Dict] = None) -> None:
+    """완성된 _final.mp4를 캐시에 등록"""
+    path = _entry_path(key)
+    with _lock:
+        link_or_copy(final_path, path)
+        with open(os.path.join(CACHE_DIR, f"{key}.json"), "w") as f:
+            json.dump({"settings": settings or {}, "stored_at": time.time()}, f)
+    print(f"[💾 캐시 저장] {key[:12]}")
+
+
+# ======================================
+# 🔹 정리 (cleanup_old_results 루프에서 호출)
+# ======================================
+def _entries():
+    """(마지막 사용 시각, 크기, 경로) — 결과 영상 파일 + 탐지 결과 디렉터리"""
+    entries = []
+    for f in os.listdir(CACHE_DIR):
+        if f.endswith(".mp4"):
+            st = os.stat(os.path.join(CACHE_DIR, f))
+            entries.append((st.st_mtime, st.st_size, os.path.join(CACHE_DIR, f)))
+
+    det_dir = os.path.join(CACHE_DIR, "detections")
+    if os.path.isdir(det_dir):
+        for d in os.listdir(det_dir):
+            path = os.path.join(det_dir, d)
+            manifest = os.path.join(path, "manifest.json")
+            if not os.path.exists(manifest):   # 등록 중(.tmp)인 항목은 건너뜀
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(manifest), size, path))
+    return entries
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES, max_age: float = CACHE_MAX_AGE) -> None:
+    """오래 사용하지 않은 항목 삭제 후, 전체 크기가 상한을 넘으면 오래된 순으로 삭제"""
+    now = time.time()
+    with _lock:
+        entries = sorted(_entries())
+        total = sum(size for _, size, _ in entries)
+        for used_at, size, path in entries:
+            if now - used_at <= max_age and total <= max_bytes:
+                break
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                    meta = path[:-len(".mp4")] + ".json"
+                    if os.path.exists(meta):
+                        os.remove(meta)
+                total -= size
+                print(f"[🧹 캐시 삭제] {os.path.basename(path)}")
+            except OSError as e:
+                print(f"[⚠️ 삭제 실패] {path}: {e}")
@@ -0,0 +1,90 @@
+# checkpoint.py
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+# ======================================
+# 🔹 청크 단위 체크포인트 (manifest.json)
+# ======================================
+# 청크 디렉터리에 함께 저장되며, 작업이 성공적으로 끝나 청크 디렉터리가 정리될 때 같이 삭제된다.
+# 예시:
+# {
+#     "source": "./uploads/<file_id>_video.mp4",
+#     "chunks": [{"source": ..., "start_frame": 0, "frames": 250, "seek": null, ...}, ...],
+#     "done": {"0": {"video": "./chunks/<file_id>/chunk_0.mp4", "size": 123456, "summary": {...}}}
+# }
+MANIFEST_NAME = "manifest.json"
+
+
+class ChunkManifest:
+    """분할 결과와 완료된 청크(인코딩된 mp4)를 기록해 재실행 시 완료된 청크를 건너뜀"""
+
+    def __init__(self, path: str, data: Dict) -> None:
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def load(cls, chunk_dir: str, source: str) -> "ChunkManifest":
+        """기존 manifest를 불러오고, 없거나 다른 원본의 것이면 새로 만듦"""
+        os.makedirs(chunk_dir, exist_ok=True)
+        path = os.path.join(chunk_dir, MANIFEST_NAME)
+        data = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[⚠️ manifest 손상 → 새로 시작] {path}: {e}")
+                data = None
+        if not data or data.get("source") != source:
+            data = {"source": source, "chunks": [], "done": {}, "created_at": time.time()}
+        return cls(path, data)
+
+    # ----------------------------------
+    # 분할 결과
+    # ----------------------------------
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        """기록된 청크 구간 목록 (구간의 원본 파일이 하나라도 없으면 빈 리스트 → 다시 계획)"""
+        chunks = self.data.get("chunks") or []
+        if not all(isinstance(c, dict) and os.path.exists(c["source"]) for c in chunks):
+            return []
+        return chunks
+
+    def set_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        self.data["chunks"] = list(chunks)
+        self.data["done"] = {}
+        self.save()
+
+    # ----------------------------------
+    # 청크 완료 기록
+    # ----------------------------------
+    def is_done(self, idx: int) -> bool:
+        """완료 기록이 있고 인코딩된 청크 파일이 기록된 크기 그대로 남아 있는지 확인"""
+        entry = self.data["done"].get(str(idx))
+        if not entry:
+            return False
+        video = entry["video"]
+        return os.path.exists(video) and os.path.getsize(video) == entry["size"]
+
+    def mark_done(self, idx: int, video: str, summary: Optional[Dict] = None) -> None:
+        self.data["done"][str(idx)] = {
+            "video": video,
+            "size": os.path.getsize(video),
+            "summary": summary or {},
+            "finished_at": time.time(),
+        }
+        self.save()
+
+    def summary(self, idx: int) -> Dict:
+        return self.data["done"][str(idx)].get("summary", {})
+
+    def save(self) -> None:
+        """임시 파일에 쓴 뒤 교체 (쓰는 도중 종료돼도 manifest가 깨지지 않음)"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
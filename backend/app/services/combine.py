@@ -3,23 +3,119 @@ from __future__ import annotations
 
 import os
 import glob
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple, Union
 import ffmpeg
 
+from app.services import metrics
+
+# ======================================
+# 🔹 인코딩 프로파일
+# ======================================
+# 청크 인코딩 속도 / 화질 트레이드오프. "balanced"가 기존 기본값(libx264 medium, crf 18)이다.
+ENCODE_PROFILES = {
+    "fast": {"codec": "libx264", "preset": "veryfast", "crf": 23},
+    "balanced": {"codec": "libx264", "preset": "medium", "crf": 18},
+    "quality": {"codec": "libx264", "preset": "slow", "crf": 16},
+    "hevc": {"codec": "libx265", "preset": "medium", "crf": 22},
+}
+ENCODE_PROFILE = os.getenv("PID_ENCODE_PROFILE", "balanced")
+ENCODE_THREADS = int(os.getenv("PID_ENCODE_THREADS", "0"))       # 인코더 1개당 스레드 수 (0 = ffmpeg 자동)
+COPY_UNMASKED = os.getenv("PID_COPY_UNMASKED", "0") == "1"        # 탐지 없는 청크 / GOP 구간은 원본 스트림 복사
+
+# 원본 코덱 → 같은 비트스트림 형식의 인코더 (스트림 복사 청크와 이어붙일 수 있는지 판단)
+_CODEC_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+
+def encode_profile(name: Optional[str] = None, threads: Optional[int] = None,
+                   copy_unmasked: Optional[bool] = None) -> Dict:
+    """프로파일 이름 → FrameWriter / combine_frames에 넘길 인코딩 옵션"""
+    name = name or ENCODE_PROFILE
+    if name not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown encode profile: {name}")
+    return dict(
+        ENCODE_PROFILES[name],
+        threads=ENCODE_THREADS if threads is None else threads,
+        copy_unmasked=COPY_UNMASKED if copy_unmasked is None else bool(copy_unmasked),
+    )
+
+
+def can_copy_segments(chunk: Dict, profile: Dict) -> bool:
+    """원본 비트스트림이 인코딩 결과와 같은 코덱 / 픽셀 포맷이라 구간 단위로 섞어 이어붙일 수 있는지"""
+    return (
+        profile.get("copy_unmasked", False)
+        and _CODEC_ENCODERS.get(chunk.get("codec")) == profile["codec"]
+        and chunk.get("pix_fmt") == "yuv420p"
+    )
+
+
+def can_copy(chunk: Dict, profile: Dict) -> bool:
+    """탐지 없는 청크를 재인코딩 대신 원본 스트림 복사로 대체할 수 있는지
+
+    키프레임에서 시작해 다음 키프레임(또는 파일 끝) 직전에서 끝나고, 원본 비트스트림이
+    인코딩 결과와 같은 코덱 / 픽셀 포맷이어야 concat -c copy로 문제없이 이어진다.
+    """
+    return (
+        can_copy_segments(chunk, profile)
+        and chunk.get("keyframe", False)
+        and chunk.get("ends_on_keyframe", False)
+    )
+
+
+def plan_segments(dirty: List[bool], keyframes: List[int], starts_on_keyframe: bool,
+                  ends_on_keyframe: bool) -> List[Tuple[int, int, bool]]:
+    """청크를 GOP(키프레임 ~ 다음 키프레임 직전) 단위로 나눠 복사 / 인코딩 구간 계획
+
+    dirty: 프레임별 마스킹 대상 여부, keyframes: 청크 내부 키프레임 번호 (청크 기준)
+    반환: [(시작 프레임, 끝 프레임(미포함), 복사 여부)] — 같은 종류의 이웃 GOP는 하나로 합친다.
+    마스킹할 프레임이 하나라도 있거나 키프레임 경계에 맞지 않는 GOP(청크 앞뒤의 잘린 GOP)는 인코딩한다.
+    """
+    n = len(dirty)
+    bounds = [0] + [k for k in keyframes if 0 < k < n] + [n]
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        copy = (
+            not any(dirty[start:end])
+            and (start > 0 or starts_on_keyframe)
+            and (end < n or ends_on_keyframe)
+        )
+        if segments and segments[-1][2] == copy:
+            segments[-1] = (segments[-1][0], end, copy)
+        else:
+            segments.append((start, end, copy))
+    return segments
+
+
+def _video_args(codec: str, crf: int, preset: str, pix_fmt: str, threads: int = 0,
+                output: Optional[str] = None) -> Dict:
+    """ffmpeg 비디오 인코딩 출력 옵션"""
+    args = {"vcodec": codec, "crf": crf, "preset": preset, "pix_fmt": pix_fmt}
+    if threads:
+        args["threads"] = threads
+    if codec == "libx265":
+        if output is None or output.endswith((".mp4", ".mov")):
+            args["tag:v"] = "hvc1"                # mp4에서 Safari / QuickTime 재생용
+        args["x265-params"] = "log-level=error"
+    return args
+
+
 # ======================================
 # 🔹 프레임 → 영상 합성
 # ======================================
 def combine_frames(
     frames_glob: str,
     output_video: str,
-    framerate: float = 30.0,
+    framerate: Union[float, str] = 30.0,
     codec: str = "libx264",
     crf: int = 18,
     preset: str = "medium",
     pix_fmt: str = "yuv420p",
     audio_from: Optional[str] = None,
+    threads: int = 0,
 ) -> str:
-    """프레임 이미지들을 받아 하나의 영상(mp4)으로 합성"""
+    """프레임 이미지들을 받아 하나의 영상(mp4)으로 합성
+
+    framerate는 원본 타이밍 유지를 위해 "30000/1001" 같은 비율 문자열도 받는다.
+    """
 
     # printf 스타일 패턴('%d')을 사용한 경우
     use_pattern_type = "%d" in frames_glob or "%0" in frames_glob
@@ -46,43 +142,143 @@ def combine_frames(
         a_in = ffmpeg.input(audio_from)
         stream = ffmpeg.concat(stream, a_in.audio, v=1, a=1).node()
         v, a = stream
-        out = ffmpeg.output(v, a, output_video, vcodec=codec, crf=crf, preset=preset, pix_fmt=pix_fmt)
+        out = ffmpeg.output(v, a, output_video, **_video_args(codec, crf, preset, pix_fmt, threads, output_video))
     # 오디오 없이 영상만 출력
     else:
-        out = ffmpeg.output(stream, output_video, vcodec=codec, crf=crf, preset=preset, pix_fmt=pix_fmt)
+        out = ffmpeg.output(stream, output_video, **_video_args(codec, crf, preset, pix_fmt, threads, output_video))
 
     # ffmpeg 실행 (로그 최소화)
-    (
-        out
-        .global_args("-hide_banner")
-        .global_args("-loglevel", "error")
-        .overwrite_output()
-        .run()
-    )
+    with metrics.timer("ffmpeg_combine"):
+        (
+            out
+            .global_args("-hide_banner")
+            .global_args("-loglevel", "error")
+            .overwrite_output()
+            .run()
+        )
 
     return output_video
 
+# ======================================
+# 🔹 NumPy 프레임 → 영상 인코딩 (파이프, 디스크 미사용)
+# ======================================
+class FrameWriter:
+    """raw BGR 프레임을 ffmpeg stdin 파이프로 넘겨 바로 H.264로 인코딩"""
+
+    def __init__(
+        self,
+        output_video: str,
+        width: int,
+        height: int,
+        framerate: Union[float, str] = 30.0,
+        codec: str = "libx264",
+        crf: int = 18,
+        preset: str = "medium",
+        pix_fmt: str = "yuv420p",
+        threads: int = 0,
+    ) -> None:
+        self.output_video = output_video
+        self.frames_written = 0
+        self._proc = (
+            ffmpeg
+            .input("pipe:", format="rawvideo", pix_fmt="bgr24", s=f"{width}x{height}", framerate=framerate)
+            .output(output_video, **_video_args(codec, crf, preset, pix_fmt, threads, output_video))
+            .global_args("-hide_banner")
+            .global_args("-loglevel", "error")
+            .overwrite_output()
+            .run_async(pipe_stdin=True)
+        )
+
+    def write(self, frame) -> None:
+        # encode_write: 파이프 쓰기 시간 (인코더가 밀려 파이프 버퍼가 차면 여기서 대기)
+        with metrics.timer("encode_write"):
+            self._proc.stdin.write(frame.tobytes())
+        self.frames_written += 1
+
+    def close(self) -> str:
+        # encode_flush: 입력을 닫은 뒤 인코더가 남은 프레임을 마저 인코딩하고 끝날 때까지
+        with metrics.timer("encode_flush"):
+            if self._proc.stdin and not self._proc.stdin.closed:
+                self._proc.stdin.close()
+            returncode = self._proc.wait()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg encode failed: {self.output_video}")
+        return self.output_video
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # 예외 발생 시 인코더만 정리하고 원래 예외를 전파
+            if self._proc.stdin and not self._proc.stdin.closed:
+                self._proc.stdin.close()
+            self._proc.wait()
+
+
 # ======================================
 # 🔹 여러 영상 연결 (Concatenation)
 # ======================================
-def concat_videos(video_list: List[str], out_path: str) -> str:
-    """분할된 여러 영상을 순서대로 하나의 파일로 이어붙임"""
+def concat_videos(video_list: List[str], out_path: str, audio_from: Optional[str] = None) -> str:
+    """분할된 여러 영상을 순서대로 하나의 파일로 이어붙임
+
+    audio_from을 주면 그 파일의 오디오를 재인코딩 없이 함께 넣는다 (오디오가 없으면 영상만).
+    mp4에 넣을 수 없는 오디오 코덱이면 오디오만 AAC로 변환해 다시 시도한다.
+    """
     if not video_list:
         raise ValueError("No videos provided for concatenation")
 
-    # ffmpeg concat용 리스트 파일 작성
-    list_file = os.path.join(os.path.dirname(out_path), "_concat_list.txt")
+    # ffmpeg concat용 리스트 파일 작성 (출력 파일마다 따로 — 동시 작업끼리 겹치지 않도록)
+    list_file = os.path.splitext(out_path)[0] + "_concat.txt"
     with open(list_file, "w") as f:
         for v in video_list:
             f.write(f"file '{os.path.abspath(v)}'\n")
-    
-    # ffmpeg concat 실행
-    (
-        ffmpeg
-        .input(list_file, f="concat", safe=0)
-        .output(out_path, c="copy")
-        .overwrite_output()
-        .run(quiet=True)
-    )
 
+    # mp4는 moov atom을 앞에 두어(faststart) 전체를 받기 전에 재생 / 탐색 가능하게 함
+    mux_args = {"movflags": "+faststart"} if out_path.endswith((".mp4", ".mov")) else {}
+
+    with metrics.timer("ffmpeg_concat"):
+        _concat(list_file, out_path, audio_from, mux_args)
+    return out_path
+
+
+def _concat(list_file: str, out_path: str, audio_from: Optional[str], mux_args: Dict) -> None:
+    video = ffmpeg.input(list_file, f="concat", safe=0)
+    if audio_from is None:
+        video.output(out_path, c="copy", **mux_args).overwrite_output().run(quiet=True)
+        return
+
+    audio = ffmpeg.input(audio_from)
+    try:
+        (
+            ffmpeg
+            .output(video["v"], audio["a?"], out_path, c="copy", **mux_args)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+    except ffmpeg.Error:
+        (
+            ffmpeg
+            .output(video["v"], audio["a?"], out_path, vcodec="copy", acodec="aac", **mux_args)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+
+# ======================================
+# 🔹 원본 구간 스트림 복사 (재인코딩 없음)
+# ======================================
+def copy_range(source: str, out_path: str, seek: Optional[float] = None, frames: Optional[int] = None) -> str:
+    """원본의 [seek, seek + frames) 비디오 구간을 그대로 잘라 저장 (키프레임 경계 구간 전용, can_copy 참고)"""
+    inp = ffmpeg.input(source, ss=seek) if seek is not None else ffmpeg.input(source)
+    out_kwargs = {"frames:v": frames} if frames is not None else {}
+    with metrics.timer("ffmpeg_copy"):
+        (
+            ffmpeg
+            .output(inp["v"], out_path, c="copy", avoid_negative_ts="make_zero", **out_kwargs)
+            .overwrite_output()
+            .run(quiet=True)
+        )
     return out_path
\ No newline at end of file
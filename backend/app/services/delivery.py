@@ -0,0 +1,267 @@
+# delivery.py
+import os
+import math
+import shutil
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import ffmpeg
+
+from app.services import metrics
+
+# ======================================
+# 🔹 결과 영상 전달 설정
+# ======================================
+# /result_video는 Range 요청(206) + ETag / Last-Modified 조건부 요청(304)을 직접 처리해
+# 탐색 시 필요한 구간만 보내고, 다시 열 때는 브라우저 캐시를 그대로 쓰게 한다.
+# HLS_PACKAGE가 켜져 있으면 최종 영상을 재인코딩 없이 HLS(VOD)로도 잘라 둔다 (<file_id>_hls/).
+HLS_PACKAGE = os.getenv("PID_HLS_PACKAGE", "0") == "1"
+PREVIEW_ENABLED = os.getenv("PID_PREVIEW", "1") == "1"            # 처리 중 완료된 청크 미리보기 재생목록
+HLS_SEGMENT_SECONDS = float(os.getenv("PID_HLS_SEGMENT", "4"))   # 목표 길이 (실제 경계는 원본 키프레임)
+RANGE_BLOCK_SIZE = 256 * 1024                                    # 응답 본문 읽기 단위
+HLS_DIR_SUFFIX = "_hls"
+HLS_PLAYLIST = "index.m3u8"
+PREVIEW_DIR_SUFFIX = "_preview_hls"     # 처리 중 미리보기 (HLS_DIR_SUFFIX로 끝나므로 같은 규칙으로 정리됨)
+PREVIEW_PLAYLIST = "preview.m3u8"
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """요청한 Range가 파일 크기를 벗어남 (416)"""
+
+
+# ======================================
+# 🔹 경로 검증
+# ======================================
+def resolve(base_dir: str, filename: str) -> Optional[str]:
+    """base_dir 바로 아래 파일 경로 (경로 구분자 / .. / 심볼릭 링크로 벗어나면 None)"""
+    if not filename or os.path.basename(filename) != filename or filename in (".", ".."):
+        return None
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, filename))
+    if os.path.dirname(path) != base or not os.path.isfile(path):
+        return None
+    return path
+
+
+# ======================================
+# 🔹 조건부 요청 / Range
+# ======================================
+def file_etag(st: os.stat_result) -> str:
+    """크기 + 수정 시각 기반 ETag (내용 해시 없이 stat만으로 계산)"""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def not_modified(headers, etag: str, mtime: float) -> bool:
+    """If-None-Match / If-Modified-Since 기준으로 304를 돌려줄 수 있는지"""
+    from email.utils import parsedate_to_datetime
+
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+    ims = headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def if_range_matches(if_range: str, etag: str, mtime: Optional[float]) -> bool:
+    """If-Range 검사 — ETag 형식이면 강한 ETag 일치, HTTP-date 형식이면 Last-Modified(초 단위)와 일치"""
+    from email.utils import parsedate_to_datetime
+
+    value = if_range.strip()
+    if value.startswith(('"', "W/")):
+        return value == etag   # 약한 ETag(W/)는 항상 불일치 (RFC 9110 13.1.5)
+    if mtime is None:
+        return False
+    try:
+        return int(mtime) == int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_range(header: Optional[str], size: int, etag: str, if_range: Optional[str] = None,
+                mtime: Optional[float] = None) -> Optional[Tuple[int, int]]:
+    """Range 헤더 → (start, end) 포함 구간, 전체 응답이면 None
+
+    여러 구간(multipart) 요청과 형식이 잘못된 헤더는 전체 응답으로 처리한다 (RFC 9110 허용).
+    If-Range(ETag 또는 Last-Modified 날짜)가 현재 파일과 다르면(그사이 파일이 바뀜) 역시 전체 응답.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if if_range is not None and not if_range_matches(if_range, etag, mtime):
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # 접미사 구간: 마지막 N 바이트
+            n = int(last)
+            if n <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(0, size - n), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def iter_file(path: str, start: int, end: int, block_size: int = RANGE_BLOCK_SIZE) -> Iterator[bytes]:
+    """파일의 [start, end] 구간을 블록 단위로 읽어 반환 (전체를 메모리에 올리지 않음)"""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def media_type(path: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+# ======================================
+# 🔹 HLS 패키징 (재인코딩 없음)
+# ======================================
+def hls_dir(result_dir: str, file_id: str) -> str:
+    return os.path.join(result_dir, f"{file_id}{HLS_DIR_SUFFIX}")
+
+
+def package_hls(video_path: str, out_dir: str, segment_seconds: float = HLS_SEGMENT_SECONDS) -> str:
+    """최종 mp4를 스트림 복사로 HLS VOD(index.m3u8 + seg_xxxxx.ts)로 분할 → 재생목록 경로
+
+    재인코딩하지 않으므로 세그먼트는 원본 키프레임에서만 나뉜다 (segment_seconds는 최소 길이).
+    """
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    with metrics.timer("ffmpeg_hls"):
+        (
+            ffmpeg
+            .input(video_path)
+            .output(
+                os.path.join(tmp_dir, HLS_PLAYLIST),
+                c="copy",
+                f="hls",
+                hls_time=segment_seconds,
+                hls_playlist_type="vod",
+                hls_segment_filename=os.path.join(tmp_dir, "seg_%05d.ts"),
+            )
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return os.path.join(out_dir, HLS_PLAYLIST)
+
+
+def hls_url(result_dir: str, file_id: str) -> Optional[str]:
+    """패키징된 HLS 재생목록 URL (없으면 None)"""
+    if not os.path.exists(os.path.join(hls_dir(result_dir, file_id), HLS_PLAYLIST)):
+        return None
+    return f"/result_hls/{file_id}/{HLS_PLAYLIST}"
+
+
+# ======================================
+# 🔹 처리 중 미리보기 (완료된 청크를 순서대로 늘어나는 HLS EVENT 재생목록으로 공개)
+# ======================================
+def preview_dir(result_dir: str, file_id: str) -> str:
+    return os.path.join(result_dir, f"{file_id}{PREVIEW_DIR_SUFFIX}")
+
+
+def preview_url(file_id: str) -> str:
+    return f"/result_preview/{file_id}/{PREVIEW_PLAYLIST}"
+
+
+def chunk_duration(chunk: Dict) -> float:
+    """청크 구간 길이(초) — 프레임 수 / 원본 프레임레이트"""
+    frames = chunk.get("frames") or chunk.get("est_frames") or 0
+    fps = Fraction(str(chunk.get("fps") or 30))
+    return float(frames / fps) if fps else 0.0
+
+
+class PreviewPlaylist:
+    """청크 영상이 끝나는 대로 .ts로 옮겨(스트림 복사) 재생목록 뒤에 붙임
+
+    청크는 완료 순서가 뒤섞이므로 앞 청크가 모두 공개된 경우에만 이어 붙인다.
+    세그먼트 타임스탬프는 앞 청크 길이 합만큼 밀어(output_ts_offset) 하나의 타임라인으로 잇고,
+    청크마다 따로 인코딩(또는 원본 복사)되어 파라미터가 다를 수 있으므로 DISCONTINUITY로 구분한다.
+    청크 영상에는 오디오가 없으므로(최종 연결 시 추가) 미리보기는 영상만 재생된다.
+    """
+
+    def __init__(self, out_dir: str, chunks: List[Dict]) -> None:
+        self.out_dir = out_dir
+        self.durations = [chunk_duration(c) for c in chunks]
+        self.target = max(1, math.ceil(max(self.durations, default=1)))
+        self.published: List[int] = []
+        self._ready: Dict[int, str] = {}
+        self._offset = 0.0
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        self._write(ended=False)
+
+    def add(self, idx: int, video_path: str) -> List[int]:
+        """청크 idx 완료 → 이번에 새로 공개된 청크 번호 목록"""
+        self._ready[idx] = video_path
+        new = []
+        while len(self.published) in self._ready:
+            i = len(self.published)
+            segment = os.path.join(self.out_dir, f"chunk_{i:03d}.ts")
+            with metrics.timer("ffmpeg_preview"):
+                (
+                    ffmpeg
+                    .input(self._ready.pop(i))
+                    .output(segment, c="copy", f="mpegts", output_ts_offset=self._offset)
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
+            self._offset += self.durations[i]
+            self.published.append(i)
+            new.append(i)
+        if new:
+            self._write(ended=False)
+        return new
+
+    def finish(self) -> None:
+        self._write(ended=True)
+
+    def _write(self, ended: bool) -> None:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for i in self.published:
+            if i > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{self.durations[i]:.6f},")
+            lines.append(f"chunk_{i:03d}.ts")
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        path = os.path.join(self.out_dir, PREVIEW_PLAYLIST)
+        with open(path + ".tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,191 @@
+# detections.py
+import os
+import json
+import time
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services import cache
+
+# ======================================
+# 🔹 탐지 결과 사이드카 (청크별 .dets.npz)
+# ======================================
+# analyze / analyze_stream이 YOLO + 얼굴 검출을 실제로 돌린 프레임마다 결과를 기록한다.
+# 열(column) 단위 배열로 저장 (np.savez_compressed):
+#   det_frames   (F,)    탐지를 실행한 프레임 번호 (추적 모드면 키프레임만)
+#   det_offsets  (F+1,)  프레임별 탐지 행 범위
+#   xyxy (R, 4) / cls (R,) / conf (R,)   탐지 행 (신뢰도로 거르기 전 전체)
+#   mask_hw      (F, 2)  프레임별 세그멘테이션 마스크 크기 (마스크 없으면 0, 0)
+#   mask_bits / mask_offsets (R+1,)     행별 np.packbits 마스크 바이트 범위
+#   face_xyxy (M, 4) / face_row (M,)     사람 행별 얼굴 박스
+# 신뢰도 / 패딩 / 블러 설정은 렌더링 시점에 적용하므로 blur_mode, FEATHER_PX,
+# FACE_PAD_RATIO를 바꿔도 재탐지 없이 다시 합성할 수 있다.
+SIDECAR_SUFFIX = ".dets.npz"
+DETECTIONS_DIR = os.path.join(cache.CACHE_DIR, "detections")
+STORE_MANIFEST = "manifest.json"
+
+_NO_FACES = np.zeros((0, 4), dtype=np.float32)
+
+
+class DetectionRecorder:
+    """프레임별 탐지 결과를 모아 사이드카 파일로 저장"""
+
+    def __init__(self) -> None:
+        self.frames: List[int] = []
+        self.offsets = [0]
+        self.xyxy, self.cls, self.conf = [], [], []
+        self.mask_hw, self.mask_bits, self.mask_offsets = [], [], [0]
+        self.face_xyxy, self.face_row = [], []
+
+    def add(self, frame_idx: int, dets: Optional[Dict], person_faces: Dict) -> None:
+        """build_objects의 record 콜백 — person_faces: 탐지 인덱스 → 얼굴 박스 (N, 4)"""
+        base = self.offsets[-1]
+        n = 0 if dets is None else len(dets["cls"])
+        self.frames.append(frame_idx)
+        self.offsets.append(base + n)
+        if n == 0:
+            self.mask_hw.append((0, 0))
+            return
+
+        self.xyxy.append(np.asarray(dets["xyxy"], dtype=np.int32).reshape(-1, 4))
+        self.cls.append(np.asarray(dets["cls"], dtype=np.int16))
+        self.conf.append(np.asarray(dets["conf"], dtype=np.float32))
+
+        masks = dets["masks"]
+        self.mask_hw.append(masks.shape[1:3] if masks is not None else (0, 0))
+        for j in range(n):
+            bits = np.packbits(masks[j] > 0.5) if masks is not None else np.zeros(0, dtype=np.uint8)
+            self.mask_bits.append(bits)
+            self.mask_offsets.append(self.mask_offsets[-1] + bits.size)
+
+        for j, boxes in person_faces.items():
+            boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+            self.face_xyxy.append(boxes)
+            self.face_row.append(np.full(len(boxes), base + j, dtype=np.int32))
+
+    def save(self, path: str) -> None:
+        def cat(parts, dtype, shape):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(shape, dtype=dtype)
+
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            det_frames=np.asarray(self.frames, dtype=np.int32),
+            det_offsets=np.asarray(self.offsets, dtype=np.int64),
+            xyxy=cat(self.xyxy, np.int32, (0, 4)),
+            cls=cat(self.cls, np.int16, (0,)),
+            conf=cat(self.conf, np.float32, (0,)),
+            mask_hw=np.asarray(self.mask_hw, dtype=np.int32).reshape(-1, 2),
+            mask_bits=cat(self.mask_bits, np.uint8, (0,)),
+            mask_offsets=np.asarray(self.mask_offsets, dtype=np.int64),
+            face_xyxy=cat(self.face_xyxy, np.float32, (0, 4)),
+            face_row=cat(self.face_row, np.int32, (0,)),
+        )
+        os.replace(tmp, path)
+
+
+class DetectionSidecar:
+    """사이드카 파일을 읽어 프레임 번호 → (dets, person_faces)로 복원 (build_objects 입력 형태)"""
+
+    def __init__(self, path: str) -> None:
+        with np.load(path) as z:
+            self.data = {k: z[k] for k in z.files}
+        self.index = {int(f): k for k, f in enumerate(self.data["det_frames"])}
+
+    def __contains__(self, frame_idx: int) -> bool:
+        return frame_idx in self.index
+
+    def get(self, frame_idx: int):
+        k = self.index.get(frame_idx)
+        if k is None:
+            return None, {}
+
+        d = self.data
+        lo, hi = int(d["det_offsets"][k]), int(d["det_offsets"][k + 1])
+        if hi == lo:
+            return None, {}
+
+        h, w = (int(v) for v in d["mask_hw"][k])
+        masks = None
+        if h and w:
+            masks = np.empty((hi - lo, h, w), dtype=np.float32)
+            for j, row in enumerate(range(lo, hi)):
+                bits = d["mask_bits"][d["mask_offsets"][row]:d["mask_offsets"][row + 1]]
+                masks[j] = np.unpackbits(bits, count=h * w).reshape(h, w)
+
+        dets = {
+            "xyxy": d["xyxy"][lo:hi].astype(int),
+            "cls": d["cls"][lo:hi].astype(int),
+            "conf": d["conf"][lo:hi],
+            "masks": masks,
+        }
+
+        rows = d["face_row"]
+        sel = (rows >= lo) & (rows < hi)
+        faces = {}
+        for row in np.unique(rows[sel]):
+            faces[int(row) - lo] = d["face_xyxy"][rows == row]
+        for j in range(hi - lo):
+            if dets["cls"][j] == 0:
+                faces.setdefault(j, _NO_FACES)
+        return dets, faces
+
+
+# ======================================
+# 🔹 탐지 결과 저장소 (캐시 디렉터리, 작업 정리 후에도 유지)
+# ======================================
+# detections/<key>/ 에 원본 영상(청크 구간의 source) + 청크별 사이드카 + manifest.json을 둔다.
+# manifest의 chunks는 저장소 안 경로로 바꾼 청크 구간(preprocess.plan_chunks 형태)이다.
+# 정리는 cache.evict()가 결과 캐시와 같은 크기 / 사용 시각 기준으로 수행한다.
+def store_dir(key: str) -> str:
+    return os.path.join(DETECTIONS_DIR, key)
+
+
+def publish(key: str, chunks: List[Dict], meta: Dict) -> bool:
+    """완료된 작업의 원본 + 사이드카를 저장소에 등록 (사이드카가 하나라도 없으면 등록하지 않음)"""
+    if not chunks or not all(os.path.exists(c.get("sidecar", "")) for c in chunks):
+        return False
+
+    out_dir = store_dir(key)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    sources, stored = {}, []
+    for i, chunk in enumerate(chunks):
+        if chunk["source"] not in sources:
+            ext = os.path.splitext(chunk["source"])[1] or ".mp4"
+            name = f"source_{len(sources):03d}{ext}"
+            cache.link_or_copy(chunk["source"], os.path.join(tmp_dir, name))
+            sources[chunk["source"]] = name
+        sidecar = f"chunk_{i:03d}{SIDECAR_SUFFIX}"
+        cache.link_or_copy(chunk["sidecar"], os.path.join(tmp_dir, sidecar))
+        # 저장소 디렉터리 기준 상대 경로로 기록 (load_store에서 저장소 경로를 붙여 복원)
+        stored.append(dict(chunk, source=sources[chunk["source"]], sidecar=sidecar))
+
+    with open(os.path.join(tmp_dir, STORE_MANIFEST), "w") as f:
+        json.dump(dict(meta, chunks=stored, stored_at=time.time()), f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    print(f"[💾 탐지 결과 저장] {key[:12]} ({len(chunks)} 청크)")
+    return True
+
+
+def load_store(key: str) -> Optional[Dict]:
+    """저장소 manifest (없으면 None) — 사용 시각을 갱신해 정리 대상에서 뒤로 미룸"""
+    path = os.path.join(store_dir(key), STORE_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    os.utime(path)
+    with open(path) as f:
+        data = json.load(f)
+
+    base = store_dir(key)
+    data["chunks"] = [
+        dict(c, source=os.path.join(base, c["source"]), sidecar=os.path.join(base, c["sidecar"]))
+        for c in data["chunks"]
+    ]
+    return data
@@ -0,0 +1,238 @@
+# inference.py
+import os
+import shutil
+import logging
+import importlib.util
+from typing import Dict, List, Optional, Tuple
+
+from app.services.upload import sha256_file
+
+logger = logging.getLogger(__name__)
+
+# ======================================
+# 🔹 추론 백엔드 설정
+# ======================================
+# YOLO 세그멘테이션 모델을 어떤 런타임으로 실행할지 선택한다.
+#  - "torch": best.pt를 PyTorch로 직접 실행 (기본값)
+#  - "onnx": best.pt를 ONNX로 한 번 변환해 캐시하고 ONNX Runtime으로 실행
+#  - "openvino": OpenVINO IR로 변환해 실행 (openvino 패키지가 설치된 경우)
+# 변환 결과는 EXPORT_DIR/<모델 sha256 앞자리>-<백엔드>-<정밀도>-<입력 크기>/에 저장하고 재사용한다.
+# 어느 백엔드든 ultralytics YOLO 객체로 감싸므로 호출 결과(Results)의 형태는 같다.
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "best.pt")
+INFERENCE_BACKEND = os.getenv("PID_INFER_BACKEND", "torch")
+INFERENCE_PRECISION = os.getenv("PID_INFER_PRECISION", "fp32")    # fp32 / fp16 / int8
+INFERENCE_IMGSZ = int(os.getenv("PID_INFER_IMGSZ", "640"))         # 변환 / 추론 입력 크기 (긴 변)
+EXPORT_DIR = os.getenv("PID_EXPORT_DIR", os.path.join(os.path.dirname(MODEL_PATH), "exported"))
+
+# 백엔드별 지원 정밀도
+#  - torch fp16: CUDA에서만 적용 (CPU면 ultralytics가 fp32로 실행)
+#  - onnx fp16: 가중치 / 연산을 fp16으로 변환 (입출력은 fp32 유지) — GPU 실행 공급자용
+#  - onnx int8: ONNX Runtime 동적 양자화 (가중치 int8, 보정 데이터 불필요)
+#  - openvino fp16 / int8: 가중치 압축 (int8은 nncf 필요, 보정 데이터 불필요)
+PRECISIONS = {
+    "torch": ("fp32", "fp16"),
+    "onnx": ("fp32", "fp16", "int8"),
+    "openvino": ("fp32", "fp16", "int8"),
+}
+_REQUIRES = {"torch": ("torch",), "onnx": ("onnxruntime", "onnx"), "openvino": ("openvino",)}
+
+_checksums = {}
+
+
+def available_backends() -> List[str]:
+    """현재 환경에 필요한 패키지가 설치된 백엔드 목록"""
+    return [name for name, mods in _REQUIRES.items()
+            if all(importlib.util.find_spec(m) is not None for m in mods)]
+
+
+def model_checksum(path: str = MODEL_PATH) -> str:
+    """모델 파일 sha256 (파일 크기 / 수정 시각이 같으면 이전 값 재사용, 파일이 없으면 "missing")"""
+    if not os.path.exists(path):
+        return "missing"
+    st = os.stat(path)
+    sig = (path, st.st_size, st.st_mtime)
+    if sig not in _checksums:
+        _checksums[sig] = sha256_file(path)
+    return _checksums[sig]
+
+
+# ======================================
+# 🔹 변환 / 캐시
+# ======================================
+def artifact_dir(backend: str, precision: str, weights: str = MODEL_PATH, imgsz: int = INFERENCE_IMGSZ,
+                 export_dir: str = EXPORT_DIR) -> str:
+    """변환 결과 디렉터리 — 모델 파일이 바뀌면 경로도 바뀌므로 예전 결과를 잘못 쓰지 않음"""
+    return os.path.join(export_dir, f"{model_checksum(weights)[:16]}-{backend}-{precision}-{imgsz}")
+
+
+def _export(weights: str, work_dir: str, fmt: str, imgsz: int, **kwargs) -> str:
+    """ultralytics export — best.pt를 작업 디렉터리로 복사해 변환 결과가 그 안에 생기게 함"""
+    from ultralytics import YOLO
+
+    local = os.path.join(work_dir, os.path.basename(weights))
+    shutil.copy2(weights, local)
+    out = YOLO(local, task="segment").export(format=fmt, imgsz=imgsz, dynamic=True, **kwargs)
+    os.remove(local)
+    return str(out)
+
+
+def _onnx_fp16(src: str, dst: str) -> None:
+    import onnx
+    from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    model = onnx.load(src)
+    onnx.save(convert_float_to_float16(model, keep_io_types=True), dst)
+
+
+def _onnx_int8(src: str, dst: str) -> None:
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+    # 양자화 모델에는 ultralytics 메타데이터(클래스 이름 / stride / imgsz)가 빠지므로 원본에서 복사
+    meta = onnx.load(src, load_external_data=False).metadata_props
+    quantized = onnx.load(dst)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(meta)
+    onnx.save(quantized, dst)
+
+
+def _openvino_int8(model_dir: str) -> None:
+    import nncf
+    import openvino as ov
+
+    xml = next(f for f in os.listdir(model_dir) if f.endswith(".xml"))
+    compressed = nncf.compress_weights(ov.Core().read_model(os.path.join(model_dir, xml)))   # 가중치만 int8
+
+    # 같은 이름(.xml / .bin)으로 하위 디렉터리에 저장한 뒤 원래 파일을 덮어씀
+    tmp_dir = os.path.join(model_dir, "int8")
+    os.makedirs(tmp_dir)
+    ov.save_model(compressed, os.path.join(tmp_dir, xml))
+    for f in os.listdir(tmp_dir):
+        os.replace(os.path.join(tmp_dir, f), os.path.join(model_dir, f))
+    os.rmdir(tmp_dir)
+
+
+def export_model(backend: str, precision: str = "fp32", weights: str = MODEL_PATH, imgsz: int = INFERENCE_IMGSZ,
+                 export_dir: str = EXPORT_DIR) -> str:
+    """best.pt → 백엔드용 파일 (이미 있으면 변환 없이 경로만 반환)
+
+    여러 워커가 동시에 호출해도 각자 임시 디렉터리에 변환한 뒤 이름 바꾸기로 공개하므로
+    반쯤 쓰인 결과를 읽는 일은 없다 (먼저 끝난 쪽 결과를 사용).
+    """
+    if backend == "torch":
+        return weights
+    if precision not in PRECISIONS.get(backend, ()):
+        raise ValueError(f"{backend} does not support precision {precision!r}")
+
+    target = artifact_dir(backend, precision, weights, imgsz, export_dir)
+    found = _find_artifact(backend, target)
+    if found is not None:
+        return found
+
+    os.makedirs(export_dir, exist_ok=True)
+    tmp = f"{target}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    logger.info(f"[모델 변환] {backend} / {precision} / imgsz={imgsz} → {target}")
+    try:
+        if backend == "onnx":
+            # 그래프 단순화는 onnxslim이 설치된 경우만 (없으면 ultralytics가 설치를 시도하므로 오프라인에서 실패)
+            src = _export(weights, tmp, "onnx", imgsz, simplify=importlib.util.find_spec("onnxslim") is not None)
+            if precision != "fp32":
+                dst = os.path.join(tmp, f"model_{precision}.onnx")
+                (_onnx_fp16 if precision == "fp16" else _onnx_int8)(src, dst)
+                os.remove(src)
+        else:
+            model_dir = _export(weights, tmp, "openvino", imgsz, half=precision == "fp16")
+            if precision == "int8":
+                _openvino_int8(model_dir)
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            pass   # 다른 워커가 먼저 공개함 → 그 결과 사용
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    found = _find_artifact(backend, target)
+    if found is None:
+        raise RuntimeError(f"export produced no {backend} model in {target}")
+    return found
+
+
+def _find_artifact(backend: str, target: str) -> Optional[str]:
+    """변환 디렉터리 안의 모델 경로 (onnx: .onnx 파일, openvino: *_openvino_model 디렉터리)"""
+    if not os.path.isdir(target):
+        return None
+    for name in sorted(os.listdir(target)):
+        path = os.path.join(target, name)
+        if backend == "onnx" and name.endswith(".onnx"):
+            return path
+        if backend == "openvino" and name.endswith("_openvino_model") and os.path.isdir(path):
+            return path
+    return None
+
+
+# ======================================
+# 🔹 백엔드
+# ======================================
+class InferenceBackend:
+    """model(imgs, verbose=False) → ultralytics Results 리스트 (기존 YOLO 객체와 같은 호출 형태)"""
+
+    def __init__(self, name: str, precision: str, artifact: str, imgsz: int = INFERENCE_IMGSZ) -> None:
+        from ultralytics import YOLO
+
+        self.name = name
+        self.precision = precision
+        self.artifact = artifact
+        self.imgsz = imgsz
+        self._yolo = YOLO(artifact, task="segment")
+        self._half = name == "torch" and precision == "fp16"
+
+    def __call__(self, imgs, verbose: bool = False, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        if self._half:
+            kwargs.setdefault("half", True)
+        return self._yolo(imgs, verbose=verbose, **kwargs)
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self._yolo.names
+
+    def describe(self) -> str:
+        return f"{self.name}/{self.precision} ({self.artifact})"
+
+
+def load_backend(name: str = INFERENCE_BACKEND, precision: str = INFERENCE_PRECISION, weights: str = MODEL_PATH,
+                 imgsz: int = INFERENCE_IMGSZ) -> InferenceBackend:
+    """백엔드 생성 (필요하면 변환부터) — 알 수 없는 이름 / 미설치 / 미지원 정밀도면 ValueError"""
+    if name not in PRECISIONS:
+        raise ValueError(f"Unknown inference backend: {name} (choose from {tuple(PRECISIONS)})")
+    if precision not in PRECISIONS[name]:
+        raise ValueError(f"{name} does not support precision {precision!r} (choose from {PRECISIONS[name]})")
+    if name not in available_backends():
+        raise ValueError(f"{name} backend requires {', '.join(_REQUIRES[name])}")
+    return InferenceBackend(name, precision, export_model(name, precision, weights, imgsz), imgsz)
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """"onnx:int8" → ("onnx", "int8"), 정밀도를 생략하면 fp32"""
+    name, _, precision = spec.partition(":")
+    return name, precision or "fp32"
+
+
+# ======================================
+# 🔹 미리 변환 (배포 시 한 번 실행해 두면 워커 시작 시 변환 대기 없음)
+# ======================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export best.pt for an inference backend")
+    parser.add_argument("specs", nargs="+", help="backend[:precision], e.g. onnx onnx:int8 openvino:fp16")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for spec in args.specs:
+        print(spec, "→", export_model(*parse_spec(spec), weights=args.weights, imgsz=args.imgsz))
@@ -0,0 +1,257 @@
+# jobs.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.services.state import PROCESS_STATUS, PROCESS_LOCK, notify
+
+# ======================================
+# 🔹 스케줄러 설정
+# ======================================
+JOB_DB_PATH = os.getenv("PID_JOB_DB", "./jobs.db")
+MAX_CONCURRENT_JOBS = int(os.getenv("PID_MAX_JOBS", "2"))      # 동시에 실행하는 작업 수
+MAX_QUEUED_JOBS = int(os.getenv("PID_MAX_QUEUED", "32"))       # 대기열 최대 길이 (초과 시 429)
+PERSIST_INTERVAL = 2.0                                         # 진행 중 작업 상태 저장 주기 (초)
+
+ACTIVE_STATUSES = ("queued", "processing")
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차 새 작업을 받을 수 없음"""
+
+
+# ======================================
+# 🔹 SQLite 작업 저장소
+# ======================================
+class JobStore:
+    """작업 정의 + 상태를 로컬 SQLite에 저장 (재시작 후 복구용)"""
+
+    def __init__(self, path: str = JOB_DB_PATH) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                file_id     TEXT PRIMARY KEY,
+                video_path  TEXT NOT NULL,
+                options     TEXT NOT NULL,
+                priority    INTEGER NOT NULL DEFAULT 0,
+                status      TEXT NOT NULL,
+                info        TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                updated_at  REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def create(self, file_id: str, video_path: str, options: Dict, priority: int, info: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, video_path, json.dumps(options), priority, info["status"],
+                 json.dumps(info), info.get("created_at", now), now),
+            )
+            self._conn.commit()
+
+    def save_status(self, file_id: str, info: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, info = ?, updated_at = ? WHERE file_id = ?",
+                (info["status"], json.dumps(info), time.time(), file_id),
+            )
+            self._conn.commit()
+
+    def delete(self, file_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE file_id = ?", (file_id,))
+            self._conn.commit()
+
+    def all(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, video_path, options, priority, status, info, created_at "
+                "FROM jobs ORDER BY created_at"
+            ).fetchall()
+        return [
+            {
+                "file_id": r[0],
+                "video_path": r[1],
+                "options": json.loads(r[2]),
+                "priority": r[3],
+                "status": r[4],
+                "info": json.loads(r[5]),
+                "created_at": r[6],
+            }
+            for r in rows
+        ]
+
+
+# ======================================
+# 🔹 작업 스케줄러
+# ======================================
+class JobScheduler:
+    """우선순위 대기열 + 동시 실행 작업 수 제한 + SQLite 영속화
+
+    PROCESS_STATUS는 저장소의 뷰로 동작한다 — 시작 시 저장소에서 채우고,
+    단계 전환 / 주기적 flush 시 다시 저장소에 기록한다.
+    """
+
+    def __init__(self, store: JobStore, max_concurrent: int = MAX_CONCURRENT_JOBS,
+                 max_queued: int = MAX_QUEUED_JOBS) -> None:
+        self.store = store
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._jobs: Dict[str, Dict] = {}
+        self._seq = 0
+        self._tasks = []
+        self._runner: Optional[Callable[..., Awaitable[None]]] = None
+
+    # ----------------------------------
+    # 시작 / 종료
+    # ----------------------------------
+    async def start(self, runner: Callable[..., Awaitable[None]]) -> None:
+        """runner(file_id, video_path, options)를 실행하는 디스패처 시작 + 미완료 작업 복구"""
+        self._runner = runner
+        self._queue = asyncio.PriorityQueue()
+        self._recover()
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.max_concurrent)]
+        self._tasks.append(asyncio.create_task(self._persist_loop()))
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self.flush()
+
+    def _recover(self) -> None:
+        """저장소의 작업을 PROCESS_STATUS로 불러오고, 대기/처리 중이던 작업을 다시 대기열에 넣음"""
+        for job in self.store.all():
+            info = job["info"]
+            if job["status"] in ACTIVE_STATUSES:
+                info.update(status="queued", stage="queued")
+                self._enqueue(job["file_id"], job["video_path"], job["options"], job["priority"])
+                print(f"[♻️ 작업 복구] {job['file_id']}")
+            PROCESS_STATUS[job["file_id"]] = info
+
+    # ----------------------------------
+    # 제출 (admission control)
+    # ----------------------------------
+    def queued_count(self) -> int:
+        return sum(1 for j in self._jobs.values() if j["state"] == "queued")
+
+    def running_count(self) -> int:
+        return sum(1 for j in self._jobs.values() if j["state"] == "running")
+
+    def submit(self, file_id: str, video_path: str, options: Dict, priority: int = 0) -> int:
+        """작업을 대기열에 넣고 대기 순번을 반환 — 대기열이 가득 차면 QueueFullError"""
+        job = self._jobs.get(file_id)
+        if job is not None and job["state"] != "done":
+            return self.position(file_id)
+        if self.queued_count() >= self.max_queued:
+            raise QueueFullError(f"job queue is full ({self.max_queued})")
+
+        info = {
+            "progress": 0,
+            "stage": "queued",
+            "status": "queued",
+            "chunks": [],
+            "priority": priority,
+            "created_at": time.time(),
+        }
+        PROCESS_STATUS[file_id] = info
+        self.store.create(file_id, video_path, options, priority, info)
+        self._enqueue(file_id, video_path, options, priority)
+        notify(file_id)
+        return self.position(file_id)
+
+    def record(self, file_id: str, video_path: str, options: Dict, info: Dict, priority: int = 0) -> None:
+        """대기열을 거치지 않고 바로 끝난 작업(결과 캐시 적중)도 일반 작업처럼 저장소에 기록
+
+        재시작 후에도 /jobs / /progress-stream이 이 작업을 알 수 있도록 상태를 submit과 같은 경로로 남긴다.
+        """
+        info = dict(info, priority=priority, created_at=info.get("created_at", time.time()))
+        PROCESS_STATUS[file_id] = info
+        self._jobs[file_id] = {"state": "done", "key": (-priority, 0)}
+        self.store.create(file_id, video_path, options, priority, info)
+        notify(file_id)
+
+    def position(self, file_id: str) -> int:
+        """대기 순번 (0 = 실행 중 또는 대기열에 없음)"""
+        job = self._jobs.get(file_id)
+        if job is None or job["state"] != "queued":
+            return 0
+        ahead = [j for j in self._jobs.values() if j["state"] == "queued" and j["key"] < job["key"]]
+        return len(ahead) + 1
+
+    def _enqueue(self, file_id, video_path, options, priority) -> None:
+        self._seq += 1
+        key = (-priority, self._seq)   # 우선순위 높은 순 → 먼저 들어온 순
+        self._jobs[file_id] = {"state": "queued", "key": key}
+        self._queue.put_nowait((key, file_id, video_path, options))
+
+    def forget(self, file_id: str) -> None:
+        """만료된 작업을 저장소에서 제거 (실행 중인 작업은 유지)"""
+        job = self._jobs.get(file_id)
+        if job is not None and job["state"] != "done":
+            return
+        self._jobs.pop(file_id, None)
+        self.store.delete(file_id)
+
+    # ----------------------------------
+    # 실행 / 영속화
+    # ----------------------------------
+    async def _dispatch(self) -> None:
+        while True:
+            _, file_id, video_path, options = await self._queue.get()
+            self._jobs[file_id]["state"] = "running"
+            try:
+                await self._runner(file_id, video_path, options)
+            except Exception as e:
+                info = PROCESS_STATUS.setdefault(file_id, {"progress": 0, "chunks": []})
+                info.update(status="error", stage="error", error=str(e))
+                notify(file_id)
+                print(f"[❌ 작업 실패] {file_id}: {e}")
+            finally:
+                self._jobs[file_id]["state"] = "done"
+                self.save(file_id)
+                self._queue.task_done()
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(PERSIST_INTERVAL)
+            self.flush()
+
+    def flush(self) -> None:
+        """대기/실행 중인 작업 상태를 저장소에 기록"""
+        for file_id, job in list(self._jobs.items()):
+            if job["state"] != "done":
+                self.save(file_id)
+
+    def save(self, file_id: str) -> None:
+        """현재 PROCESS_STATUS[file_id]를 저장소에 기록"""
+        with PROCESS_LOCK:
+            info = PROCESS_STATUS.get(file_id)
+            snapshot = json.loads(json.dumps(info, default=str)) if info is not None else None
+        if snapshot is not None:
+            self.store.save_status(file_id, snapshot)
+
+
+_scheduler: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+    """프로세스에 하나뿐인 스케줄러 — 처음 쓸 때 SQLite 저장소를 연다
+
+    청크 처리 워커 프로세스도 routes를 import하므로 import 시점에는 DB를 열지 않는다.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler(JobStore(JOB_DB_PATH))
+    return _scheduler
@@ -0,0 +1,393 @@
+# live.py
+import os
+import time
+import queue
+import shutil
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import ffmpeg
+
+from app.services import ai_engine, preprocess
+
+# ======================================
+# 🔹 실시간 스트림 설정
+# ======================================
+# 카메라 / 스트림 입력을 프레임 단위로 마스킹해 로컬 HLS(playlist.m3u8 + seg_xxxxx.ts)로 내보낸다.
+#   입력 ffmpeg (raw BGR 파이프) → [리더 스레드] → 제한 큐 → [마스킹 스레드] → 출력 ffmpeg (HLS)
+# 큐가 가득 차면 가장 오래된 프레임을 버려 지연이 쌓이지 않게 한다 (처리 속도 < 입력 속도일 때).
+LIVE_DIR = os.getenv("PID_LIVE_DIR", "./live")
+LIVE_MAX_STREAMS = int(os.getenv("PID_LIVE_MAX_STREAMS", "2"))       # 동시 실시간 스트림 수
+LIVE_QUEUE_SIZE = int(os.getenv("PID_LIVE_QUEUE", "4"))               # 리더 → 마스킹 대기 프레임 수
+HLS_SEGMENT_SECONDS = float(os.getenv("PID_LIVE_SEGMENT", "2"))       # HLS 세그먼트 길이 (초)
+HLS_LIST_SIZE = int(os.getenv("PID_LIVE_LIST_SIZE", "6"))             # 재생목록에 남기는 세그먼트 수
+LATENCY_WINDOW = 300                                                  # 지연 통계에 쓰는 최근 샘플 수
+LIVE_ENDED_TTL = float(os.getenv("PID_LIVE_ENDED_TTL", "600"))        # 스스로 끝난 스트림의 출력을 남겨 두는 시간 (초)
+
+# 입력 종류
+#  - "testsrc": ffmpeg 테스트 패턴 (lavfi testsrc2, 개발용)
+#  - rtsp:// / rtsps:// / rtmp:// / http(s):// URL
+#  - 로컬 파일: loop=True면 실시간 속도로 반복 재생, tail=True면 기록 중인 파일을 계속 따라 읽음
+LIVE_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://")
+TEST_SOURCE = "testsrc"
+
+os.makedirs(LIVE_DIR, exist_ok=True)
+
+
+class LiveLimitError(Exception):
+    """동시 실시간 스트림 수 초과"""
+
+
+def _latency_summary(values_ms) -> Dict:
+    if not values_ms:
+        return {"samples": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    arr = np.asarray(values_ms, dtype=np.float64)
+    return {
+        "samples": int(arr.size),
+        "p50_ms": round(float(np.percentile(arr, 50)), 1),
+        "p95_ms": round(float(np.percentile(arr, 95)), 1),
+        "max_ms": round(float(arr.max()), 1),
+    }
+
+
+# ======================================
+# 🔹 입력 / 출력 ffmpeg
+# ======================================
+def _open_input(source: str, size: Optional[Tuple[int, int]], fps: float, loop: bool, tail: bool):
+    """입력 스트림 → (ffmpeg input 노드, (width, height), fps)"""
+    if source == TEST_SOURCE:
+        width, height = size or (1280, 720)
+        fps = fps or 25.0
+        stream = ffmpeg.input(f"testsrc2=size={width}x{height}:rate={fps}", f="lavfi", re=None)
+        return stream, (width, height), fps
+
+    if source.startswith(("rtsp://", "rtsps://")):
+        # 저지연: TCP 전송(패킷 손실로 인한 깨짐 방지) + 입력 버퍼링 최소화
+        stream = ffmpeg.input(source, rtsp_transport="tcp", fflags="nobuffer", flags="low_delay")
+    elif source.startswith(LIVE_SCHEMES):
+        stream = ffmpeg.input(source, fflags="nobuffer", flags="low_delay")
+    elif tail:
+        stream = ffmpeg.input(f"file:{source}", follow=1, re=None)
+    elif loop:
+        stream = ffmpeg.input(source, stream_loop=-1, re=None)
+    else:
+        stream = ffmpeg.input(source, re=None)
+
+    if size is None or not fps:
+        meta = preprocess.probe_video(source)
+        size = size or (meta["width"], meta["height"])
+        fps = fps or meta["fps"] or 25.0
+    return stream, size, fps
+
+
+def _hls_writer(out_dir: str, size: Tuple[int, int], fps: float):
+    """raw BGR 프레임 파이프 → libx264 저지연 인코딩 → HLS 세그먼트
+
+    입력 타임스탬프는 프레임이 파이프에 들어온 실제 시각(use_wallclock_as_timestamps)이라
+    버려진 프레임이 있어도 재생 속도가 유지된다 (출력은 고정 프레임레이트로 채움).
+    """
+    width, height = size
+    gop = max(1, round(fps * HLS_SEGMENT_SECONDS))
+    return (
+        ffmpeg
+        .input("pipe:", format="rawvideo", pix_fmt="bgr24", s=f"{width}x{height}",
+               use_wallclock_as_timestamps=1)
+        .output(
+            os.path.join(out_dir, "playlist.m3u8"),
+            vcodec="libx264",
+            preset="veryfast",
+            tune="zerolatency",
+            pix_fmt="yuv420p",
+            r=fps,
+            vsync="cfr",
+            g=gop,
+            keyint_min=gop,
+            sc_threshold=0,                                    # 세그먼트 경계 = 키프레임 (고정 간격)
+            f="hls",
+            hls_time=HLS_SEGMENT_SECONDS,
+            hls_list_size=HLS_LIST_SIZE,
+            hls_flags="delete_segments+independent_segments+omit_endlist",
+            hls_segment_filename=os.path.join(out_dir, "seg_%05d.ts"),
+            start_number=0,
+        )
+        .global_args("-hide_banner")
+        .global_args("-loglevel", "error")
+        .overwrite_output()
+        .run_async(pipe_stdin=True)
+    )
+
+
+def _last_segment(playlist: str) -> int:
+    """재생목록에 올라간 마지막 세그먼트 번호 (없으면 -1)"""
+    try:
+        with open(playlist) as f:
+            names = [line.strip() for line in f if line.strip().endswith(".ts")]
+    except OSError:
+        return -1
+    if not names:
+        return -1
+    return int(os.path.splitext(names[-1])[0].rsplit("_", 1)[-1])
+
+
+# ======================================
+# 🔹 실시간 스트림 작업
+# ======================================
+class LiveStream:
+    """입력 하나를 마스킹해 HLS로 내보내는 작업 (리더 / 마스킹 스레드 2개)
+
+    지연 통계
+      - frame_ms:   프레임이 입력 파이프에서 읽힌 시각 → 마스킹 후 인코더에 전달된 시각
+      - segment_ms: 세그먼트 첫 프레임이 읽힌 시각 → 그 세그먼트가 재생목록에 올라간 시각
+                    (= 플레이어가 받을 수 있게 되기까지의 서버 측 glass-to-glass 지연)
+    """
+
+    def __init__(self, stream_id: str, source: str, blur_mode: str = ai_engine.BLUR_MODE,
+                 tracking: bool = ai_engine.TRACKING, detect_interval: int = ai_engine.TRACK_DETECT_INTERVAL,
+                 size: Optional[Tuple[int, int]] = None, fps: float = 0.0,
+                 loop: bool = False, tail: bool = False) -> None:
+        self.stream_id = stream_id
+        self.source = source
+        self.blur_mode = blur_mode
+        self.tracking = tracking
+        self.detect_interval = detect_interval
+        self.out_dir = os.path.join(LIVE_DIR, stream_id)
+        self.playlist = os.path.join(self.out_dir, "playlist.m3u8")
+
+        self._input, self.size, self.fps = _open_input(source, size, fps, loop, tail)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._reader_proc = None
+        self._writer_proc = None
+        self._threads = []
+
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ended_at: Optional[float] = None   # 입력 종료 / 오류로 스스로 끝난 시각 (stop()으로 멈춘 경우는 None)
+        self.frames_in = 0
+        self.frames_out = 0
+        self.frames_dropped = 0
+        self.detections = 0
+        self._frame_ms = deque(maxlen=LATENCY_WINDOW)
+        self._segment_ms = deque(maxlen=LATENCY_WINDOW)
+
+    # --- 수명 주기 ---
+    def start(self) -> None:
+        # 실시간 마스킹은 이 프로세스에서 실행되므로 모델이 없으면 여기서 로드
+        if not ai_engine.ensure_models():
+            raise RuntimeError("models are not loaded")
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        os.makedirs(self.out_dir)
+        width, height = self.size
+        self._reader_proc = (
+            ffmpeg
+            .output(self._input, "pipe:", format="rawvideo", pix_fmt="bgr24", s=f"{width}x{height}")
+            .global_args("-hide_banner")
+            .global_args("-loglevel", "error")
+            .run_async(pipe_stdout=True)
+        )
+        self._writer_proc = _hls_writer(self.out_dir, self.size, self.fps)
+        self._threads = [
+            threading.Thread(target=self._read_loop, name=f"live-read-{self.stream_id[:8]}", daemon=True),
+            threading.Thread(target=self._mask_loop, name=f"live-mask-{self.stream_id[:8]}", daemon=True),
+        ]
+        self.status = "running"
+        for t in self._threads:
+            t.start()
+        print(f"[📡 실시간 시작] {self.stream_id}: {self.source} ({width}x{height}@{self.fps:g})")
+
+    def stop(self, remove_output: bool = False) -> None:
+        self._stop.set()
+        if self._reader_proc is not None and self._reader_proc.poll() is None:
+            self._reader_proc.terminate()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._close_writer()
+        if self.status == "running":
+            self.status = "stopped"
+        if remove_output:
+            shutil.rmtree(self.out_dir, ignore_errors=True)
+        print(f"[📡 실시간 종료] {self.stream_id}: {self.status}")
+
+    def _close_writer(self) -> None:
+        proc = self._writer_proc
+        if proc is None:
+            return
+        if proc.stdin and not proc.stdin.closed:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+        try:
+            proc.wait(timeout=10)
+        except Exception:
+            proc.kill()
+
+    # --- 리더: 입력 프레임을 읽어 큐에 넣음 (가득 차면 가장 오래된 프레임 버림) ---
+    def _read_loop(self) -> None:
+        width, height = self.size
+        frame_bytes = width * height * 3
+        stdout = self._reader_proc.stdout
+        try:
+            while not self._stop.is_set():
+                buf = bytearray(frame_bytes)
+                if stdout.readinto(buf) < frame_bytes:
+                    if not self._stop.is_set():
+                        self.status = "ended"
+                    break
+                self.frames_in += 1
+                self._offer((time.monotonic(), np.frombuffer(buf, np.uint8).reshape(height, width, 3)))
+        except Exception as e:
+            self.status, self.error = "error", f"reader: {e}"
+        finally:
+            self._offer(None)   # 마스킹 스레드 종료 신호
+
+    def _offer(self, item) -> None:
+        """큐에 넣되 가득 차 있으면 가장 오래된 프레임을 버림 (리더가 막히지 않음)"""
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    # --- 마스킹: 큐에서 프레임을 꺼내 마스킹 후 HLS 인코더로 전달 ---
+    def _mask_loop(self) -> None:
+        tracker = ai_engine._make_tracker(self.tracking, self.detect_interval)
+        frames_per_segment = max(1, round(self.fps * HLS_SEGMENT_SECONDS))
+        segment_starts = {}   # 세그먼트 번호 → 첫 프레임 읽은 시각
+        published = -1
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None or self._stop.is_set():
+                    break
+                captured, img = item
+                if tracker is not None:
+                    out, n = ai_engine.mask_frame_tracked(img, tracker, self.blur_mode)
+                else:
+                    out, n = ai_engine.mask_frame(img, self.blur_mode)
+                self._writer_proc.stdin.write(out.tobytes())
+
+                now = time.monotonic()
+                self._frame_ms.append((now - captured) * 1000)
+                self.detections += n
+                if self.frames_out % frames_per_segment == 0:
+                    segment_starts[self.frames_out // frames_per_segment] = captured
+                self.frames_out += 1
+
+                # 새 세그먼트가 재생목록에 올라왔으면 발행 지연 기록
+                if self.frames_out % max(1, frames_per_segment // 4) == 0:
+                    last = _last_segment(self.playlist)
+                    for k in range(published + 1, last + 1):
+                        if k in segment_starts:
+                            self._segment_ms.append((now - segment_starts.pop(k)) * 1000)
+                    published = max(published, last)
+        except Exception as e:
+            self.status, self.error = "error", f"mask: {e}"
+            print(f"[❌ 실시간 처리 실패] {self.stream_id}: {e}")
+            self._stop.set()   # 리더도 멈춤 (입력 프로세스는 stop()에서 정리)
+        finally:
+            self._close_writer()
+            if self.status in ("ended", "error"):
+                self.ended_at = time.time()   # LIVE_ENDED_TTL 뒤 prune_ended()가 목록 / 출력에서 제거
+
+    # --- 상태 ---
+    def stats(self) -> Dict:
+        elapsed = max(1e-6, time.time() - self.started_at)
+        return {
+            "stream_id": self.stream_id,
+            "source": self.source,
+            "status": self.status,
+            "error": self.error,
+            "size": list(self.size),
+            "fps": self.fps,
+            "uptime_s": round(elapsed, 1),
+            "ended_at": self.ended_at,
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "frames_dropped": self.frames_dropped,
+            "fps_in": round(self.frames_in / elapsed, 2),
+            "fps_out": round(self.frames_out / elapsed, 2),
+            "queue": self._queue.qsize(),
+            "detections": self.detections,
+            "latency": {
+                "frame": _latency_summary(list(self._frame_ms)),
+                "segment": _latency_summary(list(self._segment_ms)),
+            },
+        }
+
+
+# ======================================
+# 🔹 실행 중 스트림 관리
+# ======================================
+_streams: Dict[str, LiveStream] = {}
+_streams_lock = threading.Lock()
+
+
+def start_stream(stream_id: str, source: str, **opts) -> LiveStream:
+    with _streams_lock:
+        active = [s for s in _streams.values() if s.status in ("starting", "running")]
+        if len(active) >= LIVE_MAX_STREAMS:
+            raise LiveLimitError(f"at most {LIVE_MAX_STREAMS} live streams can run at once")
+        stream = LiveStream(stream_id, source, **opts)
+        _streams[stream_id] = stream
+    try:
+        stream.start()
+    except Exception:
+        with _streams_lock:
+            _streams.pop(stream_id, None)
+        stream.stop(remove_output=True)
+        raise
+    return stream
+
+
+def get_stream(stream_id: str) -> Optional[LiveStream]:
+    return _streams.get(stream_id)
+
+
+def list_streams():
+    return [s.stats() for s in list(_streams.values())]
+
+
+def stop_stream(stream_id: str) -> bool:
+    with _streams_lock:
+        stream = _streams.pop(stream_id, None)
+    if stream is None:
+        return False
+    stream.stop(remove_output=True)
+    return True
+
+
+def prune_ended(max_age: float = LIVE_ENDED_TTL) -> None:
+    """스스로 끝난 스트림을 max_age 뒤 목록과 디스크에서 제거 + 목록에 없는 출력 디렉터리(재시작 전 스트림 등) 정리
+
+    끝난 직후에는 플레이어가 마지막 세그먼트까지 받고 /live 상태에서 종료 사유를 볼 수 있도록 남겨 둔다.
+    """
+    now = time.time()
+    with _streams_lock:
+        expired = [sid for sid, s in _streams.items() if s.ended_at is not None and now - s.ended_at > max_age]
+    for stream_id in expired:
+        stop_stream(stream_id)
+
+    for name in os.listdir(LIVE_DIR):
+        path = os.path.join(LIVE_DIR, name)
+        if name in _streams or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path)
+                print(f"[🧹 실시간 출력 삭제] {path}")
+        except OSError as e:
+            print(f"[⚠️ 삭제 실패] {path}: {e}")
+
+
+def stop_all() -> None:
+    for stream_id in list(_streams):
+        stop_stream(stream_id)
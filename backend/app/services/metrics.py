@@ -0,0 +1,355 @@
+# metrics.py
+import os
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+# ======================================
+# 🔹 메트릭 / 트레이스 설정
+# ======================================
+# 외부 라이브러리 없이 Prometheus 텍스트 형식(/metrics)으로 내보내는 카운터 / 히스토그램 / 게이지.
+# 핫패스(프레임마다 호출)에서는 timer() 하나만 쓰며 비용은 perf_counter 2회 + 락 1회 정도다.
+# 프로세스 풀 워커는 자기 프로세스에 쌓인 값을 청크 요약에 담아 보내고(export_delta),
+# API 프로세스가 합친다(merge) — /metrics는 항상 API 프로세스 기준의 전체 값.
+TRACE_ENABLED = os.getenv("PID_TRACE", "0") == "1"     # 작업별 Chrome trace 파일 기록 (기본값, /analyze?trace=로 지정 가능)
+TRACE_DIR = os.getenv("PID_TRACE_DIR", "./traces")
+TRACE_SUFFIX = ".trace.json"
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CHUNK_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+JOB_BUCKETS = (5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+_REGISTRY: List["_Metric"] = []
+_FORWARD = False            # 워커 프로세스: 값을 청크 요약으로 API 프로세스에 전달
+_local = threading.local()  # 현재 스레드에서 기록 중인 청크 트레이스
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+# ======================================
+# 🔹 메트릭 종류
+# ======================================
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: tuple, extra=()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_num(value)}"]
+
+    # --- 프로세스 간 전달 ---
+    def export(self) -> list:
+        """누적값을 꺼내고 비움 → [(레이블, 값)]"""
+        with self._lock:
+            items, self._values = list(self._values.items()), {}
+        return [(list(k), v) for k, v in items]
+
+    @abstractmethod
+    def merge(self, items) -> None:
+        """다른 프로세스에서 export()한 값을 더함"""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def merge(self, items) -> None:
+        for key, value in items:
+            self.inc(value, **dict(zip(self.labelnames, key)))
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)   # value <= bucket 인 첫 구간 (마지막은 +Inf)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def _samples(self, key, value) -> List[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else _num(bound)
+            lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_num(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+    def merge(self, items) -> None:
+        for key, (counts, total) in items:
+            key = tuple(key)
+            with self._lock:
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+
+
+class Gauge(_Metric):
+    """렌더링 시점에 fn()을 호출해 값을 읽는 게이지 (대기열 길이 등 다른 모듈이 가진 상태)"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_num(value)}"]
+
+    def export(self) -> list:
+        return []
+
+    def merge(self, items) -> None:
+        pass   # 게이지는 API 프로세스에서 바로 읽으므로 합칠 값이 없음
+
+
+# ======================================
+# 🔹 기본 메트릭
+# ======================================
+STAGE_SECONDS = Histogram("pid_stage_seconds", "Time spent per pipeline stage call", ("stage",))
+CHUNK_SECONDS = Histogram("pid_chunk_seconds", "Wall time per chunk", ("pipeline",), CHUNK_BUCKETS)
+JOB_SECONDS = Histogram("pid_job_seconds", "Wall time per analysis job", ("status",), JOB_BUCKETS)
+FRAMES = Counter("pid_frames_total", "Frames masked", ("pipeline",))
+DETECTIONS = Counter("pid_detections_total", "Objects masked", ("pipeline",))
+CHUNKS = Counter("pid_chunks_total", "Chunks processed", ("pipeline",))
+JOBS = Counter("pid_jobs_total", "Analysis jobs finished", ("status",))
+
+
+def render() -> str:
+    """Prometheus 텍스트 형식 (text/plain; version=0.0.4)"""
+    lines = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ======================================
+# 🔹 워커 프로세스 → API 프로세스 전달
+# ======================================
+def set_forwarding(enabled: bool = True) -> None:
+    """워커 프로세스 초기화 시 호출 — 이후 청크 요약에 누적값을 담아 보냄"""
+    global _FORWARD
+    _FORWARD = enabled
+
+
+def forwarding() -> bool:
+    return _FORWARD
+
+
+def export_delta() -> Dict:
+    """마지막 호출 이후 쌓인 값 (게이지 제외) — merge()로 다른 프로세스에 합침"""
+    return {m.name: m.export() for m in _REGISTRY if not isinstance(m, Gauge)}
+
+
+def merge(delta: Optional[Dict]) -> None:
+    if not delta:
+        return
+    by_name = {m.name: m for m in _REGISTRY}
+    for name, items in delta.items():
+        metric = by_name.get(name)
+        if metric is not None and items:
+            metric.merge(items)
+
+
+# ======================================
+# 🔹 단계 타이머
+# ======================================
+class timer:
+    """with metrics.timer("yolo"): ... — 단계 소요 시간을 히스토그램 + (기록 중이면) 트레이스에 남김"""
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> "timer":
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        dt = perf_counter() - self.t0
+        STAGE_SECONDS.observe(dt, stage=self.stage)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.add(self.stage, self.t0, dt)
+
+
+def timed(stage: str):
+    """함수 전체를 timer(stage)로 감싸는 데코레이터"""
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
+
+
+# ======================================
+# 🔹 Chrome trace (chrome://tracing / Perfetto)
+# ======================================
+class ChunkTrace:
+    """청크 하나에서 timer()로 잰 구간들 → Chrome trace "X"(complete) 이벤트
+
+    청크 번호를 tid로 써서 trace 뷰어에서 청크마다 한 줄로 보이고,
+    시각은 벽시계(us) 기준이라 여러 워커 프로세스의 이벤트를 그대로 합칠 수 있다.
+    """
+
+    def __init__(self, chunk_idx: int) -> None:
+        self.chunk_idx = chunk_idx
+        self.pid = os.getpid()
+        self.events: List[Dict] = []
+        self._origin = time.time() - perf_counter()
+
+    def add(self, name: str, t0: float, dt: float) -> None:
+        self.events.append({
+            "name": name, "ph": "X", "pid": self.pid, "tid": self.chunk_idx,
+            "ts": round((self._origin + t0) * 1e6, 1), "dur": round(dt * 1e6, 1),
+        })
+
+
+class trace_chunk:
+    """with metrics.trace_chunk(idx, enabled) as tr: — 이 스레드의 timer() 구간을 tr.events에 기록
+
+    enabled=False면 아무것도 기록하지 않고 None을 돌려준다.
+    """
+
+    def __init__(self, chunk_idx: int, enabled: bool = True, name: str = "chunk") -> None:
+        self.trace = ChunkTrace(chunk_idx) if enabled else None
+        self.name = name
+
+    def __enter__(self) -> Optional[ChunkTrace]:
+        if self.trace is not None:
+            self._prev = getattr(_local, "trace", None)
+            _local.trace = self.trace
+            self.t0 = perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.trace is not None:
+            self.trace.add(self.name, self.t0, perf_counter() - self.t0)
+            _local.trace = self._prev
+
+
+def current_trace() -> Optional[ChunkTrace]:
+    """이 스레드에서 기록 중인 청크 트레이스 (없으면 None)"""
+    return getattr(_local, "trace", None)
+
+
+def set_trace(trace: Optional[ChunkTrace]) -> None:
+    """다른 스레드의 청크 트레이스에 이 스레드의 timer() 구간도 기록 (청크 내부 파이프라인 스레드용)"""
+    _local.trace = trace
+
+
+class JobTrace:
+    """작업 하나의 청크 트레이스를 모아 <TRACE_DIR>/<file_id>.trace.json으로 저장"""
+
+    def __init__(self, file_id: str) -> None:
+        self.file_id = file_id
+        self.events: List[Dict] = []
+        self._rows = set()     # (pid, 청크 번호)
+        self._lock = threading.Lock()
+
+    def extend(self, events: Optional[List[Dict]]) -> None:
+        if not events:
+            return
+        with self._lock:
+            self.events.extend(events)
+            self._rows.update((e["pid"], e["tid"]) for e in events)
+
+    def call(self, chunk_idx: int, name: str, fn, *args):
+        """fn(*args)를 이 스레드에서 청크 트레이스를 켠 채 실행 (인코더 풀 단계 등)"""
+        with trace_chunk(chunk_idx, name=name) as tr:
+            result = fn(*args)
+        self.extend(tr.events)
+        return result
+
+    def save(self, trace_dir: str = TRACE_DIR, **meta) -> str:
+        os.makedirs(trace_dir, exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+            rows = sorted(self._rows)
+        names = [{"name": "process_name", "ph": "M", "pid": p, "args": {"name": f"worker {p}"}}
+                 for p in sorted({p for p, _ in rows})]
+        names += [{"name": "thread_name", "ph": "M", "pid": p, "tid": c, "args": {"name": f"chunk {c}"}}
+                  for p, c in rows]
+
+        path = os.path.join(trace_dir, f"{self.file_id}{TRACE_SUFFIX}")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms",
+                       "otherData": dict(meta, file_id=self.file_id)}, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+def trace_path(file_id: str, trace_dir: str = TRACE_DIR) -> Optional[str]:
+    """저장된 작업 트레이스 경로 (없으면 None)"""
+    path = os.path.join(trace_dir, f"{file_id}{TRACE_SUFFIX}")
+    return path if os.path.basename(file_id) == file_id and os.path.isfile(path) else None
+
+
+def prune_traces(max_age: float, trace_dir: str = TRACE_DIR) -> None:
+    """오래된 트레이스 파일 삭제"""
+    if not os.path.isdir(trace_dir):
+        return
+    now = time.time()
+    for f in os.listdir(trace_dir):
+        path = os.path.join(trace_dir, f)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,221 @@
+# pipeline.py
+import os
+import time
+import queue
+import threading
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+from app.services import metrics
+
+# ======================================
+# 🔹 청크 내부 프레임 파이프라인 설정
+# ======================================
+# 청크 하나의 프레임을 단계별 스레드로 나눠 처리한다:
+#   디코딩 → [제한 큐] → 탐지 → [제한 큐] → 합성 → [제한 큐] → 인코딩 → 입력 순서대로 반환
+# OpenCV / ONNX Runtime / torch 연산과 ffmpeg 파이프 I/O는 GIL을 놓으므로 단계끼리 겹쳐 실행되고,
+# 청크가 1~2개뿐인 짧은 영상에서도 코어를 놀리지 않는다.
+# 동시에 떠 있는 프레임 수를 제한해 4K 영상에서도 메모리가 일정하게 유지된다.
+FRAME_PIPELINE = os.getenv("PID_FRAME_PIPELINE", "1") != "0"      # False: 한 스레드에서 순서대로 처리 (기존 방식)
+DECODE_WORKERS = int(os.getenv("PID_DECODE_WORKERS", "2"))        # frames 모드 imread 스레드 수 (파이프 디코딩은 항상 1)
+DETECT_WORKERS = int(os.getenv("PID_DETECT_WORKERS", "1"))        # 탐지 스레드 수 (추적 모드는 항상 1)
+COMPOSITE_WORKERS = int(os.getenv("PID_COMPOSITE_WORKERS", "2"))  # 합성 스레드 수
+IMWRITE_WORKERS = int(os.getenv("PID_IMWRITE_WORKERS", "2"))      # frames 모드 imwrite 스레드 수 (파이프 인코딩은 항상 1)
+QUEUE_SIZE = int(os.getenv("PID_PIPELINE_QUEUE", "8"))            # 단계 사이 큐 길이 / 동시에 처리 중인 프레임 수 상한
+BATCH_WAIT = float(os.getenv("PID_BATCH_WAIT", "0.05"))           # 배치 단계가 batch 크기를 채우려고 기다리는 최대 시간 (초)
+
+_END = object()   # 입력 끝 표시
+
+
+class _Stopped(Exception):
+    """다른 단계의 오류로 파이프라인이 중단됨"""
+
+
+class Stage:
+    """파이프라인 단계 — fn(items) → 같은 길이 / 같은 순서의 결과 리스트
+
+    workers: 이 단계를 실행하는 스레드 수
+    batch: fn에 한 번에 넘기는 최대 항목 수 (YOLO 배치 탐지 등)
+    ordered: 항목을 입력 순서대로만 받음 — 상태가 있는 단계(추적기, 파이프 인코더)용, 스레드는 1개로 고정
+    """
+
+    def __init__(self, name: str, fn: Callable[[List], List], workers: int = 1, batch: int = 1,
+                 ordered: bool = False) -> None:
+        self.name = name
+        self.fn = fn
+        self.workers = 1 if ordered else max(1, workers)
+        self.batch = max(1, batch)
+        self.ordered = ordered
+
+
+class Pipeline:
+    """단계들을 제한 큐로 연결해 실행하고 마지막 단계 결과를 입력 순서대로 돌려줌
+
+    source는 별도 스레드에서 순회하므로 디코딩(ffmpeg 파이프 읽기)도 하나의 단계로 동작한다.
+    어느 단계에서든 예외가 나면 나머지 스레드를 멈추고 run()을 순회하는 쪽에서 그 예외를 다시 던진다.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = QUEUE_SIZE, threaded: bool = FRAME_PIPELINE) -> None:
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.threaded = threaded
+        # 배치 하나 + 모든 스레드가 항목을 하나씩 들고 있어도 새 항목이 들어올 수 있을 만큼은 허용
+        self.max_inflight = max(self.queue_size, max(s.batch for s in stages) + sum(s.workers for s in stages))
+
+    def run(self, source: Iterable) -> Iterator:
+        if not self.threaded:
+            return self._run_inline(source)
+        return self._run_threaded(source)
+
+    def _run_inline(self, source: Iterable) -> Iterator:
+        """스레드 없이 배치 단위로 모든 단계를 차례로 실행"""
+        it = iter(source)
+        size = max(s.batch for s in self.stages)
+        while True:
+            items = list(islice(it, size))
+            if not items:
+                return
+            for stage in self.stages:
+                with metrics.timer(f"stage_{stage.name}"):
+                    items = stage.fn(items)
+            yield from items
+
+    def _run_threaded(self, source: Iterable) -> Iterator:
+        n = len(self.stages)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(n + 1)]
+        slots = threading.Semaphore(self.max_inflight)
+        stop = threading.Event()
+        errors = []
+        trace = metrics.current_trace()
+
+        def get(q, deadline=None):
+            """q에서 꺼냄 — deadline(time.monotonic 기준)까지 오지 않으면 None"""
+            while True:
+                timeout = 0.1
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        return None
+                try:
+                    return q.get(timeout=timeout)
+                except queue.Empty:
+                    if stop.is_set():
+                        raise _Stopped()
+
+        def put(q, item):
+            while True:
+                try:
+                    return q.put(item, timeout=0.1)
+                except queue.Full:
+                    if stop.is_set():
+                        raise _Stopped()
+
+        def fail(e):
+            errors.append(e)
+            stop.set()
+
+        def feed():
+            it = iter(source)
+            try:
+                metrics.set_trace(trace)
+                for seq, item in enumerate(it):
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            raise _Stopped()
+                    put(queues[0], (seq, item))
+                put(queues[0], _END)
+            except _Stopped:
+                pass
+            except BaseException as e:
+                fail(e)
+            finally:
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()   # 제너레이터(ffmpeg 디코더)를 이 스레드에서 정리
+
+        def work(i, stage, remaining, lock, reorder):
+            inq, outq = queues[i], queues[i + 1]
+
+            def take(deadline=None):
+                """다음 항목 (deadline까지 오지 않으면 None, deadline=None이면 올 때까지 대기)"""
+                if not stage.ordered:
+                    return get(inq, deadline)
+                # 순서 단계: 다음 번호가 올 때까지 먼저 온 항목은 버퍼에 보관
+                while reorder["next"] not in reorder["buf"]:
+                    item = get(inq, deadline)
+                    if item is None:
+                        return None
+                    if item is _END:
+                        return _END
+                    reorder["buf"][item[0]] = item[1]
+                seq = reorder["next"]
+                reorder["next"] += 1
+                return seq, reorder["buf"].pop(seq)
+
+            try:
+                metrics.set_trace(trace)
+                done = False
+                while not done:
+                    # 첫 항목은 올 때까지, 나머지는 BATCH_WAIT 동안만 기다려 batch 크기를 채움
+                    # (항목을 쥔 채 끝없이 기다리면 동시 처리 상한에 걸려 다른 단계와 서로 멈출 수 있음)
+                    batch, deadline = [], None
+                    while len(batch) < stage.batch:
+                        item = take(deadline)
+                        if item is None:
+                            break
+                        if item is _END:
+                            done = True
+                            break
+                        batch.append(item)
+                        if deadline is None:
+                            deadline = time.monotonic() + BATCH_WAIT
+                    if batch:
+                        with metrics.timer(f"stage_{stage.name}"):
+                            results = stage.fn([value for _, value in batch])
+                        for (seq, _), result in zip(batch, results):
+                            put(outq, (seq, result))
+
+                if stage.workers > 1:
+                    put(inq, _END)   # 같은 단계의 다른 스레드도 끝나도록 되돌려 놓음
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    put(outq, _END)
+            except _Stopped:
+                pass
+            except BaseException as e:
+                fail(e)
+
+        threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining, lock, reorder = [stage.workers], threading.Lock(), {"next": 0, "buf": {}}
+            for w in range(stage.workers):
+                threads.append(threading.Thread(target=work, args=(i, stage, remaining, lock, reorder),
+                                                name=f"pipeline-{stage.name}-{w}", daemon=True))
+        for t in threads:
+            t.start()
+
+        # 마지막 단계가 여러 스레드면 순서가 섞이므로 여기서 다시 입력 순서로 맞춤
+        pending, expected = {}, 0
+        try:
+            while True:
+                try:
+                    item = get(queues[n])
+                except _Stopped:
+                    break
+                if item is _END:
+                    break
+                pending[item[0]] = item[1]
+                while expected in pending:
+                    result = pending.pop(expected)
+                    expected += 1
+                    slots.release()
+                    yield result
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
@@ -3,9 +3,14 @@ from __future__ import annotations
 
 import os
 import glob
-from typing import List, Optional, Tuple, Union
+import subprocess
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import ffmpeg
+import numpy as np
+
+from app.services import metrics
 
 # ======================================
 # 🔹 출력 디렉토리 초기화
@@ -33,8 +38,13 @@ def extract_frames(
     img_format: str = "jpg",
     quality: Optional[int] = 1,
     clean_output_dir: bool = True,
+    seek: Optional[float] = None,
+    frames: Optional[int] = None,
 ) -> List[str]:
-    """주어진 영상을 ffmpeg를 이용해 프레임 단위로 추출"""
+    """주어진 영상을 ffmpeg를 이용해 프레임 단위로 추출
+
+    seek / frames: 입력 -ss(정확 탐색) 위치부터 frames장만 추출 (plan_chunks 청크 구간용)
+    """
 
     # FPS와 every_n은 동시에 사용 불가
     if fps is not None and every_n is not None:
@@ -46,7 +56,7 @@ def extract_frames(
 
     _ensure_clean_dir(output_dir, clean_output_dir)
 
-    inp = ffmpeg.input(input_video)
+    inp = ffmpeg.input(input_video, ss=seek) if seek is not None else ffmpeg.input(input_video)
 
     # 필요한 경우 영상 구간을 잘라냄 (start_time, duration)
     if start_time is not None:
@@ -77,19 +87,147 @@ def extract_frames(
     if img_format in {"jpg", "webp"} and quality is not None:
         # qscale:v: lower is better
         out_kwargs["qscale:v"] = quality
+    if frames is not None:
+        out_kwargs["frames:v"] = frames
 
     # ffmpeg 실행
-    (
+    with metrics.timer("ffmpeg_extract"):
+        (
+            ffmpeg
+            .output(stream, pattern, **out_kwargs, start_number=1, vsync="vfr" if fps or every_n else "passthrough")
+            .global_args("-hide_banner")
+            .global_args("-loglevel", "error")
+            .run()
+        )
+
+    # 결과 프레임 경로 리스트 반환
+    files = sorted(glob.glob(os.path.join(output_dir, f"frame_*.{img_format}")))
+    return files
+
+
+# ======================================
+# 🔹 영상 정보 조회 (ffprobe)
+# ======================================
+def _rate(value: Optional[str]) -> Optional[Fraction]:
+    """ffprobe 비율 문자열("30000/1001") → Fraction (0 또는 파싱 불가면 None)"""
+    try:
+        rate = Fraction(value or "0")
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+def probe_video(input_video: str) -> Dict[str, float]:
+    """ffprobe로 첫 번째 비디오 스트림의 해상도 / 프레임레이트 / 길이 / 타임베이스를 조회
+
+    fps_rational은 인코더 -framerate에 그대로 넘길 수 있는 정확한 비율 문자열이다.
+    """
+    with metrics.timer("ffprobe"):
+        info = ffmpeg.probe(input_video)
+    video = next((s for s in info["streams"] if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise ValueError(f"No video stream found: {input_video}")
+
+    # 평균 프레임레이트 우선, 없으면 r_frame_rate (스트림 기준 프레임레이트)
+    rate = _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate")) or Fraction(30)
+    fps = float(rate)
+    duration = float(video.get("duration") or info.get("format", {}).get("duration") or 0.0)
+
+    return {
+        "width": int(video["width"]),
+        "height": int(video["height"]),
+        "fps": fps,
+        "fps_rational": f"{rate.numerator}/{rate.denominator}",
+        "codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "time_base": video.get("time_base", "1/90000"),
+        "start_time": float(info.get("format", {}).get("start_time") or 0.0),
+        "duration": duration,
+        "nb_frames": int(video.get("nb_frames") or round(duration * fps)),
+    }
+
+
+def probe_packets(input_video: str) -> Tuple[np.ndarray, np.ndarray]:
+    """비디오 패킷(=프레임) 표시 시각과 키프레임 여부를 표시 순서로 반환 (디코딩 없이 패킷만 읽음)
+
+    반환: (pts_time 배열, 키프레임 bool 배열) — 길이가 곧 정확한 프레임 수
+    """
+    with metrics.timer("ffprobe_packets"):
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", input_video],
+            capture_output=True, text=True, check=True,
+        ).stdout
+
+    pts, keys = [], []
+    for line in out.splitlines():
+        t, _, flags = line.strip().partition(",")
+        if not t or t == "N/A":
+            continue
+        pts.append(float(t))
+        keys.append("K" in flags)
+
+    # 패킷은 디코딩 순서(B 프레임이면 표시 순서와 다름) → 표시 순서로 정렬
+    order = np.argsort(np.asarray(pts, dtype=np.float64), kind="stable")
+    return np.asarray(pts, dtype=np.float64)[order], np.asarray(keys, dtype=bool)[order]
+
+
+# ======================================
+# 🔹 프레임 스트리밍 (영상 → NumPy 배열, 디스크 미사용)
+# ======================================
+def iter_frames(
+    input_video: str,
+    fps: Optional[float] = None,
+    size: Optional[Tuple[int, int]] = None,
+    seek: Optional[float] = None,
+    frames: Optional[int] = None,
+) -> Iterator[np.ndarray]:
+    """ffmpeg가 디코딩한 raw BGR 프레임을 파이프로 받아 (H, W, 3) uint8 배열로 하나씩 반환
+
+    fps를 주지 않으면 원본 프레임을 그대로(중복 / 누락 없이) 내보낸다.
+    seek / frames: 입력 -ss(정확 탐색) 위치부터 frames장만 디코딩 (plan_chunks 청크 구간용)
+    ffmpeg가 실패하거나 frames장보다 적게 나오면 끝까지 읽은 뒤 RuntimeError (잘린 청크를 정상 결과로 넘기지 않도록)
+    """
+    if size is None:
+        meta = probe_video(input_video)
+        size = (meta["width"], meta["height"])
+    width, height = size
+    frame_bytes = width * height * 3
+
+    stream = ffmpeg.input(input_video, ss=seek) if seek is not None else ffmpeg.input(input_video)
+    if fps is not None:
+        stream = stream.filter("fps", fps=fps)
+
+    out_kwargs = {"frames:v": frames} if frames is not None else {}
+    proc = (
         ffmpeg
-        .output(stream, pattern, **out_kwargs, start_number=1, vsync="vfr")
+        .output(stream, "pipe:", format="rawvideo", pix_fmt="bgr24",
+                vsync="vfr" if fps is not None else "passthrough", **out_kwargs)
         .global_args("-hide_banner")
         .global_args("-loglevel", "error")
-        .run()
+        .run_async(pipe_stdout=True)
     )
 
-    # 결과 프레임 경로 리스트 반환
-    files = sorted(glob.glob(os.path.join(output_dir, f"frame_*.{img_format}")))
-    return files
+    count = 0
+    try:
+        while True:
+            # bytearray 버퍼로 직접 읽어 쓰기 가능한 배열을 추가 복사 없이 생성
+            # decode: 파이프에서 한 프레임을 받을 때까지 (ffmpeg 디코딩이 밀리면 여기서 대기)
+            buf = bytearray(frame_bytes)
+            with metrics.timer("decode"):
+                n = proc.stdout.readinto(buf)
+            if n < frame_bytes:
+                break
+            count += 1
+            yield np.frombuffer(buf, np.uint8).reshape(height, width, 3)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {input_video}")
+    if frames is not None and count < frames:
+        raise RuntimeError(f"ffmpeg decode ended early: {input_video} ({count}/{frames} frames)")
 
 
 # ======================================
@@ -111,3 +249,100 @@ def split_video(video_path: str, out_dir: str = "./chunks", segment_time: int =
     return sorted(
         [os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(".mp4")]
     )
+
+
+# ======================================
+# 🔹 청크 계획 (ffprobe 기반, 파일 분할 없음)
+# ======================================
+# 청크 = 원본 영상의 프레임 구간 dict:
+#   {"source", "start_frame", "frames", "seek", "keyframe", "ends_on_keyframe", "keyframes",
+#    "codec", "pix_fmt", "fps", "width", "height", "est_frames"}
+# seek / frames는 iter_frames / extract_frames에 그대로 넘겨 정확히 그 구간의 프레임만 디코딩한다.
+# keyframes: 청크 내부(첫 프레임 제외) 키프레임의 [청크 기준 프레임 번호, 탐색 위치] 목록
+#   → 탐지 없는 GOP를 재인코딩 없이 복사하는 구간 통과 모드에서 사용
+def _inner_keyframes(pts: np.ndarray, keys: np.ndarray, start: int, end: int,
+                     start_time: float, half_frame: float) -> List[List[float]]:
+    return [
+        [int(k) - start, max(0.0, float(pts[k]) - start_time - half_frame)]
+        for k in np.flatnonzero(keys[start + 1:end]) + start + 1
+    ]
+
+
+def chunk_spec(video_path: str) -> Dict:
+    """파일 전체를 하나의 청크로 보는 구간 정보 (split_video 결과용)"""
+    meta = probe_video(video_path)
+    pts, keys = probe_packets(video_path)
+    half_frame = 0.5 / meta["fps"] if meta["fps"] else 0.0
+    return {
+        "source": video_path,
+        "start_frame": 0,
+        "frames": None,
+        "seek": None,
+        "keyframe": True,
+        "ends_on_keyframe": True,
+        "keyframes": _inner_keyframes(pts, keys, 0, len(pts), meta["start_time"], half_frame),
+        "codec": meta["codec"],
+        "pix_fmt": meta["pix_fmt"],
+        "fps": meta["fps_rational"],
+        "width": meta["width"],
+        "height": meta["height"],
+        "est_frames": meta["nb_frames"],
+    }
+
+
+def plan_chunks(
+    video_path: str,
+    n_chunks: int,
+    min_seconds: float = 2.0,
+    snap_ratio: float = 0.1,
+) -> List[Dict]:
+    """패킷 인덱스로 프레임 수가 고른 청크 n_chunks개를 계획
+
+    - 경계는 프레임 단위로 정확하며, 이상적인 경계에서 청크 길이의 snap_ratio 이내에
+      키프레임이 있으면 그 위치로 맞춰 탐색 비용(앞 키프레임부터 디코딩)을 없앤다.
+    - 청크가 min_seconds보다 짧아지지 않도록 청크 수를 줄인다.
+    """
+    meta = probe_video(video_path)
+    pts, keys = probe_packets(video_path)
+    total = len(pts)
+    if total == 0:
+        raise ValueError(f"No video packets found: {video_path}")
+
+    fps = meta["fps"]
+    max_chunks = max(1, int(total // max(1, round(min_seconds * fps))))
+    n = max(1, min(n_chunks, max_chunks))
+
+    key_idx = np.flatnonzero(keys)
+    tolerance = max(1, int(total / n * snap_ratio))
+    bounds = [0]
+    for k in range(1, n):
+        ideal = round(k * total / n)
+        bound = ideal
+        if key_idx.size:
+            near = int(key_idx[np.argmin(np.abs(key_idx - ideal))])
+            if abs(near - ideal) <= tolerance:
+                bound = near
+        if bound > bounds[-1]:
+            bounds.append(bound)
+    bounds.append(total)
+
+    # 탐색 위치는 시작 프레임보다 반 프레임 앞 → 부동소수 오차로 첫 프레임이 빠지지 않음
+    half_frame = 0.5 / fps
+    specs = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        specs.append({
+            "source": video_path,
+            "start_frame": start,
+            "frames": end - start,
+            "seek": max(0.0, float(pts[start]) - meta["start_time"] - half_frame) if start > 0 else None,
+            "keyframe": bool(keys[start]),
+            "ends_on_keyframe": end == total or bool(keys[end]),
+            "keyframes": _inner_keyframes(pts, keys, start, end, meta["start_time"], half_frame),
+            "codec": meta["codec"],
+            "pix_fmt": meta["pix_fmt"],
+            "fps": meta["fps_rational"],
+            "width": meta["width"],
+            "height": meta["height"],
+            "est_frames": end - start,
+        })
+    return specs
@@ -0,0 +1,143 @@
+# progress.py
+import os
+import time
+import asyncio
+from typing import Dict, Optional, Set
+
+from app.services import state
+from app.services.state import PROCESS_STATUS, PROCESS_LOCK
+
+# ======================================
+# 🔹 진행률 발행 / 구독 (SSE)
+# ======================================
+# 진행률 갱신(state.update_chunk_progress / set_status)은 어느 스레드에서든 state.notify(file_id)만 호출하고,
+# 실제 전달은 이벤트 루프에서 file_id별로 모아(coalesce) PUBLISH_INTERVAL마다 한 번 스냅샷을 만들어
+# 구독자 큐마다 넣는다. 구독자는 큐를 기다리므로 변경이 없으면 깨어나지 않는다.
+PUBLISH_INTERVAL = float(os.getenv("PID_PUBLISH_INTERVAL", "0.2"))   # file_id별 최소 발행 간격 (초)
+SUBSCRIBER_QUEUE_SIZE = 8                                            # 느린 구독자는 오래된 스냅샷부터 버림
+TERMINAL_STATUSES = ("done", "error")
+
+
+def snapshot(file_id: str) -> Optional[Dict]:
+    """SSE로 보내는 JSON 상태 (없으면 None)"""
+    with PROCESS_LOCK:
+        info = PROCESS_STATUS.get(file_id)
+        if info is None:
+            return None
+        chunks = list(info.get("chunks", []))
+        chunk_stats = dict(info.get("chunk_stats", {}))
+        data = {
+            "file_id": file_id,
+            "status": info.get("status"),
+            "stage": info.get("stage"),
+            "progress": float(info.get("progress", 0)),
+            "error": info.get("error"),
+            "preview": info.get("preview"),
+            "ready_chunks": len(info.get("ready_chunks", [])),
+            "masking_started_at": info.get("masking_started_at"),
+        }
+
+    per_chunk = []
+    for idx, local in enumerate(chunks):
+        s = chunk_stats.get(idx) or chunk_stats.get(str(idx)) or {}
+        per_chunk.append({
+            "chunk": idx,
+            "progress": round(float(local), 1),
+            "frames": s.get("frames"),
+            "total_frames": s.get("total_frames"),
+            "detections": s.get("detections"),
+            "fps": s.get("fps") if local < 100 else None,
+        })
+    data["chunks"] = per_chunk
+    data["fps"] = round(sum(c["fps"] or 0.0 for c in per_chunk), 2)
+    data["detections"] = sum(c["detections"] or 0 for c in per_chunk)
+
+    # 전체 ETA: 마스킹 시작 이후 청크 평균 진행 속도 기준
+    started = data.pop("masking_started_at")
+    done_frac = sum(c["progress"] for c in per_chunk) / (100 * len(per_chunk)) if per_chunk else 0.0
+    data["eta_s"] = None
+    if started and 0 < done_frac < 1 and data["status"] == "processing":
+        elapsed = time.time() - started
+        data["eta_s"] = round(elapsed * (1 - done_frac) / done_frac, 1)
+    return data
+
+
+class ProgressBus:
+    """file_id별 구독자(asyncio.Queue) 관리 + 스레드 안전한 발행"""
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pending: Set[str] = set()          # 발행 예약된 file_id (중복 예약 방지)
+        self._last_sent: Dict[str, float] = {}
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """앱 시작 시 이벤트 루프 등록 + state 알림 연결"""
+        self._loop = loop
+        state.set_progress_listener(self.publish)
+
+    # --- 발행 (아무 스레드에서나 호출) ---
+    def publish(self, file_id: str) -> None:
+        loop = self._loop
+        if loop is None or file_id not in self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._schedule, file_id)
+        except RuntimeError:
+            pass   # 종료 중인 루프
+
+    def _schedule(self, file_id: str) -> None:
+        if file_id in self._pending:
+            return   # 이미 예약됨 → 이번 변경은 다음 스냅샷에 함께 반영
+        self._pending.add(file_id)
+        delay = self._last_sent.get(file_id, 0.0) + PUBLISH_INTERVAL - time.monotonic()
+        if delay > 0:
+            self._loop.call_later(delay, self._flush, file_id)
+        else:
+            self._flush(file_id)
+
+    def _flush(self, file_id: str) -> None:
+        self._pending.discard(file_id)
+        queues = self._subscribers.get(file_id)
+        if not queues:
+            return
+        data = snapshot(file_id)
+        if data is None:
+            return
+        self._last_sent[file_id] = time.monotonic()
+        for q in queues:
+            _offer(q, data)
+
+    # --- 구독 (이벤트 루프에서 호출) ---
+    def subscribe(self, file_id: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(file_id, set()).add(q)
+        data = snapshot(file_id)
+        if data is not None:
+            _offer(q, data)   # 현재 상태를 먼저 전달
+        return q
+
+    def unsubscribe(self, file_id: str, q: asyncio.Queue) -> None:
+        queues = self._subscribers.get(file_id)
+        if queues is None:
+            return
+        queues.discard(q)
+        if not queues:
+            del self._subscribers[file_id]
+            self._last_sent.pop(file_id, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(qs) for qs in self._subscribers.values())
+
+
+def _offer(q: asyncio.Queue, data: Dict) -> None:
+    """가득 찬 큐는 가장 오래된 스냅샷을 버리고 최신 스냅샷을 넣음"""
+    if q.full():
+        try:
+            q.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    q.put_nowait(data)
+
+
+bus = ProgressBus()
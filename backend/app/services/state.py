@@ -1,4 +1,6 @@
 # state.py
+import os
+import time
 from threading import Lock
 
 # ======================================
@@ -11,8 +13,116 @@ from threading import Lock
 #     "stage": "masking",            # 현재 단계
 #     "status": "processing",        # 상태 ("processing" / "done" / "error")
 #     "chunks": [0, 100, 85, ...],   # 청크별 진행률 리스트
+#     "chunk_stats": {2: {"frames": 120, "total_frames": 300, "detections": 41, "fps": 18.5, "eta_s": 9.7}},
 # }
 PROCESS_STATUS = {}
 
 # 멀티스레드 환경에서 진행률 갱신 시 동기화용 락
 PROCESS_LOCK = Lock()
+
+# 프로세스 풀 워커에서만 설정되는 cross-process 진행률 큐
+# (워커 프로세스의 PROCESS_STATUS는 API 프로세스와 별개이므로 큐로 전달)
+PROGRESS_CHANNEL = None
+
+
+def set_progress_channel(queue) -> None:
+    """워커 프로세스 초기화 시 진행률 전달용 큐 등록"""
+    global PROGRESS_CHANNEL
+    PROGRESS_CHANNEL = queue
+
+
+# API 프로세스에서 상태가 바뀔 때 호출되는 알림 함수 (progress.bus.publish — SSE 구독자에게 전달)
+PROGRESS_LISTENER = None
+
+# 프레임 루프에서 올라오는 청크 진행률은 청크마다 이 간격(초)보다 자주 반영하지 않음 (100%는 항상 반영)
+PROGRESS_MIN_INTERVAL = float(os.getenv("PID_PROGRESS_INTERVAL", "0.25"))
+
+_last_report = {}    # (file_id, chunk_idx) → 마지막 반영 시각
+_chunk_started = {}  # (file_id, chunk_idx) → 첫 보고 시각 (fps 계산용)
+
+
+def set_progress_listener(listener) -> None:
+    global PROGRESS_LISTENER
+    PROGRESS_LISTENER = listener
+
+
+def notify(file_id) -> None:
+    """구독자에게 file_id 상태 변경 알림 (리스너가 없으면 무시)"""
+    if PROGRESS_LISTENER is not None:
+        PROGRESS_LISTENER(file_id)
+
+
+def set_status(file_id, **fields) -> None:
+    """작업 상태 필드를 한 번에 갱신하고 구독자에게 알림"""
+    with PROCESS_LOCK:
+        info = PROCESS_STATUS.get(file_id)
+        if info is None:
+            return
+        info.update(fields)
+    notify(file_id)
+
+
+# ======================================
+# 🔹 청크 진행률 갱신
+# ======================================
+def update_chunk_progress(file_id, chunk_idx, local_progress, stage=None, stats=None):
+    """청크 진행률(%)을 기록하고 전체 진행률을 다시 계산 (워커 프로세스면 큐로 전달)
+
+    stats: 청크 처리 통계 (frames, total_frames, detections, fps, eta_s) — 있으면 함께 기록
+    전체 진행률을 갱신했으면 새 값을, 아니면 None을 반환한다.
+    """
+    if PROGRESS_CHANNEL is not None:
+        PROGRESS_CHANNEL.put((file_id, chunk_idx, local_progress, stage, stats))
+        return None
+
+    with PROCESS_LOCK:
+        info = PROCESS_STATUS.get(file_id)
+        if info is None or chunk_idx >= len(info["chunks"]):
+            return None
+
+        info["chunks"][chunk_idx] = local_progress
+        avg_progress = sum(info["chunks"]) / len(info["chunks"])
+        info["progress"] = round(10 + avg_progress * 0.85, 2)
+        if stage is not None:
+            info["stage"] = stage
+        if stats is not None:
+            info.setdefault("chunk_stats", {})[chunk_idx] = stats
+        progress = info["progress"]
+    notify(file_id)
+    return progress
+
+
+def report_chunk_progress(file_id, chunk_idx, local_progress, stage=None, frames=None,
+                          total_frames=None, detections=None):
+    """프레임 루프용 진행률 보고 — 청크마다 PROGRESS_MIN_INTERVAL 간격으로만 반영 (나머지는 버림)
+
+    반영했으면 update_chunk_progress의 반환값, 건너뛰었으면 None.
+    """
+    key = (file_id, chunk_idx)
+    now = time.monotonic()
+    if key not in _chunk_started:
+        # 100%까지 보고되지 않고 끝난 청크(중단 / 오류)의 기록은 오래되면 정리
+        for stale in [k for k, t in _last_report.items() if now - t > 600]:
+            _last_report.pop(stale, None)
+            _chunk_started.pop(stale, None)
+    started = _chunk_started.setdefault(key, now)
+    if local_progress < 100 and now - _last_report.get(key, 0.0) < PROGRESS_MIN_INTERVAL:
+        return None
+    _last_report[key] = now
+
+    stats = None
+    if frames is not None:
+        elapsed = now - started
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, (total_frames or frames) - frames)
+        stats = {
+            "frames": frames,
+            "total_frames": total_frames,
+            "detections": detections,
+            "fps": round(fps, 2),
+            "eta_s": round(remaining / fps, 1) if fps > 0 else None,
+        }
+    if local_progress >= 100:
+        _last_report.pop(key, None)
+        _chunk_started.pop(key, None)
+    return update_chunk_progress(file_id, chunk_idx, local_progress, stage, stats)
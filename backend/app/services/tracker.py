@@ -0,0 +1,192 @@
+# tracker.py
+import cv2
+import numpy as np
+
+from app.services import metrics
+
+# ======================================
+# 🔹 탐지 건너뛰기 + 옵티컬 플로우 추적
+# ======================================
+# 객체(dict)는 ai_engine.build_objects 결과와 같은 형태:
+#   {"bbox": (x1, y1, x2, y2), "cls": int, "regions": [{"box", "mask", "hint"}, ...]}
+# 추적 중 유지(hold)되는 객체에는 "ttl"(남은 프레임 수)이 추가된다.
+
+_LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+def _shift_region(region, dx, dy, W, H):
+    """영역을 (dx, dy)만큼 이동 — 프레임 밖으로 나간 부분은 마스크를 잘라냄"""
+    x1, y1, x2, y2 = region["box"]
+    nx1, ny1, nx2, ny2 = x1 + dx, y1 + dy, x2 + dx, y2 + dy
+    cx1, cy1, cx2, cy2 = max(0, nx1), max(0, ny1), min(W, nx2), min(H, ny2)
+    if cx2 <= cx1 or cy2 <= cy1:
+        return None
+
+    hx1, hy1, hx2, hy2 = region["hint"]
+    return {
+        "box": (cx1, cy1, cx2, cy2),
+        "mask": region["mask"][cy1 - ny1:cy2 - ny1, cx1 - nx1:cx2 - nx1],
+        "hint": (hx1 + dx, hy1 + dy, hx2 + dx, hy2 + dy),
+    }
+
+
+def _coverage(box, others):
+    """box 면적 중 다른 박스들과 가장 많이 겹치는 비율 (0~1)"""
+    x1, y1, x2, y2 = box
+    area = max(1, (x2 - x1) * (y2 - y1))
+    best = 0.0
+    for ox1, oy1, ox2, oy2 in others:
+        iw = min(x2, ox2) - max(x1, ox1)
+        ih = min(y2, oy2) - max(y1, oy1)
+        if iw > 0 and ih > 0:
+            best = max(best, iw * ih / area)
+    return best
+
+
+class DetectionTracker:
+    """K 프레임마다 전체 탐지를 돌리고, 그 사이 프레임은 LK 옵티컬 플로우로 객체 영역을 이동
+
+    - 추적 신뢰도(전·역방향 일치 포인트 비율)가 min_confidence 아래로 떨어지면 즉시 재탐지
+    - 재탐지에서 놓친 영역(예: 한 프레임 얼굴 미검출)은 hold_frames 동안 계속 마스킹
+    """
+
+    def __init__(self, detect_interval=5, min_confidence=0.5, hold_frames=10, max_points=30):
+        self.detect_interval = max(1, int(detect_interval))
+        self.min_confidence = min_confidence
+        self.hold_frames = hold_frames
+        self.max_points = max_points
+
+        self.objects = []
+        self.detect_count = 0
+        self.track_count = 0
+        self._prev_gray = None
+        self._since_detect = 0
+
+    # ----------------------------------
+    # 프레임 1장 처리
+    # ----------------------------------
+    def step(self, img, detect_fn):
+        """현재 프레임의 객체 리스트 반환 — 필요할 때만 detect_fn()(전체 탐지)을 호출"""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        H, W = gray.shape[:2]
+
+        tracked, confidence = [], 0.0
+        if self._prev_gray is not None:
+            with metrics.timer("track_flow"):
+                tracked, confidence = self._propagate(self._prev_gray, gray, W, H)
+
+        need_detect = (
+            self._prev_gray is None
+            or self._since_detect + 1 >= self.detect_interval
+            or confidence < self.min_confidence
+        )
+
+        if need_detect:
+            detected = detect_fn()
+            self.objects = detected + self._hold_missed(tracked, detected)
+            self._since_detect = 0
+            self.detect_count += 1
+        else:
+            self.objects = self._age(tracked)
+            self._since_detect += 1
+            self.track_count += 1
+
+        self._prev_gray = gray
+        return self.objects
+
+    def stats(self):
+        total = self.detect_count + self.track_count
+        return {
+            "detect_frames": self.detect_count,
+            "tracked_frames": self.track_count,
+            "detect_ratio": round(self.detect_count / total, 3) if total else 0.0,
+        }
+
+    # ----------------------------------
+    # 내부 함수
+    # ----------------------------------
+    def _propagate(self, prev_gray, gray, W, H):
+        """이전 프레임 객체들을 현재 프레임으로 이동 → (이동된 객체, 전체 추적 신뢰도)"""
+        if not self.objects:
+            return [], 1.0
+
+        # 객체별 특징점을 모아 LK 한 번으로 추적
+        points, owners = [], []
+        for k, obj in enumerate(self.objects):
+            x1, y1, x2, y2 = obj["bbox"]
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(W, x2), min(H, y2)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+            pts = cv2.goodFeaturesToTrack(prev_gray[y1:y2, x1:x2], self.max_points, 0.01, 5)
+            if pts is None:
+                continue
+            pts = pts.reshape(-1, 2) + np.array([x1, y1], dtype=np.float32)
+            points.append(pts)
+            owners.extend([k] * len(pts))
+
+        if not points:
+            # 특징점이 없으면(무늬 없는 영역) 제자리 유지
+            return [dict(obj) for obj in self.objects], 1.0
+
+        p0 = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+        owners = np.asarray(owners)
+        p1, st1, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **_LK_PARAMS)
+        p0r, st2, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **_LK_PARAMS)
+        fb_err = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+        good = (st1.ravel() == 1) & (st2.ravel() == 1) & (fb_err < 1.0)
+        motion = (p1 - p0).reshape(-1, 2)
+
+        moved, confidences = [], []
+        for k, obj in enumerate(self.objects):
+            mine = owners == k
+            n = int(mine.sum())
+            if n == 0:
+                moved.append(dict(obj))
+                continue
+
+            ok = mine & good
+            confidences.append(ok.sum() / n)
+            if not ok.any():
+                moved.append(dict(obj))
+                continue
+
+            dx, dy = (int(v) for v in np.round(np.median(motion[ok], axis=0)))
+            regions = [r for r in (_shift_region(r, dx, dy, W, H) for r in obj["regions"]) if r is not None]
+            x1, y1, x2, y2 = obj["bbox"]
+            shifted = dict(obj, bbox=(x1 + dx, y1 + dy, x2 + dx, y2 + dy), regions=regions)
+            if regions or not obj["regions"]:
+                moved.append(shifted)
+
+        confidence = float(np.mean(confidences)) if confidences else 1.0
+        return moved, confidence
+
+    def _hold_missed(self, tracked, detected):
+        """재탐지에서 덮이지 않은 이전 영역을 hold_frames 동안 유지 (미검출 깜빡임 방지)"""
+        if self.hold_frames <= 0:
+            return []
+
+        new_boxes = [r["box"] for obj in detected for r in obj["regions"]]
+        held = []
+        for obj in tracked:
+            ttl = obj.get("ttl", self.hold_frames)
+            if ttl <= 0:
+                continue
+            missed = [r for r in obj["regions"] if _coverage(r["box"], new_boxes) < 0.5]
+            if missed:
+                held.append(dict(obj, regions=missed, ttl=ttl - 1))
+        return held
+
+    def _age(self, tracked):
+        """유지 중인 객체의 남은 프레임 수 감소, 만료된 것은 제거"""
+        alive = []
+        for obj in tracked:
+            if "ttl" in obj:
+                if obj["ttl"] <= 0:
+                    continue
+                obj = dict(obj, ttl=obj["ttl"] - 1)
+            alive.append(obj)
+        return alive
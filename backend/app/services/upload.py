@@ -0,0 +1,380 @@
+# upload.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:   # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# ======================================
+# 🔹 업로드 설정
+# ======================================
+UPLOAD_BLOCK_SIZE = 1024 * 1024                                           # 한 번에 읽고 쓰는 블록 크기 (1 MiB)
+MAX_UPLOAD_SIZE = int(os.getenv("PID_MAX_UPLOAD_MB", "10240")) * 1024 * 1024  # 최대 업로드 크기
+MULTIPART_OVERHEAD = 64 * 1024                                            # 단일 업로드의 파일 외 multipart 부분 상한
+
+# 업로드 디렉터리 안의 숨김 하위 디렉터리
+#  - .partial/{file_id}.part : 이어받기 중인 파일
+#  - .meta/{file_id}.json    : 업로드 메타데이터 (길이, 오프셋, 파일명, sha256)
+PARTIAL_DIRNAME = ".partial"
+META_DIRNAME = ".meta"
+
+
+class UploadError(Exception):
+    """업로드 프로토콜 오류 — status_code를 그대로 HTTP 응답 코드로 사용"""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# 진행 중인 업로드의 sha256 상태 (프로세스 재시작 시 사라지면 완료 시점에 파일 전체를 다시 해시)
+_hashers: Dict[str, "hashlib._Hash"] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """경로 구분자 제거 (../ 등으로 업로드 디렉터리를 벗어나지 않도록)"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name or "video.mp4"
+
+
+def _dirs(upload_dir: str):
+    partial = os.path.join(upload_dir, PARTIAL_DIRNAME)
+    meta = os.path.join(upload_dir, META_DIRNAME)
+    os.makedirs(partial, exist_ok=True)
+    os.makedirs(meta, exist_ok=True)
+    return partial, meta
+
+
+def _lock_for(file_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(file_id, threading.Lock())
+
+
+# ======================================
+# 🔹 메타데이터
+# ======================================
+def read_meta(upload_dir: str, file_id: str) -> Optional[Dict]:
+    _, meta_dir = _dirs(upload_dir)
+    path = os.path.join(meta_dir, f"{file_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_meta(upload_dir: str, file_id: str, meta: Dict) -> None:
+    _, meta_dir = _dirs(upload_dir)
+    path = os.path.join(meta_dir, f"{file_id}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+# ======================================
+# 🔹 블록 쓰기 (디스크 쓰기 / 해시는 이벤트 루프 밖에서)
+# ======================================
+async def _coalesce(body: AsyncIterator[bytes], size: int = UPLOAD_BLOCK_SIZE) -> AsyncIterator[bytes]:
+    """요청 본문의 작은 조각(수십 KB)을 size 바이트 블록으로 모음 — 스레드 전환을 블록마다 한 번으로"""
+    buf = bytearray()
+    async for piece in body:
+        buf += piece
+        if len(buf) >= size:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def _write_block(f, block: bytes, hasher) -> None:
+    f.write(block)
+    if hasher is not None:
+        hasher.update(block)
+
+
+def _open_part(path: str, offset: int):
+    f = open(path, "r+b")
+    f.truncate(offset)   # 이전 요청이 기록 전에 끊겼을 때 남은 꼬리 제거
+    f.seek(offset)
+    return f
+
+
+def sha256_file(path: str) -> str:
+    """파일 sha256 (블록 단위로 읽음)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ======================================
+# 🔹 단일 요청 스트리밍 업로드
+# ======================================
+async def save_stream(upload_dir: str, file_id: str, filename: str, body: AsyncIterator[bytes]) -> Dict:
+    """body 조각을 블록 단위로 디스크에 쓰면서 sha256 계산 (전체를 메모리에 올리지 않음, 쓰기 / 해시는 스레드에서)"""
+    filename = safe_filename(filename)
+    save_path = os.path.join(upload_dir, f"{file_id}_{filename}")
+    tmp_path = save_path + ".uploading"
+    h = hashlib.sha256()
+    size = 0
+
+    try:
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for block in _coalesce(body):
+                size += len(block)
+                if size > MAX_UPLOAD_SIZE:
+                    raise UploadError(413, f"upload exceeds {MAX_UPLOAD_SIZE} bytes")
+                await asyncio.to_thread(_write_block, f, block, h)
+        finally:
+            f.close()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    meta = {"filename": filename, "length": size, "offset": size, "sha256": h.hexdigest(),
+            "path": save_path, "complete": True, "updated_at": time.time()}
+    await asyncio.to_thread(_publish, upload_dir, file_id, tmp_path, meta)
+    return meta
+
+
+def _publish(upload_dir: str, file_id: str, tmp_path: str, meta: Dict) -> None:
+    os.replace(tmp_path, meta["path"])
+    _write_meta(upload_dir, file_id, meta)
+
+
+async def save_multipart(upload_dir: str, file_id: str, content_type: str, body: AsyncIterator[bytes],
+                         field: str = "file") -> Dict:
+    """multipart/form-data 본문을 받는 대로 파싱해 field 파트만 save_stream으로 기록
+
+    본문 전체를 임시 파일에 먼저 받아 두지 않으며 (starlette request.form()과 달리),
+    크기 제한은 Content-Length 헤더가 아니라 실제로 받은 바이트에 적용한다.
+    """
+    ctype, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise UploadError(400, "Content-Type must be multipart/form-data with a boundary")
+
+    # 파서 콜백은 동기 함수 → 이벤트만 쌓아 두고 아래에서 순서대로 처리
+    events = deque()
+    header = {"field": b"", "value": b"", "headers": {}}
+
+    def on_part_begin():
+        header["headers"] = {}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("part", header["headers"])),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+        "on_end": lambda: events.append(("done", None)),
+    })
+
+    async def parts():
+        try:
+            async for piece in body:
+                parser.write(piece)
+                while events:
+                    yield events.popleft()
+            parser.finalize()
+        except ValueError as e:   # python-multipart FormParserError
+            raise UploadError(400, f"malformed multipart body: {e}")
+        while events:
+            yield events.popleft()
+
+    async def file_data(it):
+        """현재 파트의 데이터 조각 — 파트가 닫히기 전에 본문이 끝나면 400"""
+        async for kind, data in it:
+            if kind == "data":
+                yield data
+            elif kind == "end":
+                return
+        raise UploadError(400, "multipart body ended before the file part was complete")
+
+    it = parts()
+    meta, other, complete = None, 0, False
+    try:
+        async for kind, data in it:
+            if kind == "part" and meta is None:
+                _, disposition = parse_options_header(data.get(b"content-disposition", b""))
+                if disposition.get(b"name") == field.encode() and b"filename" in disposition:
+                    filename = disposition[b"filename"].decode("utf-8", "replace")
+                    meta = await save_stream(upload_dir, file_id, filename, file_data(it))
+            elif kind == "data":
+                # 파일 외 필드는 작아야 함 — 큰 본문을 다른 필드로 보내 제한을 우회하지 못하도록
+                other += len(data)
+                if other > MULTIPART_OVERHEAD:
+                    raise UploadError(413, f"non-file multipart fields exceed {MULTIPART_OVERHEAD} bytes")
+            elif kind == "done":
+                complete = True
+
+        if meta is None:
+            raise UploadError(400, f"multipart field '{field}' is required")
+        if not complete:
+            raise UploadError(400, "multipart body ended before the closing boundary")
+    except BaseException:
+        if meta is not None:   # 파일은 저장됐지만 본문 뒷부분이 잘못된 경우 — 완료된 업로드로 남기지 않음
+            await asyncio.to_thread(_discard, upload_dir, file_id, meta["path"])
+        raise
+    return meta
+
+
+def _discard(upload_dir: str, file_id: str, path: str) -> None:
+    _, meta_dir = _dirs(upload_dir)
+    for p in (path, os.path.join(meta_dir, f"{file_id}.json")):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+# ======================================
+# 🔹 이어받기 업로드 (tus 유사 오프셋 프로토콜)
+# ======================================
+def create_resumable(upload_dir: str, file_id: str, filename: str, length: int,
+                     expected_sha256: Optional[str] = None) -> Dict:
+    """업로드 세션 생성 — 전체 길이를 먼저 받아 최대 크기 검사"""
+    if length <= 0:
+        raise UploadError(400, "Upload-Length must be positive")
+    if length > MAX_UPLOAD_SIZE:
+        raise UploadError(413, f"upload exceeds {MAX_UPLOAD_SIZE} bytes")
+
+    partial_dir, _ = _dirs(upload_dir)
+    open(os.path.join(partial_dir, f"{file_id}.part"), "wb").close()
+    meta = {"filename": safe_filename(filename), "length": length, "offset": 0,
+            "expected_sha256": expected_sha256, "complete": False, "updated_at": time.time()}
+    _write_meta(upload_dir, file_id, meta)
+    _hashers[file_id] = hashlib.sha256()
+    return meta
+
+
+async def append_resumable(upload_dir: str, file_id: str, offset: int, body: AsyncIterator[bytes]) -> Dict:
+    """offset 위치부터 요청 본문을 블록 단위로 이어 씀 — 전체 길이에 도달하면 완료 처리"""
+    lock = _lock_for(file_id)
+    if not lock.acquire(blocking=False):
+        raise UploadError(423, "another PATCH is in progress for this upload")
+
+    try:
+        meta = await asyncio.to_thread(read_meta, upload_dir, file_id)
+        if meta is None:
+            raise UploadError(404, "upload not found")
+        if meta["complete"]:
+            raise UploadError(409, "upload already complete")
+        if offset != meta["offset"]:
+            raise UploadError(409, f"offset mismatch (server offset={meta['offset']})")
+
+        partial_dir, _ = _dirs(upload_dir)
+        part_path = os.path.join(partial_dir, f"{file_id}.part")
+        # 재시작 등으로 해시 상태가 없거나 중간에 끊긴 적이 있으면 완료 시 파일 전체를 다시 해시
+        hasher = _hashers.get(file_id) if offset == meta.get("hashed_offset", 0) else None
+
+        written = offset
+        try:
+            f = await asyncio.to_thread(_open_part, part_path, offset)
+            try:
+                # 쓰기 / 해시는 스레드에서 — 큰 PATCH가 이벤트 루프(SSE 등 다른 요청)를 막지 않도록
+                async for block in _coalesce(body):
+                    if written + len(block) > meta["length"]:
+                        raise UploadError(413, "body exceeds declared Upload-Length")
+                    await asyncio.to_thread(_write_block, f, block, hasher)
+                    written += len(block)
+            finally:
+                f.close()
+        finally:
+            # 끊긴 경우에도 디스크에 실제로 쓴 만큼 오프셋 기록 (모으던 중인 블록은 다음 PATCH에서 다시 받음)
+            meta["offset"] = written
+            meta["hashed_offset"] = written if hasher is not None else -1
+            meta["updated_at"] = time.time()
+            await asyncio.to_thread(_write_meta, upload_dir, file_id, meta)
+            if hasher is None:
+                _hashers.pop(file_id, None)
+
+        if written == meta["length"]:
+            # 해시 상태가 없으면 파일 전체를 다시 읽으므로 역시 스레드에서
+            return await asyncio.to_thread(_finalize, upload_dir, file_id, meta, part_path, hasher)
+        return meta
+    finally:
+        lock.release()
+
+
+def _finalize(upload_dir: str, file_id: str, meta: Dict, part_path: str, hasher) -> Dict:
+    checksum = hasher.hexdigest() if hasher is not None else sha256_file(part_path)
+    _hashers.pop(file_id, None)
+
+    expected = meta.get("expected_sha256")
+    if expected and expected.lower() != checksum:
+        os.remove(part_path)
+        meta.update(offset=0, hashed_offset=0, updated_at=time.time())
+        _write_meta(upload_dir, file_id, meta)
+        _hashers[file_id] = hashlib.sha256()
+        raise UploadError(460, "checksum mismatch — upload restarted from offset 0")
+
+    save_path = os.path.join(upload_dir, f"{file_id}_{meta['filename']}")
+    os.replace(part_path, save_path)
+    meta.update(sha256=checksum, path=save_path, complete=True, updated_at=time.time())
+    _write_meta(upload_dir, file_id, meta)
+    return meta
+
+
+# ======================================
+# 🔹 조회 / 정리
+# ======================================
+def is_file_id(value: str) -> bool:
+    """발급한 형식(uuid4 문자열 36자) 그대로인지 — 일부만 맞춘 값으로 다른 파일을 고르지 못하도록"""
+    try:
+        return str(uuid.UUID(value, version=4)) == value
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def find_upload(upload_dir: str, file_id: str) -> Optional[str]:
+    """완료된 업로드 파일 경로 (이어받기 중이거나 없으면 None)"""
+    if not is_file_id(file_id):
+        return None
+    prefix = f"{file_id}_"
+    for f in os.listdir(upload_dir):
+        if f.startswith(prefix) and not f.endswith(".uploading"):
+            path = os.path.join(upload_dir, f)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def prune_stale(upload_dir: str, max_age: float) -> None:
+    """오래 갱신되지 않은 이어받기 파일과 메타데이터 제거"""
+    partial_dir, meta_dir = _dirs(upload_dir)
+    now = time.time()
+    for d in (partial_dir, meta_dir):
+        for f in os.listdir(d):
+            path = os.path.join(d, f)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    print(f"[🧹 오래된 업로드 삭제] {path}")
+            except OSError as e:
+                print(f"[⚠️ 삭제 실패] {path}: {e}")
@@ -0,0 +1,175 @@
+# workers.py
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.services.state import update_chunk_progress
+
+# ======================================
+# 🔹 워커 설정
+# ======================================
+# "thread": 전역 ThreadPoolExecutor 공유 (모델 1개 공유, 기본값)
+# "process": 상주 프로세스 풀 — 워커마다 YOLO / FaceAnalysis를 한 번만 로드하고 청크를 받아 처리
+# 두 모드 모두 풀은 모든 작업이 공유하므로 동시 청크 처리 수는 WORKER_COUNT로 제한된다.
+# API_ONLY면 API 프로세스는 모델을 전혀 로드하지 않고 프로세스 풀 워커에만 청크를 보낸다 (process 모드 강제).
+API_ONLY = os.getenv("PID_API_ONLY", "0") == "1"
+WORKER_MODE = "process" if API_ONLY else os.getenv("PID_WORKER_MODE", "thread")
+
+# 시작 시 모델 워밍업 (0이면 첫 작업에서 로드 — 그동안 /ready는 준비됨으로 응답)
+WARMUP = os.getenv("PID_WARMUP", "1") == "1"
+
+# 청크 병렬 워커 수 (os.cpu_count()와 별도로 지정 가능)
+WORKER_COUNT = int(os.getenv("PID_WORKER_COUNT", "0")) or (os.cpu_count() or 1)
+
+# frames 모드 인코더 단계 동시 실행 수 (실제 인코딩은 ffmpeg 프로세스가 하므로 스레드 풀로 충분)
+ENCODE_WORKERS = int(os.getenv("PID_ENCODE_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 2)
+
+_pool = None
+_thread_pool = None
+_encode_pool = None
+_pool_lock = threading.Lock()
+_progress_queue = None
+_pump_thread = None
+_ready_workers = set()      # 워밍업을 마친 워커 프로세스 pid
+_READY = "__worker_ready__"  # 진행률 큐로 보내는 워커 준비 완료 메시지 태그
+
+
+# ======================================
+# 🔹 워커 프로세스 초기화 (프로세스당 1회)
+# ======================================
+def _init_worker(progress_queue, threads_per_worker):
+    """진행률 큐 등록 + 스레드 수 제한 후 모델 로드 / 워밍업 (끝나면 API 프로세스에 준비 완료 알림)"""
+    # 워커끼리 코어를 나눠 쓰도록 BLAS / OpenMP 스레드 수 제한 (torch import 전에 설정)
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    os.environ["MKL_NUM_THREADS"] = str(threads_per_worker)
+
+    from app.services import state, metrics
+    state.set_progress_channel(progress_queue)
+    metrics.set_forwarding(True)   # 이 프로세스의 메트릭은 청크 요약에 담아 API 프로세스로 전달
+
+    import cv2
+    cv2.setNumThreads(threads_per_worker)
+
+    from app.services import ai_engine
+    if ai_engine.warm_up():
+        progress_queue.put((_READY, os.getpid()))
+
+
+def _ping():
+    """워커 프로세스를 미리 띄우기 위한 빈 작업"""
+    return os.getpid()
+
+
+def _pump_progress(queue):
+    """워커 프로세스에서 올라온 진행률을 API 프로세스의 PROCESS_STATUS에 반영"""
+    while True:
+        msg = queue.get()
+        if msg is None:
+            break
+        if msg[0] == _READY:
+            _ready_workers.add(msg[1])
+            continue
+        update_chunk_progress(*msg)
+
+
+# ======================================
+# 🔹 풀 생성 / 종료
+# ======================================
+def get_process_pool():
+    """상주 프로세스 풀 반환 (최초 호출 시 생성 — 워커는 시작 시 모델을 로드)"""
+    global _pool, _progress_queue, _pump_thread
+
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+
+        # fork 시 torch / onnxruntime 스레드 상태가 꼬일 수 있으므로 spawn 사용
+        ctx = mp.get_context("spawn")
+        _progress_queue = ctx.Queue()
+        threads_per_worker = max(1, (os.cpu_count() or 1) // WORKER_COUNT)
+
+        _pool = ProcessPoolExecutor(
+            max_workers=WORKER_COUNT,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(_progress_queue, threads_per_worker),
+        )
+        _pump_thread = threading.Thread(target=_pump_progress, args=(_progress_queue,), daemon=True)
+        _pump_thread.start()
+        print(f"[⚙️ 프로세스 풀 시작] workers={WORKER_COUNT}, threads/worker={threads_per_worker}")
+        return _pool
+
+
+def get_executor():
+    """청크 처리용 전역 executor 반환 (작업마다 새로 만들지 않음)"""
+    global _thread_pool
+
+    if WORKER_MODE == "process":
+        return get_process_pool()
+
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix="chunk")
+        return _thread_pool
+
+
+def warm_up():
+    """앱 시작 시 모델 워밍업을 백그라운드로 시작 (요청 처리는 바로 가능, 준비 상태는 readiness())
+
+    process 모드: 풀을 만들고 워커 수만큼 빈 작업을 보내 워커를 모두 띄움 (각자 초기화 시 워밍업)
+    thread 모드: API 프로세스에서 스레드로 모델 로드 + 워밍업
+    """
+    if not WARMUP:
+        return
+    if WORKER_MODE == "process":
+        pool = get_process_pool()
+        for _ in range(WORKER_COUNT):
+            pool.submit(_ping)
+        return
+
+    from app.services import ai_engine
+    threading.Thread(target=ai_engine.warm_up, name="warmup", daemon=True).start()
+
+
+def readiness():
+    """/ready 응답 — 추론할 수 있는 워커가 하나라도 준비되면 ready"""
+    if WORKER_MODE == "process":
+        ready = len(_ready_workers)
+        return {"ready": ready > 0 or not WARMUP, "mode": "process", "api_only": API_ONLY,
+                "workers_ready": ready, "workers": WORKER_COUNT}
+
+    from app.services import ai_engine
+    return {"ready": ai_engine.WARMED_UP or not WARMUP, "mode": "thread", "api_only": False,
+            "models_loaded": ai_engine.models_loaded(), "warmed_up": ai_engine.WARMED_UP}
+
+
+def get_encode_executor():
+    """인코더 단계 전용 스레드 풀 (마스킹 워커 풀과 분리)"""
+    global _encode_pool
+
+    with _pool_lock:
+        if _encode_pool is None:
+            _encode_pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+        return _encode_pool
+
+
+def shutdown():
+    """앱 종료 시 프로세스 풀과 진행률 펌프 정리"""
+    global _pool, _thread_pool, _encode_pool, _progress_queue, _pump_thread
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+        if _encode_pool is not None:
+            _encode_pool.shutdown(wait=False, cancel_futures=True)
+            _encode_pool = None
+        if _progress_queue is not None:
+            _progress_queue.put(None)
+            _progress_queue = None
+        _pump_thread = None
+        _ready_workers.clear()
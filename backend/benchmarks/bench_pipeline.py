@@ -0,0 +1,566 @@
+# bench_pipeline.py
+"""마스킹 파이프라인 벤치마크 (CPU 전용, 네트워크 불필요)
+
+합성 영상(움직이는 사각형 = 차량 / 사람, 사람 위쪽 타원 = 얼굴)을 만들어 엔진 모드별로
+처리 속도(frames/s), 단계별 지연(decode / yolo / face / composite / encode), 최대 RSS를 측정하고
+결과를 JSON으로 저장한다. 커밋 간 비교는 --compare로 두 결과 파일을 나란히 출력한다.
+
+  --detector synthetic (기본값): 색으로 합성 객체를 찾는 검출기로 YOLO / 얼굴 검출을 대체
+      → 모델 파일 / 다운로드 없이 디코딩 · 합성 · 인코딩 경로만 비교할 때
+  --detector model: models/best.pt + buffalo_l(로컬에 있어야 함)을 CPU로 실행
+  --backends torch,onnx,onnx:int8,...: 같은 합성 프레임으로 추론 백엔드별 YOLO 호출만 비교 (best.pt 필요)
+
+사용법 (backend 디렉터리에서):
+    python -m benchmarks.bench_pipeline --width 1280 --height 720 --seconds 10 --objects 6 --faces 3
+    python -m benchmarks.bench_pipeline --modes stream,tracking --detector model
+    python -m benchmarks.bench_pipeline --modes "" --backends torch,onnx,onnx:int8,openvino:fp16
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import os
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")   # torch import 전에 GPU 숨김 (CPU 전용 측정)
+
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import psutil
+
+from app.services import ai_engine, preprocess, combine, inference
+
+MODES = ("stream", "tracking", "frames")
+STAGES = ("decode", "yolo", "face", "composite", "encode")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 합성 객체 색 (BGR) — 인코딩 후에도 구분되도록 서로 멀리 떨어진 색 사용
+VEHICLE_BGR = (40, 40, 220)
+PERSON_BGR = (220, 120, 40)
+FACE_BGR = (150, 200, 240)
+COLOR_TOLERANCE = 45
+MIN_COMPONENT_AREA = 64
+
+
+# ======================================
+# 🔹 합성 장면
+# ======================================
+class SyntheticScene:
+    """움직이는 사각형(차량 / 사람)과 얼굴 타원이 있는 장면 — 같은 seed면 같은 영상"""
+
+    def __init__(self, width: int, height: int, n_objects: int, n_faces: int, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.width, self.height = width, height
+
+        # 배경: 저주파 노이즈 + 그라데이션 (완전히 평평하면 인코딩 비용이 비현실적으로 낮음)
+        small = rng.integers(90, 170, size=(max(2, height // 40), max(2, width // 40), 3), dtype=np.uint8)
+        self.background = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        self.background = cv2.GaussianBlur(self.background, (0, 0), 3)
+
+        self.objects = []
+        for k in range(n_objects):
+            person = k < n_faces
+            if person:
+                w, h = int(rng.integers(width // 16, width // 9)), int(rng.integers(height // 5, height // 3))
+            else:
+                w, h = int(rng.integers(width // 10, width // 5)), int(rng.integers(height // 10, height // 6))
+            self.objects.append({
+                "person": person,
+                "size": (w, h),
+                "pos": rng.uniform([0, 0], [width - w, height - h]),
+                "vel": rng.uniform(-1, 1, 2) * width / 150,
+            })
+
+    @staticmethod
+    def _bounce(p: float, limit: float) -> float:
+        """0 ~ limit 사이를 왕복하는 좌표 (벽에서 반사)"""
+        if limit <= 0:
+            return 0.0
+        m = p % (2 * limit)
+        return m if m <= limit else 2 * limit - m
+
+    def frame(self, t: int) -> np.ndarray:
+        shift = (t * 2) % self.width
+        img = np.roll(self.background, shift, axis=1)   # 배경도 천천히 움직임 (카메라 패닝)
+        for obj in self.objects:
+            w, h = obj["size"]
+            x = int(self._bounce(obj["pos"][0] + obj["vel"][0] * t, self.width - w))
+            y = int(self._bounce(obj["pos"][1] + obj["vel"][1] * t, self.height - h))
+            color = PERSON_BGR if obj["person"] else VEHICLE_BGR
+            cv2.rectangle(img, (x, y), (x + w - 1, y + h - 1), color, -1)
+            if obj["person"]:
+                cv2.ellipse(img, (x + w // 2, y + h // 6), (w // 3, h // 8), 0, 0, 360, FACE_BGR, -1)
+        return img
+
+
+def write_video(scene: SyntheticScene, path: str, frames: int, fps: int) -> str:
+    with combine.FrameWriter(path, scene.width, scene.height, framerate=fps, preset="veryfast", crf=20) as writer:
+        for t in range(frames):
+            writer.write(scene.frame(t))
+    return path
+
+
+# ======================================
+# 🔹 합성 검출기 (YOLO / 얼굴 검출 대체)
+# ======================================
+def _color_components(img: np.ndarray, color, tol: int = COLOR_TOLERANCE):
+    lo = np.clip(np.array(color) - tol, 0, 255).astype(np.uint8)
+    hi = np.clip(np.array(color) + tol, 0, 255).astype(np.uint8)
+    mask = cv2.inRange(img, lo, hi)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    comps = []
+    for k in range(1, n):
+        x, y, w, h, area = stats[k]
+        if area >= MIN_COMPONENT_AREA:
+            comps.append(((int(x), int(y), int(x + w), int(y + h)), labels == k))
+    return comps
+
+
+class SyntheticDetector:
+    """색 기반 검출 — detect_batch / detect_person_faces와 같은 입출력 형태
+
+    세그멘테이션 마스크는 YOLO처럼 저해상도(1/mask_scale)로 만들어 마스크 경로도 같이 측정한다.
+    """
+
+    def __init__(self, mask_scale: int = 4) -> None:
+        self.mask_scale = mask_scale
+
+    def detect_batch(self, imgs: List[np.ndarray]):
+        return [self._detect(img) for img in imgs]
+
+    def _detect(self, img: np.ndarray) -> Optional[Dict]:
+        H, W = img.shape[:2]
+        found = [(box, m, 1) for box, m in _color_components(img, VEHICLE_BGR)]
+        for box, m in _color_components(img, PERSON_BGR):
+            # 얼굴 타원은 사람 사각형 색이 아니므로 박스 안쪽은 채워서 사람 마스크로 사용
+            x1, y1, x2, y2 = box
+            filled = np.zeros_like(m)
+            filled[y1:y2, x1:x2] = True
+            found.append((box, filled, 0))
+        if not found:
+            return None
+
+        mh, mw = max(1, H // self.mask_scale), max(1, W // self.mask_scale)
+        masks = np.stack([
+            cv2.resize(m.astype(np.uint8), (mw, mh), interpolation=cv2.INTER_NEAREST).astype(np.float32)
+            for _, m, _ in found
+        ])
+        return {
+            "xyxy": np.array([box for box, _, _ in found], dtype=int),
+            "cls": np.array([cls for _, _, cls in found], dtype=int),
+            "conf": np.full(len(found), 0.9, dtype=np.float32),
+            "masks": masks,
+        }
+
+    def detect_person_faces(self, img: np.ndarray, person_boxes, mode=None, infer=None):
+        faces = _color_components(img, FACE_BGR)
+        per_person = []
+        for x1, y1, x2, y2 in person_boxes:
+            inside = [box for box, _ in faces
+                      if x1 <= (box[0] + box[2]) / 2 < x2 and y1 <= (box[1] + box[3]) / 2 < y2]
+            per_person.append(np.array(inside, dtype=np.float32).reshape(-1, 4))
+        return per_person
+
+
+# ======================================
+# 🔹 측정 도구
+# ======================================
+class StageTimer:
+    """단계별 누적 시간 / 호출 수"""
+
+    def __init__(self) -> None:
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    @contextmanager
+    def measure(self, stage: str):
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += perf_counter() - t0
+            self.calls[stage] += 1
+
+    def wrap(self, stage: str, fn):
+        def timed(*args, **kwargs):
+            with self.measure(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    def wrap_iter(self, stage: str, iterable):
+        it = iter(iterable)
+        while True:
+            with self.measure(stage):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+
+class TimedWriter:
+    """FrameWriter 래퍼 — 파이프 쓰기(인코더가 밀리면 대기) 시간을 encode 단계로 기록"""
+
+    def __init__(self, writer, timer: StageTimer) -> None:
+        self.writer, self.timer = writer, timer
+
+    def write(self, frame) -> None:
+        with self.timer.measure("encode"):
+            self.writer.write(frame)
+
+    def close(self) -> None:
+        with self.timer.measure("encode"):
+            self.writer.close()
+
+
+class PeakRSS(threading.Thread):
+    """RSS를 주기적으로 샘플링해 최대값 기록 (ffmpeg 등 자식 프로세스 포함 값도 따로)"""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.peak_self = self.peak_total = 0
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                rss = self.proc.memory_info().rss
+                children = sum(c.memory_info().rss for c in self.proc.children(recursive=True))
+            except psutil.Error:
+                continue
+            self.peak_self = max(self.peak_self, rss)
+            self.peak_total = max(self.peak_total, rss + children)
+            self._stop.wait(self.interval)
+
+    def stop(self) -> Dict:
+        self._stop.set()
+        self.join()
+        return {"peak_rss_mb": round(self.peak_self / 2 ** 20, 1),
+                "peak_rss_with_children_mb": round(self.peak_total / 2 ** 20, 1)}
+
+
+@contextmanager
+def instrumented(timer: StageTimer, detector: Optional[SyntheticDetector]):
+    """ai_engine의 탐지 / 얼굴 검출 / 합성 함수를 시간 측정 래퍼로 교체 (끝나면 원래대로)"""
+    saved = {k: getattr(ai_engine, k) for k in ("detect_batch", "detect_person_faces", "render_objects",
+                                                 "model", "face_app")}
+    try:
+        if detector is not None:
+            ai_engine.detect_batch = detector.detect_batch
+            ai_engine.detect_person_faces = detector.detect_person_faces
+            # analyze / analyze_stream의 모델 로드 확인 통과용
+            ai_engine.model = ai_engine.model or "synthetic"
+            ai_engine.face_app = ai_engine.face_app or "synthetic"
+        ai_engine.detect_batch = timer.wrap("yolo", ai_engine.detect_batch)
+        ai_engine.detect_person_faces = timer.wrap("face", ai_engine.detect_person_faces)
+        ai_engine.render_objects = timer.wrap("composite", ai_engine.render_objects)
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(ai_engine, k, v)
+
+
+# ======================================
+# 🔹 모드별 실행
+# ======================================
+def run_mode(mode: str, video: str, work_dir: str, args, detector) -> Dict:
+    size = (args.width, args.height)
+    profile = combine.encode_profile(args.encode_profile)
+    writer_args = {k: profile[k] for k in ("codec", "preset", "crf", "threads")}
+    timer = StageTimer()
+    rss = PeakRSS()
+    rss.start()
+    start = perf_counter()
+
+    with instrumented(timer, detector):
+        if mode in ("stream", "tracking"):
+            frames = timer.wrap_iter("decode", preprocess.iter_frames(video, size=size))
+            out = os.path.join(work_dir, f"out_{mode}.mp4")
+            writer = TimedWriter(combine.FrameWriter(out, *size, framerate=args.fps, **writer_args), timer)
+            result = ai_engine.analyze_stream(
+                frames, writer, file_id="bench", total_frames=args.frames, batch_size=args.batch_size,
+                tracking=mode == "tracking", detect_interval=args.detect_interval, blur_mode=args.blur_mode,
+            )
+            writer.close()
+            frame_count = result["frames"]
+        elif mode == "frames":
+            frame_dir = os.path.join(work_dir, "frames")
+            with timer.measure("decode"):
+                paths = preprocess.extract_frames(video, frame_dir, img_format="jpg")
+            # analyze는 ./results/<file_id>_0 에 결과 프레임을 쓰므로 작업 디렉터리 기준으로 실행
+            cwd = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                result = ai_engine.analyze(
+                    [os.path.join(frame_dir, os.path.basename(p)) for p in paths], file_id="bench",
+                    batch_size=args.batch_size, blur_mode=args.blur_mode,
+                )
+            finally:
+                os.chdir(cwd)
+            with timer.measure("encode"):
+                combine.combine_frames(
+                    os.path.join(work_dir, "results", "bench_0", "processed_frame_%04d.jpg"),
+                    os.path.join(work_dir, "out_frames.mp4"), framerate=args.fps, **writer_args,
+                )
+            frame_count = len(result["images"])
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+    wall = perf_counter() - start
+    memory = rss.stop()
+
+    stages = {}
+    for stage in STAGES:
+        total = timer.seconds.get(stage, 0.0)
+        stages[stage] = {
+            "total_s": round(total, 4),
+            "per_frame_ms": round(total / max(1, frame_count) * 1000, 3),
+            "calls": timer.calls.get(stage, 0),
+        }
+    other = wall - sum(timer.seconds.get(s, 0.0) for s in STAGES)
+    stages["other"] = {"total_s": round(other, 4), "per_frame_ms": round(other / max(1, frame_count) * 1000, 3)}
+
+    return {
+        "mode": mode,
+        "frames": frame_count,
+        "wall_s": round(wall, 3),
+        "fps": round(frame_count / wall, 2) if wall > 0 else 0.0,
+        "detections": result.get("total_detections", 0),
+        "stages": stages,
+        **memory,
+    }
+
+
+def bench_composite(scene: SyntheticScene, detector: SyntheticDetector, repeats: int) -> Dict:
+    """블러 모드별 합성(render_objects)만 반복 측정 — ffmpeg 없이 합성 코드 변경만 비교할 때"""
+    img = scene.frame(0)
+    saved = ai_engine.detect_person_faces
+    ai_engine.detect_person_faces = detector.detect_person_faces
+    try:
+        objects = ai_engine.build_objects(img, detector.detect_batch([img])[0])
+    finally:
+        ai_engine.detect_person_faces = saved
+
+    results = {}
+    for blur_mode in ("gaussian", "box", "bilateral", "mosaic"):
+        ai_engine.render_objects(img, objects, blur_mode)   # 워밍업
+        times = []
+        for _ in range(repeats):
+            t0 = perf_counter()
+            ai_engine.render_objects(img, objects, blur_mode)
+            times.append((perf_counter() - t0) * 1000)
+        results[blur_mode] = {"median_ms": round(float(np.median(times)), 3),
+                              "p95_ms": round(float(np.percentile(times, 95)), 3)}
+    return {"objects": len(objects), "repeats": repeats, "modes": results}
+
+
+def bench_inference(scene: SyntheticScene, specs: List[str], frames: int, batch_size: int) -> List[Dict]:
+    """추론 백엔드별로 같은 프레임에 YOLO 호출만 반복 측정 (변환 / 로드 시간, 프레임당 ms, 탐지 수 일치율)
+
+    탐지 수 일치율은 첫 번째 백엔드 기준 — 양자화로 결과가 얼마나 달라지는지 대략 보여준다.
+    """
+    imgs = [scene.frame(t) for t in range(frames)]
+    baseline = None
+    results = []
+    for spec in specs:
+        name, precision = inference.parse_spec(spec)
+        rss = PeakRSS()
+        rss.start()
+        t0 = perf_counter()
+        try:
+            backend = inference.load_backend(name, precision)
+        except Exception as e:
+            rss.stop()
+            results.append({"backend": spec, "error": str(e)})
+            print(f"[{spec}] 건너뜀: {e}")
+            continue
+        load_s = perf_counter() - t0
+        backend(imgs[:batch_size])   # 워밍업 (첫 호출의 그래프 준비 / 메모리 할당 제외)
+
+        per_frame_ms, counts = [], []
+        for i in range(0, len(imgs), batch_size):
+            batch = imgs[i:i + batch_size]
+            t = perf_counter()
+            out = backend(batch)
+            per_frame_ms.append((perf_counter() - t) * 1000 / len(batch))
+            counts.extend(0 if r.boxes is None else len(r.boxes) for r in out)
+        del backend
+
+        if baseline is None:
+            baseline = counts
+        r = {
+            "backend": spec,
+            "load_s": round(load_s, 2),
+            "median_ms": round(float(np.median(per_frame_ms)), 2),
+            "p95_ms": round(float(np.percentile(per_frame_ms, 95)), 2),
+            "fps": round(1000 / float(np.mean(per_frame_ms)), 2),
+            "detections": int(sum(counts)),
+            "count_agreement": round(float(np.mean([a == b for a, b in zip(baseline, counts)])), 3),
+            **rss.stop(),
+        }
+        results.append(r)
+        print(f"[{spec}] {r['median_ms']} ms/frame (p95 {r['p95_ms']}), 로드 {r['load_s']}s, "
+              f"탐지 {r['detections']} (일치율 {r['count_agreement']}), peak RSS {r['peak_rss_mb']} MB")
+    return results
+
+
+# ======================================
+# 🔹 결과 저장 / 비교
+# ======================================
+def _git_revision() -> Optional[str]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(path_a: str, path_b: str) -> None:
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+
+    def pct(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"A: {path_a} ({a['meta'].get('git')})")
+    print(f"B: {path_b} ({b['meta'].get('git')})")
+    runs_b = {r["mode"]: r for r in b["results"]}
+    for ra in a["results"]:
+        rb = runs_b.get(ra["mode"])
+        if rb is None:
+            continue
+        print(f"\n[{ra['mode']}] fps {ra['fps']} → {rb['fps']} ({pct(ra['fps'], rb['fps'])}), "
+              f"peak RSS {ra['peak_rss_mb']} → {rb['peak_rss_mb']} MB")
+        for stage in STAGES + ("other",):
+            sa, sb = ra["stages"][stage]["per_frame_ms"], rb["stages"][stage]["per_frame_ms"]
+            print(f"  {stage:<10} {sa:>9.3f} → {sb:>9.3f} ms/frame  {pct(sa, sb)}")
+
+    infer_b = {r["backend"]: r for r in b.get("inference", []) if "error" not in r}
+    for ra in a.get("inference", []):
+        rb = infer_b.get(ra["backend"])
+        if rb is None or "error" in ra:
+            continue
+        print(f"\n[inference {ra['backend']}] {ra['median_ms']} → {rb['median_ms']} ms/frame "
+              f"({pct(ra['median_ms'], rb['median_ms'])})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PID masking pipeline benchmark (CPU only)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--objects", type=int, default=4, help="움직이는 사각형 수 (차량 + 사람)")
+    parser.add_argument("--faces", type=int, default=2, help="그중 얼굴이 있는 사람 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default=",".join(MODES), help=f"쉼표로 구분 ({', '.join(MODES)})")
+    parser.add_argument("--detector", choices=("synthetic", "model"), default="synthetic")
+    parser.add_argument("--batch-size", type=int, default=ai_engine.BATCH_SIZE)
+    parser.add_argument("--detect-interval", type=int, default=ai_engine.TRACK_DETECT_INTERVAL)
+    parser.add_argument("--blur-mode", default=ai_engine.BLUR_MODE)
+    parser.add_argument("--infer-res", choices=("full", "fixed", "adaptive"), default=ai_engine.INFER_RES_MODE,
+                        help="탐지 해상도 (--detector model에서만 의미 있음)")
+    parser.add_argument("--encode-profile", default=combine.ENCODE_PROFILE, choices=tuple(combine.ENCODE_PROFILES))
+    parser.add_argument("--composite-repeats", type=int, default=50)
+    parser.add_argument("--backends", default="", help="추론 백엔드 비교 (예: torch,onnx,onnx:int8,openvino:fp16)")
+    parser.add_argument("--out", help="결과 JSON 경로 (기본: benchmarks/results/bench_<git>_<시각>.json)")
+    parser.add_argument("--keep", action="store_true", help="합성 영상 / 출력 영상이 있는 작업 디렉터리 유지")
+    parser.add_argument("--verbose", action="store_true", help="ai_engine 객체별 INFO 로그 유지")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="두 결과 JSON 비교 출력")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    if args.objects < args.faces:
+        parser.error("--faces must not exceed --objects")
+    if args.width % 2 or args.height % 2:
+        parser.error("--width / --height must be even (yuv420p)")
+    args.frames = max(1, int(args.seconds * args.fps))
+
+    ai_engine.INFER_RES_MODE = args.infer_res
+    if not args.verbose:
+        ai_engine.logger.setLevel(logging.WARNING)   # 객체마다 찍히는 INFO 로그가 측정을 왜곡하지 않도록
+
+    detector = None
+    if args.detector == "synthetic":
+        detector = SyntheticDetector()
+    elif ai_engine.model is None and not ai_engine.load_model():
+        print("모델을 로드할 수 없습니다 (models/best.pt, buffalo_l 로컬 경로 확인)", file=sys.stderr)
+        return 1
+
+    scene = SyntheticScene(args.width, args.height, args.objects, args.faces, seed=args.seed)
+    work_dir = tempfile.mkdtemp(prefix="pid_bench_")
+    try:
+        video = os.path.join(work_dir, "input.mp4")
+        if modes:
+            t0 = perf_counter()
+            write_video(scene, video, args.frames, args.fps)
+            print(f"[합성 영상] {args.width}x{args.height}, {args.frames} 프레임, {perf_counter() - t0:.1f}s")
+
+        results = []
+        for mode in modes:
+            r = run_mode(mode, video, work_dir, args, detector)
+            results.append(r)
+            per_stage = ", ".join(f"{s} {r['stages'][s]['per_frame_ms']:.1f}" for s in STAGES)
+            print(f"[{mode}] {r['fps']} fps ({r['frames']} 프레임, {r['wall_s']}s), ms/frame: {per_stage}, "
+                  f"peak RSS {r['peak_rss_mb']} MB")
+
+        composite = bench_composite(scene, detector or SyntheticDetector(), args.composite_repeats)
+
+        backends = [s.strip() for s in args.backends.split(",") if s.strip()]
+        inference_results = bench_inference(scene, backends, args.frames, args.batch_size) if backends else []
+    finally:
+        if args.keep:
+            print(f"[작업 디렉터리] {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "git": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        },
+        "results": results,
+        "composite": composite,
+        "inference": inference_results,
+    }
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"bench_{report['meta']['git'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[저장] {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
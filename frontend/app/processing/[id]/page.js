@@ -9,16 +9,38 @@ export default function ProcessingPage({ params }) {
   const [progress, setProgress] = useState(0);
   const [stage, setStage] = useState("AI 준비 중...");
   const [done, setDone] = useState(false);
+  const [preview, setPreview] = useState(null); // { playlist, ready, total }
+  const [speed, setSpeed] = useState(null); // { fps, eta, detections }
+  const [canPlayHls, setCanPlayHls] = useState(false);
 
   useEffect(() => {
     // --- 1️⃣ SSE 연결 ---
     const eventSource = new EventSource(`http://localhost:8000/progress-stream/${id}`);
 
+    // HLS 기본 지원 브라우저(Safari 등)에서만 미리보기 플레이어 표시
+    setCanPlayHls(
+      document.createElement("video").canPlayType("application/vnd.apple.mpegurl") !== ""
+    );
+
+    // --- 4️⃣ 청크 미리보기 준비 이벤트 ---
+    eventSource.addEventListener("chunk", (event) => {
+      const { ready, total, playlist } = JSON.parse(event.data);
+      if (playlist) setPreview({ playlist: `http://localhost:8000${playlist}`, ready, total });
+    });
+
     // --- 2️⃣ SSE 데이터 수신 ---
+    // data: { status, stage, progress, fps, eta_s, detections, chunks: [...] }
     eventSource.onmessage = (event) => {
-      const [p, stageRaw, status] = event.data.split(",");
-      const progressVal = parseInt(p);
+      const { progress: p, stage: stageRaw, status, fps, eta_s, detections, error } = JSON.parse(event.data);
+      const progressVal = Math.floor(p);
       setProgress(progressVal);
+      setSpeed(status === "processing" && fps > 0 ? { fps, eta: eta_s, detections } : null);
+
+      if (status === "error") {
+        setStage(`❌ 처리 실패: ${error || "알 수 없는 오류"}`);
+        eventSource.close();
+        return;
+      }
 
       // 단계별 텍스트 표시
       const stageText = {
@@ -60,6 +82,26 @@ export default function ProcessingPage({ params }) {
       <p className="status-text">{stage}</p>
       <ProgressBar progress={progress} />
       <p className="percent-text">{progress}%</p>
+      {speed && (
+        <p className="status-text">
+          {speed.fps.toFixed(1)} fps · 탐지 {speed.detections}개
+          {speed.eta != null && ` · 남은 시간 약 ${Math.ceil(speed.eta)}초`}
+        </p>
+      )}
+      {preview && !done && (
+        <div className="preview-box">
+          <p className="status-text">
+            🎬 미리보기: {preview.ready}/{preview.total} 청크 준비됨
+          </p>
+          {canPlayHls ? (
+            <video src={preview.playlist} controls muted />
+          ) : (
+            <a href={preview.playlist} target="_blank" rel="noreferrer">
+              HLS 재생목록 열기
+            </a>
+          )}
+        </div>
+      )}
     </div>
   );
 }